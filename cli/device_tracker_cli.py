@@ -36,14 +36,14 @@ from typing import List, Optional
 # Add the parent directory to path to import the service module
 sys.path.append(str(Path(__file__).parent.parent))
 
-from services.device_tracker import DeviceDatabase, Device, DeviceEvent, MACAnalyzer
+from services.device_tracker_service import DeviceDatabase, Device, DeviceEvent, MACAnalyzer, OUIDatabase
 
 class DeviceTrackerCLI:
     """CLI interface for device tracker"""
     
     def __init__(self):
         self.db = DeviceDatabase()
-        self.mac_analyzer = MACAnalyzer()
+        self.mac_analyzer = MACAnalyzer(OUIDatabase.load())
     
     def list_devices(self, active_only: bool = False, randomized_only: bool = False, 
                     json_output: bool = False):
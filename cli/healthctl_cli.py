@@ -225,6 +225,7 @@ class HealthCLI:
         """Display system resource usage"""
         try:
             resources = self.monitor.get_system_resources()
+            trends = self.monitor.get_resource_trends()
             
             if self.json_output:
                 resource_dict = {
@@ -232,7 +233,8 @@ class HealthCLI:
                     'memory_percent': resources.memory_percent,
                     'disk_percent': resources.disk_percent,
                     'load_avg': resources.load_avg,
-                    'uptime': resources.uptime
+                    'uptime': resources.uptime,
+                    'trends': trends
                 }
                 self.print_output(resource_dict, "System Resources")
                 return
@@ -255,6 +257,14 @@ class HealthCLI:
             print(f"Load Average: {resources.load_avg[0]:.2f}, {resources.load_avg[1]:.2f}, {resources.load_avg[2]:.2f}")
             print(f"System Uptime: {resources.uptime}")
             
+            # Rolling averages from the background sampler
+            if trends['1m']['samples'] > 2:
+                print(f"\nAverages (1m / 5m / 15m):")
+                for metric, label in [('cpu_percent', 'CPU'), ('memory_percent', 'Memory')]:
+                    averages = " / ".join(f"{trends[window][metric + '_avg']:.1f}%"
+                                          for window in ('1m', '5m', '15m'))
+                    print(f"  {label}: {averages}")
+            
             # Show thresholds
             print(f"\nThresholds:")
             print(f"  🟢 Normal  🟡 Warning (80%+)  🔴 Critical (95%+)")
@@ -370,7 +380,9 @@ class HealthCLI:
                 timestamp = datetime.fromisoformat(alert['timestamp'])
                 time_str = timestamp.strftime('%m-%d %H:%M:%S')
                 
-                print(f"{i+1:2d}. {level_symbol} [{time_str}] {alert['service']}: {alert['message']}")
+                repeats = f" (x{alert['count']} since {alert['first_seen'][5:16].replace('T', ' ')})" \
+                    if alert.get('count', 1) > 1 else ""
+                print(f"{i+1:2d}. {level_symbol} [{time_str}] {alert['service']}: {alert['message']}{repeats}")
                 
                 # Show details for critical alerts
                 if alert['level'] == 'critical' and alert.get('details'):
@@ -10,6 +10,7 @@ Usage:
     reportctl.py devices [options]
     reportctl.py vlans [options]
     reportctl.py apps [options]
+    reportctl.py rollup [options]
     reportctl.py --help
 
 Examples:
@@ -24,19 +25,24 @@ Examples:
     
     # Application usage breakdown
     reportctl.py apps --period 24 --exclude-whitelist
+    
+    # Fold new sessions into the hourly/daily rollups (run from cron)
+    reportctl.py rollup
 """
 
 import argparse
 import sys
 import os
 from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
+from typing import Optional
 
 # Add parent directory to path to import report_engine
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
-    from services.report_engine import ReportEngine, DNSClassifier
+    from services.report_engine import ReportEngine, ReportCache, DNSClassifier
 except ImportError:
     print("Error: Could not import report_engine. Please ensure it's in the services/ directory.")
     sys.exit(1)
@@ -45,9 +51,10 @@ except ImportError:
 class ReportCLI:
     """Command-line interface for the LNMT reporting engine."""
     
-    def __init__(self, db_path: str = "network.db"):
-        """Initialize CLI with database path."""
+    def __init__(self, db_path: str = "network.db", cache_file: Optional[str] = None):
+        """Initialize CLI with database path and optional on-disk report cache."""
         self.db_path = db_path
+        self.cache = ReportCache(path=cache_file) if cache_file else None
         self.engine = None
     
     def _validate_db(self):
@@ -93,7 +100,7 @@ class ReportCLI:
         self._validate_db()
         
         try:
-            with ReportEngine(self.db_path) as engine:
+            with ReportEngine(self.db_path, cache=self.cache) as engine:
                 print(f"Generating {args.period}-hour usage report...")
                 
                 report = engine.generate_comprehensive_report(
@@ -131,7 +138,7 @@ class ReportCLI:
         self._validate_db()
         
         try:
-            with ReportEngine(self.db_path) as engine:
+            with ReportEngine(self.db_path, cache=self.cache) as engine:
                 end_time = datetime.now()
                 start_time = end_time - timedelta(hours=args.period)
                 
@@ -180,7 +187,7 @@ class ReportCLI:
         self._validate_db()
         
         try:
-            with ReportEngine(self.db_path) as engine:
+            with ReportEngine(self.db_path, cache=self.cache) as engine:
                 end_time = datetime.now()
                 start_time = end_time - timedelta(hours=args.period)
                 
@@ -225,15 +232,15 @@ class ReportCLI:
         self._validate_db()
         
         try:
-            with ReportEngine(self.db_path) as engine:
+            with ReportEngine(self.db_path, cache=self.cache) as engine:
                 end_time = datetime.now()
                 start_time = end_time - timedelta(hours=args.period)
                 
                 print(f"Application usage for last {args.period} hours:")
                 print()
                 
-                sessions = engine.get_session_data(start_time, end_time)
-                stats = engine.calculate_usage_stats(sessions)
+                usage, _ = engine.aggregate_sessions(start_time, end_time)
+                stats = usage.usage_stats()
                 
                 if not stats.top_applications:
                     print("No application data found for the specified period.")
@@ -262,7 +269,8 @@ class ReportCLI:
                     
                     # Get unique hostnames from recent sessions
                     hostnames = set()
-                    for session in sessions[:100]:  # Sample from recent sessions
+                    recent = engine.iter_sessions(start_time, end_time)
+                    for session in islice(recent, 100):  # Sample from recent sessions
                         if session.hostname:
                             hostnames.add(session.hostname)
                     
@@ -282,6 +290,19 @@ class ReportCLI:
             print(f"Error retrieving application data: {e}")
             sys.exit(1)
     
+    def update_rollups(self, args):
+        """Fold new sessions into the usage rollup tables."""
+        self._validate_db()
+        
+        try:
+            with ReportEngine(self.db_path, cache=self.cache) as engine:
+                folded = engine.update_rollups(chunk_size=args.chunk_size)
+                print(f"Folded {folded:,} sessions into usage rollups")
+        
+        except Exception as e:
+            print(f"Error updating rollups: {e}")
+            sys.exit(1)
+    
     def test_classifier(self, args):
         """Test the DNS classifier with custom hostnames."""
         classifier = DNSClassifier()
@@ -323,6 +344,7 @@ Examples:
   %(prog)s devices --period 168 --limit 10 --details
   %(prog)s vlans --period 24 
   %(prog)s apps --period 72 --show-classification
+  %(prog)s rollup
   %(prog)s test-classifier --hostname www.youtube.com
         """
     )
@@ -333,6 +355,11 @@ Examples:
         help='Path to SQLite database (default: network.db)'
     )
     
+    parser.add_argument(
+        '--cache-file',
+        help='SQLite file for caching generated reports between runs'
+    )
+    
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
     # Generate command
@@ -358,6 +385,10 @@ Examples:
     app_parser.add_argument('--period', type=int, default=24, help='Analysis period in hours (default: 24)')
     app_parser.add_argument('--show-classification', action='store_true', help='Show DNS classification examples')
     
+    # Rollup command
+    rollup_parser = subparsers.add_parser('rollup', help='Fold new sessions into hourly/daily rollups')
+    rollup_parser.add_argument('--chunk-size', type=int, help='Sessions folded per transaction')
+    
     # Test classifier command
     test_parser = subparsers.add_parser('test-classifier', help='Test DNS hostname classification')
     test_parser.add_argument('--hostname', help='Test specific hostname classification')
@@ -369,7 +400,7 @@ Examples:
         sys.exit(1)
     
     # Initialize CLI
-    cli = ReportCLI(db_path=args.db)
+    cli = ReportCLI(db_path=args.db, cache_file=args.cache_file)
     
     # Route to appropriate command handler
     if args.command == 'generate':
@@ -380,6 +411,8 @@ Examples:
         cli.show_vlans(args)
     elif args.command == 'apps':
         cli.show_applications(args)
+    elif args.command == 'rollup':
+        cli.update_rollups(args)
     elif args.command == 'test-classifier':
         cli.test_classifier(args)
     else:
@@ -232,59 +232,53 @@ class SchedulerCLI:
     
     def show_history(self, job_id: Optional[str] = None, limit: int = 10) -> None:
         """Show job execution history"""
-        with sqlite3.connect(self.registry.db_path) as conn:
-            if job_id:
-                cursor = conn.execute("""
-                    SELECT job_id, status, start_time, end_time, error, retry_count
-                    FROM job_history 
-                    WHERE job_id = ?
-                    ORDER BY start_time DESC 
-                    LIMIT ?
-                """, (job_id, limit))
-            else:
-                cursor = conn.execute("""
-                    SELECT job_id, status, start_time, end_time, error, retry_count
-                    FROM job_history 
-                    ORDER BY start_time DESC 
-                    LIMIT ?
-                """, (limit,))
-            
-            rows = cursor.fetchall()
-            
-            if not rows:
-                print("No execution history found.")
-                return
-            
-            headers = ["Job ID", "Status", "Started", "Ended", "Duration", "Retries", "Error"]
-            table_rows = []
+        rows = self.registry.get_job_history(job_id, limit)
+        
+        if not rows:
+            print("No execution history found.")
+            return
+        
+        headers = ["Job ID", "Status", "Started", "Ended", "Duration", "Retries", "Error"]
+        table_rows = []
+        
+        for row in rows:
+            job_id, status, start_time, end_time, error, retry_count = row
             
-            for row in rows:
-                job_id, status, start_time, end_time, error, retry_count = row
-                
-                start_dt = datetime.fromisoformat(start_time)
-                start_str = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-                
-                if end_time:
-                    end_dt = datetime.fromisoformat(end_time)
-                    end_str = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-                    duration = str(end_dt - start_dt)
-                else:
-                    end_str = "Running"
-                    duration = "N/A"
-                
-                error_str = error[:50] + "..." if error and len(error) > 50 else (error or "")
-                
-                table_rows.append([
-                    job_id,
-                    status,
-                    start_str,
-                    end_str,
-                    duration,
-                    retry_count,
-                    error_str
-                ])
+            start_dt = datetime.fromisoformat(start_time)
+            start_str = start_dt.strftime("%Y-%m-%d %H:%M:%S")
             
-            print(tabulate(table_rows, headers=headers, tablefmt="grid"))
+            if end_time:
+                end_dt = datetime.fromisoformat(end_time)
+                end_str = end_dt.strftime("%Y-%m-%d %H:%M:%S")
+                duration = str(end_dt - start_dt)
+            else:
+                end_str = "Running"
+                duration = "N/A"
+            
+            error_str = error[:50] + "..." if error and len(error) > 50 else (error or "")
+            
+            table_rows.append([
+                job_id,
+                status,
+                start_str,
+                end_str,
+                duration,
+                retry_count,
+                error_str
+            ])
+        
+        print(tabulate(table_rows, headers=headers, tablefmt="grid"))
+    
+    def show_daily_history(self, job_id: Optional[str] = None, days: int = 14) -> None:
+        """Show per-day success/failure counts, kept after old runs are pruned"""
+        rows = self.registry.get_daily_counts(job_id, days)
+        
+        if not rows:
+            print("No execution history found.")
+            return
+        
+        headers = ["Job ID", "Day", "Succeeded", "Failed"]
+        print(tabulate([list(row) for row in rows], headers=headers, tablefmt="grid"))
     
     def show_status(self) -> None:
         """Show overall scheduler status"""
@@ -511,6 +505,10 @@ Examples:
     history_parser.add_argument('--job', help='Show history for specific job')
     history_parser.add_argument('--limit', type=int, default=10,
                                help='Maximum number of records')
+    history_parser.add_argument('--daily', action='store_true',
+                               help='Show per-day success/failure counts')
+    history_parser.add_argument('--days', type=int, default=14,
+                               help='Days of daily counts to show')
     
     # Status command
     subparsers.add_parser('status', help='Show scheduler status')
@@ -581,7 +579,10 @@ Examples:
             cli.run_job(args.job_id)
             
         elif args.command == 'history':
-            cli.show_history(args.job, args.limit)
+            if args.daily:
+                cli.show_daily_history(args.job, args.days)
+            else:
+                cli.show_history(args.job, args.limit)
             
         elif args.command == 'status':
             cli.show_status()
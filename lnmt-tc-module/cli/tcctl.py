@@ -32,7 +32,8 @@ from pathlib import Path
 from typing import Dict, List, Optional, Any
 import yaml
 
-# Import TC service
+# Import TC service from the module's src directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
 try:
     from tc_service import TCManager, TCPolicy, TCQdisc, TCClass, TCFilter
 except ImportError:
@@ -372,7 +373,7 @@ class TCControlCLI:
                     print(f"  Total Drops: {total_drops:,}")
                     
                     # Record statistics
-                    self.tc_manager.record_statistics(interface)
+                    self.tc_manager.record_statistics(interface, stats)
                 
                 time.sleep(interval)
                 
@@ -17,23 +17,20 @@ License: MIT
 import json
 import logging
 import os
+import socket
+import struct
 import subprocess
 import threading
-import time
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any, Union
+from typing import Dict, List, Optional, Tuple, Any
 import re
 import sqlite3
-from contextlib import contextmanager
-import yaml
-import ipaddress
 
 # Try to import pyroute2 for advanced networking
 try:
-    from pyroute2 import IPRoute, NetlinkError
-    from pyroute2.netlink.rtnl import TC_H_ROOT, TC_H_INGRESS
+    from pyroute2 import IPRoute
     PYROUTE2_AVAILABLE = True
 except ImportError:
     PYROUTE2_AVAILABLE = False
@@ -208,9 +205,302 @@ class TCPolicy:
         if self.updated_at is None:
             self.updated_at = datetime.now()
 
+class TCNetlinkReader:
+    """
+    Reads qdiscs, classes and filters from the kernel over rtnetlink
+    
+    Qdiscs of all interfaces come from a single dump request. The kernel
+    only dumps classes and filters per device, so those take one request per
+    interface (and per qdisc for filters) that has configured qdiscs.
+    Nothing forks `tc`; objects carry decoded options and their
+    byte/packet/drop counters.
+    
+    Example:
+        reader = TCNetlinkReader()
+        state = reader.read(['eth0'])
+        for tc_class in state['eth0']['classes']:
+            print(tc_class['classid'], tc_class['stats']['bytes_sent'])
+    """
+    
+    RTM_NEWQDISC, RTM_GETQDISC = 36, 38
+    RTM_NEWTCLASS, RTM_GETTCLASS = 40, 42
+    RTM_NEWTFILTER, RTM_GETTFILTER = 44, 46
+    NLMSG_ERROR, NLMSG_DONE = 2, 3
+    NLM_F_REQUEST, NLM_F_DUMP = 0x1, 0x300
+    
+    TCA_KIND, TCA_OPTIONS, TCA_STATS, TCA_STATS2 = 1, 2, 3, 7
+    TCA_STATS_BASIC, TCA_STATS_RATE_EST, TCA_STATS_QUEUE = 1, 2, 3
+    
+    HANDLE_ROOT, HANDLE_INGRESS = 0xFFFFFFFF, 0xFFFFFFF1
+    
+    NLMSG = struct.Struct("=IHHII")
+    TCMSG = struct.Struct("=B3xiIII")
+    RTATTR = struct.Struct("=HH")
+    RATESPEC = "BBHhHI"
+    HTB_OPT = struct.Struct("=" + RATESPEC * 2 + "5I")
+    HTB_GLOB = struct.Struct("=5I")
+    TBF_QOPT = struct.Struct("=" + RATESPEC * 2 + "3I")
+    
+    # Classifiers whose attribute 1 is the target classid
+    CLASSID_FILTERS = {'u32', 'fw', 'flower', 'basic', 'matchall', 'route'}
+    PROTOCOLS = {0x0003: 'all', 0x0800: 'ip', 0x0806: 'arp', 0x86DD: 'ipv6', 0x8100: '802.1Q'}
+    
+    # Scheduler ticks per microsecond, read once from /proc/net/psched
+    _tick_in_usec: Optional[float] = None
+    
+    def __init__(self, recv_size: int = 65536):
+        self.recv_size = recv_size
+        self.lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._seq = 0
+        self._names: Dict[int, str] = {}
+    
+    @staticmethod
+    def available() -> bool:
+        return hasattr(socket, 'AF_NETLINK')
+    
+    def close(self):
+        with self.lock:
+            if self._sock:
+                self._sock.close()
+                self._sock = None
+    
+    def _socket(self) -> socket.socket:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, 0))
+            self._sock = sock
+        return self._sock
+    
+    def _dump(self, msg_type: int, ifindex: int = 0,
+              parent: int = 0) -> List[Tuple[Tuple[int, int, int, int, int], Dict[int, bytes]]]:
+        """Send one dump request and collect (tcmsg, attributes) of every reply"""
+        self._seq += 1
+        seq = self._seq
+        body = self.TCMSG.pack(socket.AF_UNSPEC, ifindex, 0, parent, 0)
+        header = self.NLMSG.pack(self.NLMSG.size + len(body), msg_type,
+                                 self.NLM_F_REQUEST | self.NLM_F_DUMP, seq, 0)
+        sock = self._socket()
+        try:
+            sock.send(header + body)
+            replies = []
+            while True:
+                data = sock.recv(self.recv_size)
+                offset = 0
+                while offset + self.NLMSG.size <= len(data):
+                    length, reply_type, _flags, reply_seq, _pid = self.NLMSG.unpack_from(data, offset)
+                    if length < self.NLMSG.size:
+                        raise OSError("Malformed netlink message")
+                    start, end = offset + self.NLMSG.size, offset + length
+                    offset += (length + 3) & ~3
+                    if reply_seq != seq:
+                        continue
+                    if reply_type == self.NLMSG_DONE:
+                        return replies
+                    if reply_type == self.NLMSG_ERROR:
+                        error = struct.unpack_from("=i", data, start)[0]
+                        if error:
+                            raise OSError(-error, os.strerror(-error))
+                        return replies
+                    if end - start >= self.TCMSG.size:
+                        tcm = self.TCMSG.unpack_from(data, start)
+                        replies.append((tcm, self._attrs(data, start + self.TCMSG.size, end)))
+        except OSError:
+            # Drop the socket so a half-read dump cannot leak into the next request
+            self._sock = None
+            sock.close()
+            raise
+    
+    @classmethod
+    def _attrs(cls, data: bytes, start: int, end: int) -> Dict[int, bytes]:
+        attrs = {}
+        while start + cls.RTATTR.size <= end:
+            length, attr_type = cls.RTATTR.unpack_from(data, start)
+            if length < cls.RTATTR.size:
+                break
+            attrs[attr_type & 0x3FFF] = data[start + cls.RTATTR.size:start + length]
+            start += (length + 3) & ~3
+        return attrs
+    
+    @classmethod
+    def format_handle(cls, handle: int) -> str:
+        """Render a handle the way `tc` does (1:, 1:10, root, ingress)"""
+        if handle == cls.HANDLE_ROOT:
+            return 'root'
+        if handle == cls.HANDLE_INGRESS:
+            return 'ingress'
+        major, minor = handle >> 16, handle & 0xFFFF
+        return f"{major:x}:{minor:x}" if minor else f"{major:x}:"
+    
+    @staticmethod
+    def _format_u32_handle(handle: int) -> str:
+        htid, bucket, node = handle >> 20, (handle >> 12) & 0xFF, handle & 0xFFF
+        return f"{htid:x}:" + (f"{bucket:x}" if bucket else "") + (f":{node:x}" if node else "")
+    
+    @classmethod
+    def _stats(cls, attrs: Dict[int, bytes]) -> Dict[str, int]:
+        stats = dict.fromkeys(('bytes_sent', 'packets_sent', 'drops', 'overlimits',
+                               'requeues', 'backlog', 'qlen', 'bps', 'pps'), 0)
+        if cls.TCA_STATS2 in attrs:
+            nested = attrs[cls.TCA_STATS2]
+            nested = cls._attrs(nested, 0, len(nested))
+            if len(nested.get(cls.TCA_STATS_BASIC, b'')) >= 12:
+                stats['bytes_sent'], stats['packets_sent'] = struct.unpack_from(
+                    "=QI", nested[cls.TCA_STATS_BASIC])
+            if len(nested.get(cls.TCA_STATS_RATE_EST, b'')) >= 8:
+                stats['bps'], stats['pps'] = struct.unpack_from("=II", nested[cls.TCA_STATS_RATE_EST])
+            if len(nested.get(cls.TCA_STATS_QUEUE, b'')) >= 20:
+                (stats['qlen'], stats['backlog'], stats['drops'],
+                 stats['requeues'], stats['overlimits']) = struct.unpack_from(
+                    "=5I", nested[cls.TCA_STATS_QUEUE])
+        elif len(attrs.get(cls.TCA_STATS, b'')) >= 36:
+            (stats['bytes_sent'], stats['packets_sent'], stats['drops'], stats['overlimits'],
+             stats['bps'], stats['pps'], stats['qlen'], stats['backlog']) = struct.unpack_from(
+                "=QIIIIIII", attrs[cls.TCA_STATS])
+        return stats
+    
+    @classmethod
+    def tick_in_usec(cls) -> float:
+        """Kernel scheduler ticks per microsecond, computed the way tc does"""
+        if cls._tick_in_usec is None:
+            try:
+                with open('/proc/net/psched') as f:
+                    t2us, us2t, clock_res = (int(field, 16) for field in f.read().split()[:3])
+                if clock_res == 1_000_000_000:
+                    t2us = us2t
+                cls._tick_in_usec = t2us / us2t * clock_res / 1_000_000
+            except (OSError, ValueError, ZeroDivisionError):
+                cls._tick_in_usec = 1000 / 64  # 64ns ticks, the kernel's PSCHED_SHIFT
+        return cls._tick_in_usec
+    
+    @classmethod
+    def _ticks_to_bytes(cls, ticks: int, rate_bps: int) -> int:
+        """Burst size in bytes of a bucket that drains for ticks at rate_bps"""
+        return round(ticks / cls.tick_in_usec() * rate_bps / 8 / 1_000_000)
+    
+    @classmethod
+    def _options(cls, kind: str, data: Optional[bytes], is_class: bool) -> Dict[str, Any]:
+        """Decode the options of the qdisc and class kinds TCManager configures"""
+        if not data:
+            return {}
+        attrs = cls._attrs(data, 0, len(data))
+        options: Dict[str, Any] = {}
+        if kind == 'htb' and is_class and len(attrs.get(1, b'')) >= cls.HTB_OPT.size:
+            fields = cls.HTB_OPT.unpack_from(attrs[1])
+            options = {'rate': fields[5] * 8, 'ceil': fields[11] * 8,
+                       'quantum': fields[14], 'level': fields[15], 'prio': fields[16]}
+            if len(attrs.get(6, b'')) >= 8:
+                options['rate'] = struct.unpack_from("=Q", attrs[6])[0] * 8
+            if len(attrs.get(7, b'')) >= 8:
+                options['ceil'] = struct.unpack_from("=Q", attrs[7])[0] * 8
+            # The kernel reports buckets as drain time in ticks; tc shows them as bytes
+            options['burst'] = cls._ticks_to_bytes(fields[12], options['rate'])
+            options['cburst'] = cls._ticks_to_bytes(fields[13], options['ceil'])
+        elif kind == 'htb' and not is_class and len(attrs.get(2, b'')) >= cls.HTB_GLOB.size:
+            _version, r2q, default, _debug, direct_packets = cls.HTB_GLOB.unpack_from(attrs[2])
+            options = {'r2q': r2q, 'default': f"{default:x}", 'direct_packets_stat': direct_packets}
+        elif kind == 'tbf' and len(attrs.get(1, b'')) >= cls.TBF_QOPT.size:
+            fields = cls.TBF_QOPT.unpack_from(attrs[1])
+            options = {'rate': fields[5] * 8, 'peakrate': fields[11] * 8, 'limit': fields[12]}
+            if len(attrs.get(4, b'')) >= 8:
+                options['rate'] = struct.unpack_from("=Q", attrs[4])[0] * 8
+            if len(attrs.get(5, b'')) >= 8:
+                options['peakrate'] = struct.unpack_from("=Q", attrs[5])[0] * 8
+            options['burst'] = cls._ticks_to_bytes(fields[13], options['rate'])
+            if options['peakrate']:
+                options['minburst'] = cls._ticks_to_bytes(fields[14], options['peakrate'])
+        return options
+    
+    def _interface_name(self, ifindex: int) -> str:
+        name = self._names.get(ifindex)
+        if name is None:
+            try:
+                name = socket.if_indextoname(ifindex)
+            except OSError:
+                name = f"if{ifindex}"
+            self._names[ifindex] = name
+        return name
+    
+    def _object(self, tcm: Tuple[int, int, int, int, int], attrs: Dict[int, bytes]) -> Dict[str, Any]:
+        _family, ifindex, handle, parent, _info = tcm
+        kind = attrs.get(self.TCA_KIND, b'').rstrip(b'\0').decode(errors='replace')
+        return {'kind': kind, 'interface': self._interface_name(ifindex),
+                'handle': handle, 'parent': self.format_handle(parent)}
+    
+    def _filter(self, tcm, attrs: Dict[int, bytes], parent: int) -> Dict[str, Any]:
+        entry = self._object(tcm, attrs)
+        info = tcm[4]
+        protocol = socket.ntohs(info & 0xFFFF)
+        entry.update({
+            'parent': self.format_handle(parent),
+            'protocol': self.PROTOCOLS.get(protocol, f"{protocol:#06x}"),
+            'prio': info >> 16,
+            'handle': (self._format_u32_handle(tcm[2]) if entry['kind'] == 'u32'
+                       else f"{tcm[2]:#x}"),
+            'options': {}
+        })
+        options = attrs.get(self.TCA_OPTIONS)
+        if options and entry['kind'] in self.CLASSID_FILTERS:
+            classid = self._attrs(options, 0, len(options)).get(1)
+            if classid and len(classid) >= 4:
+                entry['options']['flowid'] = self.format_handle(struct.unpack_from("=I", classid)[0])
+        return entry
+    
+    def read(self, interfaces: Optional[List[str]] = None) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Current qdiscs, classes and filters per interface, optionally limited to some interfaces"""
+        wanted = set(interfaces) if interfaces is not None else None
+        with self.lock:
+            self._names.clear()
+            state: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+            configured: Dict[int, List[int]] = {}
+            
+            for tcm, attrs in self._dump(self.RTM_GETQDISC):
+                ifindex = tcm[1]
+                qdisc = self._object(tcm, attrs)
+                name = qdisc['interface']
+                if wanted is not None and name not in wanted:
+                    continue
+                qdisc['handle'] = self.format_handle(tcm[2])
+                qdisc['options'] = self._options(qdisc['kind'], attrs.get(self.TCA_OPTIONS), False)
+                qdisc['stats'] = self._stats(attrs)
+                state.setdefault(name, {'qdiscs': [], 'classes': [], 'filters': []})['qdiscs'].append(qdisc)
+                # Default qdiscs have handle 0: and no classes or filters to dump
+                if tcm[2] >> 16:
+                    configured.setdefault(ifindex, []).append(tcm[2])
+            
+            for ifindex, handles in configured.items():
+                config = state[self._interface_name(ifindex)]
+                for tcm, attrs in self._dump(self.RTM_GETTCLASS, ifindex):
+                    tc_class = self._object(tcm, attrs)
+                    tc_class['classid'] = self.format_handle(tc_class.pop('handle'))
+                    tc_class['options'] = self._options(tc_class['kind'], attrs.get(self.TCA_OPTIONS), True)
+                    tc_class['stats'] = self._stats(attrs)
+                    config['classes'].append(tc_class)
+                for handle in handles:
+                    for tcm, attrs in self._dump(self.RTM_GETTFILTER, ifindex, handle):
+                        # The first reply of each priority is the classifier itself, without a rule
+                        if not tcm[2]:
+                            continue
+                        config['filters'].append(self._filter(tcm, attrs, handle))
+            
+            for name in wanted or ():
+                state.setdefault(name, {'qdiscs': [], 'classes': [], 'filters': []})
+            return state
+
 class TCManager:
     """Traffic Control Manager - Core TC/QoS functionality"""
     
+    # Options TCNetlinkReader decodes, so both readers report the same keys
+    TC_TEXT_OPTIONS = {
+        ('htb', False): ('r2q', 'default', 'direct_packets_stat'),
+        ('htb', True): ('rate', 'ceil', 'burst', 'cburst', 'quantum', 'level', 'prio'),
+        ('tbf', False): ('rate', 'peakrate', 'limit', 'burst', 'minburst'),
+    }
+    TC_SENT = re.compile(r'Sent (\d+) bytes (\d+) pkt \(dropped (\d+), overlimits (\d+) requeues (\d+)\)')
+    TC_BACKLOG = re.compile(r'backlog (\S+) (\d+)p')
+    TC_RATE_EST = re.compile(r'rate (\S+) (\d+)pps')
+    TC_VALUE = re.compile(r'([\d.]+)([KMGT]?)(i?)(bit|b)?')
+    
     def __init__(self, config_path: str = "/etc/lnmt/tc_config.json", 
                  db_manager: Optional[Any] = None):
         self.config_path = Path(config_path)
@@ -233,6 +523,9 @@ class TCManager:
                 self.ipr = None
         else:
             self.ipr = None
+        
+        # Read live TC state over netlink instead of forking tc
+        self.tc_reader = TCNetlinkReader() if TCNetlinkReader.available() else None
     
     def _load_config(self) -> Dict[str, Any]:
         """Load TC configuration"""
@@ -675,8 +968,70 @@ class TCManager:
                 )
             return None
     
+    def get_tc_state(self, interfaces: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Get current TC configuration and counters of all (or the given) interfaces"""
+        if self.tc_reader:
+            try:
+                return self.tc_reader.read(interfaces)
+            except OSError as e:
+                self.logger.warning(f"Netlink TC dump failed, falling back to tc: {e}")
+        
+        if interfaces is None:
+            interfaces = [interface.name for interface in self.discover_interfaces()]
+        return {name: self._get_tc_config_subprocess(name) for name in interfaces}
+    
+    def get_statistics(self, interface: str,
+                       config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Per-qdisc and per-class counters of an interface
+        
+        config is the interface's get_tc_state() entry; callers that already
+        hold a snapshot pass it to avoid another dump. Returns {} for an
+        unknown interface.
+        """
+        if config is None:
+            config = self.get_tc_state([interface]).get(interface)
+            if config is None:
+                return {}
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'qdisc_stats': [dict(q['stats'], handle=q['handle'], kind=q['kind'])
+                            for q in config.get('qdiscs', []) if 'stats' in q],
+            'class_stats': [dict(c['stats'], classid=c['classid'], kind=c['kind'])
+                            for c in config.get('classes', []) if 'stats' in c]
+        }
+    
+    def record_statistics(self, interface: str, stats: Optional[Dict[str, Any]] = None):
+        """Store an interface's counters, reading them unless get_statistics() output is given"""
+        if stats is None:
+            stats = self.get_statistics(interface)
+        if not stats:
+            return
+        rows = [(interface, entry.get('classid', entry.get('handle')), entry['bytes_sent'],
+                 entry['packets_sent'], entry['drops'], entry['overlimits'],
+                 entry['requeues'], entry['backlog'], entry['qlen'], stats['timestamp'])
+                for entry in stats['qdisc_stats'] + stats['class_stats']]
+        if not rows:
+            return
+        with self.lock:
+            self.db_conn.executemany("""
+                INSERT INTO tc_statistics (interface, classid, bytes_sent, packets_sent, drops,
+                                           overlimits, requeues, backlog, qlen, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self.db_conn.commit()
+    
     def get_current_tc_config(self, interface: str) -> Dict[str, Any]:
         """Get current TC configuration for an interface"""
+        return self.get_tc_state([interface]).get(interface, {'qdiscs': [], 'classes': [], 'filters': []})
+    
+    def _get_tc_config_subprocess(self, interface: str) -> Dict[str, Any]:
+        """
+        Get TC configuration and counters from `tc -s show`, for hosts without netlink
+        
+        Entries have the same shape as TCNetlinkReader.read(), so monitoring
+        code works with either source.
+        """
         config = {
             'qdiscs': [],
             'classes': [],
@@ -684,104 +1039,116 @@ class TCManager:
         }
         
         try:
-            # Get qdiscs
-            result = subprocess.run(
-                [self.config['tc_path'], 'qdisc', 'show', 'dev', interface],
-                capture_output=True, text=True, check=True
-            )
-            config['qdiscs'] = self._parse_tc_qdiscs(result.stdout)
+            config['qdiscs'] = self._parse_tc_output(
+                self._run_tc('-s', 'qdisc', 'show', 'dev', interface), interface)
+            config['classes'] = self._parse_tc_output(
+                self._run_tc('-s', '-d', 'class', 'show', 'dev', interface), interface)
+            # Filters are listed per qdisc; default qdiscs (handle 0:) have none
+            for qdisc in config['qdiscs']:
+                if not qdisc['handle'].startswith('0:'):
+                    config['filters'].extend(self._parse_tc_output(
+                        self._run_tc('filter', 'show', 'dev', interface, 'parent', qdisc['handle']),
+                        interface, qdisc['handle']))
             
-            # Get classes
-            result = subprocess.run(
-                [self.config['tc_path'], 'class', 'show', 'dev', interface],
-                capture_output=True, text=True, check=True
-            )
-            config['classes'] = self._parse_tc_classes(result.stdout)
-            
-            # Get filters
-            result = subprocess.run(
-                [self.config['tc_path'], 'filter', 'show', 'dev', interface],
-                capture_output=True, text=True, check=True
-            )
-            config['filters'] = self._parse_tc_filters(result.stdout)
-            
-        except subprocess.CalledProcessError as e:
+        except (subprocess.CalledProcessError, OSError) as e:
             self.logger.error(f"Failed to get TC config for {interface}: {e}")
         
         return config
     
-    def _parse_tc_qdiscs(self, output: str) -> List[Dict[str, Any]]:
-        """Parse tc qdisc show output"""
-        qdiscs = []
-        
-        for line in output.strip().split('\n'):
-            if line.strip():
-                parts = line.split()
-                if len(parts) >= 4:
-                    qdisc = {
-                        'kind': parts[1],
-                        'handle': parts[2] if len(parts) > 2 else '',
-                        'parent': parts[3] if len(parts) > 3 else '',
-                        'options': {}
-                    }
-                    
-                    # Parse options
-                    for i in range(4, len(parts), 2):
-                        if i + 1 < len(parts):
-                            qdisc['options'][parts[i]] = parts[i + 1]
-                    
-                    qdiscs.append(qdisc)
-        
-        return qdiscs
-    
-    def _parse_tc_classes(self, output: str) -> List[Dict[str, Any]]:
-        """Parse tc class show output"""
-        classes = []
-        
-        for line in output.strip().split('\n'):
-            if line.strip():
-                parts = line.split()
-                if len(parts) >= 6:
-                    class_info = {
-                        'kind': parts[1],
-                        'parent': parts[2],
-                        'classid': parts[3],
-                        'options': {}
-                    }
-                    
-                    # Parse options
-                    for i in range(4, len(parts), 2):
-                        if i + 1 < len(parts):
-                            class_info['options'][parts[i]] = parts[i + 1]
-                    
-                    classes.append(class_info)
-        
-        return classes
-    
-    def _parse_tc_filters(self, output: str) -> List[Dict[str, Any]]:
-        """Parse tc filter show output"""
-        filters = []
-        
-        for line in output.strip().split('\n'):
-            if line.strip():
-                parts = line.split()
-                if len(parts) >= 6:
-                    filter_info = {
-                        'kind': parts[1],
-                        'protocol': parts[2],
-                        'prio': parts[3],
-                        'handle': parts[4] if len(parts) > 4 else '',
-                        'options': {}
-                    }
-                    
-                    # Parse options
-                    for i in range(5, len(parts), 2):
-                        if i + 1 < len(parts):
-                            filter_info['options'][parts[i]] = parts[i + 1]
-                    
-                    filters.append(filter_info)
+    def _run_tc(self, *args: str) -> str:
+        result = subprocess.run(
+            [self.config['tc_path'], *args],
+            capture_output=True, text=True, check=True
+        )
+        return result.stdout
+    
+    def _parse_tc_output(self, output: str, interface: str,
+                         parent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Parse `tc [-s] {qdisc,class,filter} show` output into netlink reader entries
+        
+        parent is the queried parent handle; tc leaves it out of filter lines.
+        """
+        entries = []
+        current = None
+        
+        for line in output.splitlines():
+            if line.startswith(('qdisc ', 'class ', 'filter ')):
+                current = self._parse_tc_header(line.split(), interface, parent)
+                if current is not None:
+                    entries.append(current)
+            elif current is not None and 'stats' in current:
+                self._parse_tc_stats(line, current['stats'])
+        
+        return entries
+    
+    def _parse_tc_header(self, tokens: List[str], interface: str,
+                         default_parent: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Parse the first line of a tc object; None for a classifier without a rule"""
+        # tc marks the flowid of offloaded filters with '*'
+        tokens = [token.lstrip('*') for token in tokens]
         
-        return filters
+        def after(key: str) -> Optional[str]:
+            index = tokens.index(key) if key in tokens[:-1] else -1
+            return tokens[index + 1] if index >= 0 else None
+        
+        parent = 'root' if 'root' in tokens else after('parent') or default_parent
+        if parent == 'ffff:fff1':
+            parent = 'ingress'
+        
+        if tokens[0] == 'filter':
+            handle = after('fh') or after('handle')
+            if handle is None:
+                return None
+            kind = tokens[tokens.index('pref') + 2]
+            flowid = after('flowid') or after('classid')
+            return {'kind': kind, 'interface': interface, 'handle': handle, 'parent': parent,
+                    'protocol': after('protocol'), 'prio': int(after('pref')),
+                    'options': {'flowid': flowid} if flowid and kind in TCNetlinkReader.CLASSID_FILTERS else {}}
+        
+        kind, handle = tokens[1], tokens[2]
+        is_class = tokens[0] == 'class'
+        options = {}
+        for key in self.TC_TEXT_OPTIONS.get((kind, is_class), ()):
+            value = after(key)
+            if value is not None:
+                options[key] = self._parse_tc_value(key, value)
+        
+        entry = {'kind': kind, 'interface': interface, 'parent': parent, 'options': options,
+                 'stats': dict.fromkeys(('bytes_sent', 'packets_sent', 'drops', 'overlimits',
+                                         'requeues', 'backlog', 'qlen', 'bps', 'pps'), 0)}
+        entry['classid' if is_class else 'handle'] = handle
+        return entry
+    
+    @classmethod
+    def _parse_tc_value(cls, key: str, value: str) -> Any:
+        """Convert tc's rates (10Mbit) to bits/s and sizes (15Kb) to bytes"""
+        if key == 'default':
+            return f"{int(value, 16):x}"
+        # -d appends the cell log to bursts (15Kb/1)
+        match = cls.TC_VALUE.fullmatch(value.split('/')[0])
+        if not match:
+            return value
+        number, prefix, iec, unit = match.groups()
+        # tc prints sizes in powers of 1024 and rates in powers of 1000
+        base = 1024 if iec or unit == 'b' else 1000
+        return round(float(number) * base ** ' KMGT'.index(prefix or ' '))
+    
+    def _parse_tc_stats(self, line: str, stats: Dict[str, int]):
+        """Fill counters from a `tc -s` statistics line"""
+        match = self.TC_SENT.search(line)
+        if match:
+            (stats['bytes_sent'], stats['packets_sent'], stats['drops'],
+             stats['overlimits'], stats['requeues']) = map(int, match.groups())
+        match = self.TC_RATE_EST.search(line)
+        if match:
+            # tc shows the estimator in bits; the kernel counts bytes
+            stats['bps'] = self._parse_tc_value('rate', match.group(1)) // 8
+            stats['pps'] = int(match.group(2))
+        match = self.TC_BACKLOG.search(line)
+        if match:
+            stats['backlog'] = self._parse_tc_value('backlog', match.group(1))
+            stats['qlen'] = int(match.group(2))
     
     def create_policy(self, policy: TCPolicy) -> bool:
         """Create a new TC policy"""
@@ -823,4 +1190,127 @@ class TCManager:
                                               interface, match_criteria, flowid, action, enabled)
                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """, (policy_id, filter_obj.handle, filter_obj.parent, filter_obj.protocol,
-                         filter_obj.prio,
\ No newline at end of file
+                         filter_obj.prio, filter_obj.kind, filter_obj.interface,
+                         json.dumps(filter_obj.match_criteria), filter_obj.flowid,
+                         filter_obj.action, filter_obj.enabled))
+                
+                self.db_conn.commit()
+            
+            self.logger.info(f"Created TC policy: {policy.name}")
+            return True
+        
+        except Exception as e:
+            self.db_conn.rollback()
+            self.logger.error(f"Failed to create policy {policy.name}: {e}")
+            return False
+    
+    def get_policy(self, name: str) -> Optional[TCPolicy]:
+        """Get policy by name, with its qdiscs, classes and filters"""
+        with self.lock:
+            cursor = self.db_conn.cursor()
+            cursor.execute("SELECT * FROM tc_policies WHERE name = ?", (name,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            cursor.execute("SELECT * FROM tc_qdiscs WHERE policy_id = ? ORDER BY id", (row['id'],))
+            qdiscs = [TCQdisc(
+                handle=q['handle'],
+                parent=q['parent'],
+                kind=q['kind'],
+                interface=q['interface'],
+                options=json.loads(q['options']) if q['options'] else {},
+                created_at=self._parse_timestamp(q['created_at']),
+                enabled=bool(q['enabled'])
+            ) for q in cursor.fetchall()]
+            
+            cursor.execute("SELECT * FROM tc_classes WHERE policy_id = ? ORDER BY id", (row['id'],))
+            classes = [TCClass(
+                classid=c['classid'],
+                parent=c['parent'],
+                kind=c['kind'],
+                interface=c['interface'],
+                rate=c['rate'],
+                ceil=c['ceil'],
+                burst=c['burst'],
+                cburst=c['cburst'],
+                prio=c['prio'],
+                quantum=c['quantum'],
+                options=json.loads(c['options']) if c['options'] else {},
+                created_at=self._parse_timestamp(c['created_at']),
+                enabled=bool(c['enabled'])
+            ) for c in cursor.fetchall()]
+            
+            cursor.execute("SELECT * FROM tc_filters WHERE policy_id = ? ORDER BY id", (row['id'],))
+            filters = [TCFilter(
+                handle=f['handle'],
+                parent=f['parent'],
+                protocol=f['protocol'],
+                prio=f['prio'],
+                kind=f['kind'],
+                interface=f['interface'],
+                match_criteria=json.loads(f['match_criteria']) if f['match_criteria'] else {},
+                flowid=f['flowid'],
+                action=f['action'],
+                created_at=self._parse_timestamp(f['created_at']),
+                enabled=bool(f['enabled'])
+            ) for f in cursor.fetchall()]
+            
+            return TCPolicy(
+                name=row['name'],
+                description=row['description'],
+                interface=row['interface'],
+                qdiscs=qdiscs,
+                classes=classes,
+                filters=filters,
+                enabled=bool(row['enabled']),
+                created_at=self._parse_timestamp(row['created_at']),
+                updated_at=self._parse_timestamp(row['updated_at'])
+            )
+    
+    @staticmethod
+    def _parse_timestamp(value: Optional[str]) -> datetime:
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return datetime.now()
+    
+    def list_policies(self) -> List[str]:
+        """Names of all stored policies"""
+        with self.lock:
+            cursor = self.db_conn.cursor()
+            cursor.execute("SELECT name FROM tc_policies ORDER BY name")
+            return [row[0] for row in cursor.fetchall()]
+    
+    def delete_policy(self, name: str) -> bool:
+        """Delete a policy and its qdiscs, classes and filters"""
+        try:
+            with self.lock:
+                cursor = self.db_conn.cursor()
+                cursor.execute("SELECT id FROM tc_policies WHERE name = ?", (name,))
+                row = cursor.fetchone()
+                if not row:
+                    self.logger.error(f"Policy {name} not found")
+                    return False
+                
+                for table in ('tc_qdiscs', 'tc_classes', 'tc_filters'):
+                    cursor.execute(f"DELETE FROM {table} WHERE policy_id = ?", (row[0],))
+                cursor.execute("DELETE FROM tc_policies WHERE id = ?", (row[0],))
+                self.db_conn.commit()
+            
+            self.logger.info(f"Deleted TC policy: {name}")
+            return True
+        
+        except Exception as e:
+            self.db_conn.rollback()
+            self.logger.error(f"Failed to delete policy {name}: {e}")
+            return False
+    
+    def close(self):
+        """Release the netlink sockets and the standalone database connection"""
+        if self.tc_reader:
+            self.tc_reader.close()
+        if self.ipr:
+            self.ipr.close()
+        if not (self.db_manager and hasattr(self.db_manager, 'sqlite_conn')):
+            self.db_conn.close()
@@ -17,21 +17,27 @@ License: MIT
 import json
 import os
 import sqlite3
+import struct
 import subprocess
+import sys
 import tempfile
 import threading
 import time
 import unittest
 from datetime import datetime
 from pathlib import Path
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, mock_open
 
 # Import modules to test
+module_dir = Path(__file__).resolve().parent.parent
+for subdir in ('src', 'cli', 'web'):
+    sys.path.insert(0, str(module_dir / subdir))
+
 try:
     from tc_service import (
-        TCManager, TCInterface, TCQdisc, TCClass, TCFilter, TCPolicy
+        TCManager, TCInterface, TCQdisc, TCClass, TCFilter, TCPolicy, TCNetlinkReader
     )
-    from tcctl_cli import TCControlCLI
+    from tcctl import TCControlCLI
     from tc_web_api import TCWebAPI
 except ImportError as e:
     print(f"Warning: Could not import TC modules: {e}")
@@ -178,6 +184,78 @@ class TestTCFilter(unittest.TestCase):
         self.assertIn('filter', cmd)
         self.assertIn('u32', cmd)
 
+class TestTCNetlinkReader(unittest.TestCase):
+    """Test TCNetlinkReader decoding"""
+    
+    @staticmethod
+    def _attr(attr_type, payload):
+        length = 4 + len(payload)
+        return struct.pack("=HH", length, attr_type) + payload + b"\0" * (-length % 4)
+    
+    def test_format_handle(self):
+        """Handles render like tc output"""
+        self.assertEqual(TCNetlinkReader.format_handle(0x10000), "1:")
+        self.assertEqual(TCNetlinkReader.format_handle(0x10010), "1:10")
+        self.assertEqual(TCNetlinkReader.format_handle(0xFFFFFFFF), "root")
+        self.assertEqual(TCNetlinkReader.format_handle(0xFFFFFFF1), "ingress")
+    
+    def test_stats2_counters(self):
+        """Byte, packet and queue counters are read from TCA_STATS2"""
+        nested = (self._attr(1, struct.pack("=QI", 5_000_000_000, 4_000_000)) +
+                  self._attr(3, struct.pack("=5I", 2, 3000, 17, 1, 42)))
+        attrs = {TCNetlinkReader.TCA_STATS2: nested}
+        stats = TCNetlinkReader._stats(attrs)
+        
+        self.assertEqual(stats['bytes_sent'], 5_000_000_000)
+        self.assertEqual(stats['packets_sent'], 4_000_000)
+        self.assertEqual((stats['qlen'], stats['backlog'], stats['drops']), (2, 3000, 17))
+        self.assertEqual((stats['requeues'], stats['overlimits']), (1, 42))
+    
+    def test_htb_class_options(self):
+        """HTB class parameters decode to rates in bits per second"""
+        ratespec = lambda rate: struct.pack("=BBHhHI", 0, 1, 0, -1, 0, rate)
+        parms = ratespec(1_250_000) + ratespec(2_500_000) + struct.pack("=5I", 1600, 1600, 12500, 0, 3)
+        with patch.object(TCNetlinkReader, '_tick_in_usec', 1000 / 64):
+            options = TCNetlinkReader._options('htb', self._attr(1, parms), True)
+        
+        self.assertEqual(options['rate'], 10_000_000)
+        self.assertEqual(options['ceil'], 20_000_000)
+        self.assertEqual(options['prio'], 3)
+        # 1600 ticks of 64ns drain 128 bytes at the rate and 256 at the ceiling
+        self.assertEqual((options['burst'], options['cburst']), (128, 256))
+        self.assertNotIn('buffer', options)
+        self.assertEqual(TCNetlinkReader._options('sfq', self._attr(1, parms), True), {})
+    
+    def test_tbf_options(self):
+        """TBF buckets decode to bytes like tc's burst and minburst"""
+        ratespec = lambda rate: struct.pack("=BBHhHI", 0, 1, 0, -1, 0, rate)
+        parms = ratespec(125_000) + ratespec(250_000) + struct.pack("=3I", 10_000, 500_000, 25_000)
+        with patch.object(TCNetlinkReader, '_tick_in_usec', 1000 / 64):
+            options = TCNetlinkReader._options('tbf', self._attr(1, parms), False)
+        
+        self.assertEqual((options['rate'], options['peakrate'], options['limit']), (1_000_000, 2_000_000, 10_000))
+        self.assertEqual((options['burst'], options['minburst']), (4000, 400))
+    
+    def test_tick_in_usec(self):
+        """Tick length follows /proc/net/psched like tc"""
+        with patch.object(TCNetlinkReader, '_tick_in_usec', None), \
+                patch('builtins.open', mock_open(read_data="000003e8 00000040 000f4240 3b9aca00\n")):
+            self.assertEqual(TCNetlinkReader.tick_in_usec(), 15.625)
+    
+    @unittest.skipUnless(TCNetlinkReader.available(), "netlink not available")
+    def test_read_live_state(self):
+        """A live dump returns every requested interface"""
+        reader = TCNetlinkReader()
+        try:
+            state = reader.read(['lo', 'lnmt-missing0'])
+        finally:
+            reader.close()
+        
+        self.assertEqual(set(state), {'lo', 'lnmt-missing0'})
+        self.assertEqual(state['lnmt-missing0'], {'qdiscs': [], 'classes': [], 'filters': []})
+        for qdisc in state['lo']['qdiscs']:
+            self.assertIn('bytes_sent', qdisc['stats'])
+
 class TestTCManager(unittest.TestCase):
     """Test TCManager class"""
     
@@ -293,9 +371,59 @@ class TestTCManager(unittest.TestCase):
         retrieved_policy = self.tc_manager.get_policy("delete_test")
         self.assertIsNone(retrieved_policy)
     
+    def test_statistics_recorded_per_interface(self):
+        """Qdisc and class counters of an interface are read and stored"""
+        counters = dict.fromkeys(('bytes_sent', 'packets_sent', 'drops', 'overlimits',
+                                  'requeues', 'backlog', 'qlen', 'bps', 'pps'), 0)
+        state = {'eth0': {
+            'qdiscs': [{'handle': '1:', 'kind': 'htb', 'stats': dict(counters, bytes_sent=1500)}],
+            'classes': [{'classid': '1:10', 'kind': 'htb', 'stats': dict(counters, drops=3)}],
+            'filters': []
+        }}
+
+        with patch.object(self.tc_manager, 'get_tc_state',
+                          side_effect=lambda names=None: {n: state[n] for n in names if n in state}):
+            stats = self.tc_manager.get_statistics("eth0")
+            self.assertEqual(stats['qdisc_stats'][0]['bytes_sent'], 1500)
+            self.assertEqual(stats['class_stats'][0]['classid'], "1:10")
+            self.assertEqual(self.tc_manager.get_statistics("eth9"), {})
+
+            self.tc_manager.record_statistics("eth0")
+            self.tc_manager.record_statistics("eth9")
+
+        rows = self.tc_manager.db_conn.execute(
+            "SELECT interface, classid, bytes_sent, drops FROM tc_statistics ORDER BY classid"
+        ).fetchall()
+        self.assertEqual([tuple(row) for row in rows],
+                         [("eth0", "1:", 1500, 0), ("eth0", "1:10", 0, 3)])
+
     @patch('subprocess.run')
     def test_interface_discovery_fallback(self, mock_subprocess):
         """Test interface discovery fallback method"""
         # Mock /proc/net/dev content
         mock_proc_content = """Inter-|   Receive                                                |  Transmit
- face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo col
\ No newline at end of file
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+  eth0: 1000000    1000    0    0    0     0          0         0  2000000    2000    0    0    0     0       0          0
+"""
+        
+        def run(cmd, **kwargs):
+            if cmd[1] == 'link':
+                stdout = ("2: eth0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc htb state UP mode DEFAULT\n"
+                          "    link/ether 00:11:22:33:44:55 brd ff:ff:ff:ff:ff:ff\n")
+            else:
+                stdout = ("2: eth0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc htb state UP\n"
+                          "    inet 192.168.1.100/24 brd 192.168.1.255 scope global eth0\n")
+            return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr='')
+        
+        mock_subprocess.side_effect = run
+        with patch('builtins.open', mock_open(read_data=mock_proc_content)):
+            interfaces = self.tc_manager._discover_interfaces_fallback()
+        
+        self.assertEqual(len(interfaces), 1)
+        self.assertEqual(interfaces[0].name, "eth0")
+        self.assertEqual((interfaces[0].index, interfaces[0].mtu, interfaces[0].state), (2, 1500, "UP"))
+        self.assertEqual(interfaces[0].ip_addresses, ["192.168.1.100"])
+
+
+if __name__ == '__main__':
+    unittest.main()
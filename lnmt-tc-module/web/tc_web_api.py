@@ -1,3 +1,115 @@
+#!/usr/bin/env python3
+"""
+LNMT TC Web API and Dashboard
+REST API and web interface for Traffic Control and Quality of Service management
+
+Features:
+- REST API endpoints for all TC operations
+- Web dashboard with real-time statistics
+- Policy management interface
+- Live monitoring with WebSocket support
+- Import/export functionality
+
+Author: LNMT Development Team
+License: MIT
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+import threading
+import asyncio
+import websockets
+import yaml
+
+from flask import Flask, request, jsonify, render_template, send_file, redirect, url_for
+from flask_cors import CORS
+from werkzeug.utils import secure_filename
+
+# Import TC service from the module's src directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+try:
+    from tc_service import TCManager, TCPolicy, TCQdisc, TCClass, TCFilter
+except ImportError:
+    print("Warning: tc_service module not found. Some functionality may be limited.")
+    TCManager = None
+
+class TCWebAPI:
+    """TC Web API and Dashboard"""
+    
+    def __init__(self, host='0.0.0.0', port=8080, debug=False):
+        self.host = host
+        self.port = port
+        self.debug = debug
+        self.app = Flask(__name__, template_folder='templates', static_folder='static')
+        CORS(self.app)
+        
+        # Initialize TC Manager
+        if TCManager:
+            self.tc_manager = TCManager()
+        else:
+            self.tc_manager = None
+        
+        # WebSocket clients for real-time updates
+        self.websocket_clients = set()
+        
+        # Setup routes
+        self._setup_routes()
+        
+        # Setup logging
+        self.logger = logging.getLogger(__name__)
+        
+        # Start background tasks
+        self._start_background_tasks()
+    
+    def _setup_routes(self):
+        """Setup Flask routes"""
+        
+        # Web dashboard routes
+        @self.app.route('/')
+        def index():
+            return render_template('tc_dashboard.html')
+        
+        @self.app.route('/policies')
+        def policies_page():
+            return render_template('tc_policies.html')
+        
+        @self.app.route('/interfaces')
+        def interfaces_page():
+            return render_template('tc_interfaces.html')
+        
+        @self.app.route('/monitoring')
+        def monitoring_page():
+            return render_template('tc_monitoring.html')
+        
+        # API routes
+        @self.app.route('/api/interfaces', methods=['GET'])
+        def api_get_interfaces():
+            try:
+                if not self.tc_manager:
+                    return jsonify({'error': 'TC Manager not available'}), 500
+                
+                interfaces = self.tc_manager.discover_interfaces()
+                return jsonify([{
+                    'name': iface.name,
+                    'type': iface.type,
+                    'state': iface.state,
+                    'mtu': iface.mtu,
+                    'mac_address': iface.mac_address,
+                    'ip_addresses': iface.ip_addresses,
+                    'speed': iface.speed,
+                    'duplex': iface.duplex
+                } for iface in interfaces])
+                
+            except Exception as e:
+                self.logger.error(f"Error getting interfaces: {e}")
+                return jsonify({'error': str(e)}), 500
+        
         @self.app.route('/api/interfaces/<interface_name>/status', methods=['GET'])
         def api_get_interface_status(interface_name):
             try:
@@ -381,21 +493,20 @@
             while True:
                 try:
                     if self.tc_manager:
-                        # Get all interfaces
-                        interfaces = self.tc_manager.discover_interfaces()
+                        # One netlink dump covers every interface's TC state and counters
+                        state = self.tc_manager.get_tc_state()
                         
                         # Collect statistics for each interface with TC config
-                        for interface in interfaces:
-                            config = self.tc_manager.get_current_tc_config(interface.name)
+                        for interface_name, config in state.items():
                             if any(config.values()):  # Has TC configuration
-                                stats = self.tc_manager.get_statistics(interface.name)
-                                self.tc_manager.record_statistics(interface.name)
+                                stats = self.tc_manager.get_statistics(interface_name, config)
+                                self.tc_manager.record_statistics(interface_name, stats)
                                 
                                 # Send to WebSocket clients
                                 if stats and self.websocket_clients:
                                     message = {
                                         'type': 'statistics',
-                                        'interface': interface.name,
+                                        'interface': interface_name,
                                         'data': stats,
                                         'timestamp': datetime.now().isoformat()
                                     }
@@ -802,114 +913,4 @@ if __name__ == '__main__':
     # Start web server
     api = TCWebAPI(host=args.host, port=args.port, debug=args.debug)
     print(f"Starting LNMT TC Web API on {args.host}:{args.port}")
-    api.run()#!/usr/bin/env python3
-"""
-LNMT TC Web API and Dashboard
-REST API and web interface for Traffic Control and Quality of Service management
-
-Features:
-- REST API endpoints for all TC operations
-- Web dashboard with real-time statistics
-- Policy management interface
-- Live monitoring with WebSocket support
-- Import/export functionality
-
-Author: LNMT Development Team
-License: MIT
-"""
-
-import json
-import logging
-import os
-import time
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, List, Optional, Any
-import threading
-import asyncio
-import websockets
-import yaml
-
-from flask import Flask, request, jsonify, render_template, send_file, redirect, url_for
-from flask_cors import CORS
-from werkzeug.utils import secure_filename
-
-# Import TC service
-try:
-    from tc_service import TCManager, TCPolicy, TCQdisc, TCClass, TCFilter
-except ImportError:
-    print("Warning: tc_service module not found. Some functionality may be limited.")
-    TCManager = None
-
-class TCWebAPI:
-    """TC Web API and Dashboard"""
-    
-    def __init__(self, host='0.0.0.0', port=8080, debug=False):
-        self.host = host
-        self.port = port
-        self.debug = debug
-        self.app = Flask(__name__, template_folder='templates', static_folder='static')
-        CORS(self.app)
-        
-        # Initialize TC Manager
-        if TCManager:
-            self.tc_manager = TCManager()
-        else:
-            self.tc_manager = None
-        
-        # WebSocket clients for real-time updates
-        self.websocket_clients = set()
-        
-        # Setup routes
-        self._setup_routes()
-        
-        # Setup logging
-        self.logger = logging.getLogger(__name__)
-        
-        # Start background tasks
-        self._start_background_tasks()
-    
-    def _setup_routes(self):
-        """Setup Flask routes"""
-        
-        # Web dashboard routes
-        @self.app.route('/')
-        def index():
-            return render_template('tc_dashboard.html')
-        
-        @self.app.route('/policies')
-        def policies_page():
-            return render_template('tc_policies.html')
-        
-        @self.app.route('/interfaces')
-        def interfaces_page():
-            return render_template('tc_interfaces.html')
-        
-        @self.app.route('/monitoring')
-        def monitoring_page():
-            return render_template('tc_monitoring.html')
-        
-        # API routes
-        @self.app.route('/api/interfaces', methods=['GET'])
-        def api_get_interfaces():
-            try:
-                if not self.tc_manager:
-                    return jsonify({'error': 'TC Manager not available'}), 500
-                
-                interfaces = self.tc_manager.discover_interfaces()
-                return jsonify([{
-                    'name': iface.name,
-                    'type': iface.type,
-                    'state': iface.state,
-                    'mtu': iface.mtu,
-                    'mac_address': iface.mac_address,
-                    'ip_addresses': iface.ip_addresses,
-                    'speed': iface.speed,
-                    'duplex': iface.duplex
-                } for iface in interfaces])
-                
-            except Exception as e:
-                self.logger.error(f"Error getting interfaces: {e}")
-                return jsonify({'error': str(e)}), 500
-        
-        @self.app.route('/api/interfaces/<interface_name>/status', methods
\ No newline at end of file
+    api.run()
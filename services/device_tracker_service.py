@@ -14,6 +14,7 @@ CLI usage:
 """
 
 import sqlite3
+import os
 import time
 import logging
 import json
@@ -21,12 +22,21 @@ import re
 import hashlib
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Set
-from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple, Set
+from dataclasses import dataclass, asdict, field
 from contextlib import contextmanager
+from collections import defaultdict
 import threading
+import weakref
 import signal
 import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+import csv
+import bisect
+from array import array
 
 # Setup logging
 logging.basicConfig(
@@ -61,16 +71,196 @@ class Device:
 class DeviceEvent:
     """Represents a device-related event"""
     timestamp: datetime
-    event_type: str  # 'new_device', 'mac_change', 'ip_change', 'hostname_change', 'randomized_mac'
+    event_type: str  # 'new_device', 'mac_change', 'ip_change', 'hostname_change', 'randomized_mac', 'lease_expired'
     mac_address: str
     old_value: Optional[str] = None
     new_value: Optional[str] = None
     description: str = ""
 
+@dataclass
+class HistoryRetention:
+    """Retention policy for device history"""
+    raw_days: int = 7          # keep raw transition rows this long
+    interval_days: int = 365   # keep compacted per-day interval partitions this long
+
+class OUIDatabase:
+    """
+    IEEE MA-L/MA-M/MA-S vendor registry with longest-prefix lookup
+    
+    Prefixes are kept as sorted unsigned integer arrays (one per prefix
+    length: 36, 28 and 24 bits) with a parallel array of vendor-name
+    indices, so lookups are a bisect per length and the whole registry
+    costs a few hundred KB. Parsed registries are written to a binary
+    cache that is reused until a source CSV changes.
+    
+    Example:
+        ouis = OUIDatabase.load()
+        ouis.lookup("b8:27:eb:12:34:56")  # 'Raspberry Pi Foundation'
+    """
+    
+    # Debian/Ubuntu ieee-data package layout
+    DEFAULT_SOURCES = (
+        '/usr/share/ieee-data/oui.csv',
+        '/usr/share/ieee-data/mam.csv',
+        '/usr/share/ieee-data/oui36.csv',
+    )
+    DEFAULT_CACHE = '/var/lib/lnmt/oui.cache'
+    
+    PREFIX_BITS = (36, 28, 24)  # longest first
+    
+    _MAGIC = b'LNMTOUI1'
+    _HEADER = struct.Struct('<8s20s3II')  # magic, source fingerprint, 3 counts, vendor blob size
+    
+    def __init__(self):
+        self.vendors: List[str] = []
+        self.prefixes: Dict[int, array] = {bits: array('Q') for bits in self.PREFIX_BITS}
+        self.vendor_ids: Dict[int, array] = {bits: array('I') for bits in self.PREFIX_BITS}
+    
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self.prefixes.values())
+    
+    @staticmethod
+    def mac_to_int(mac: str) -> Optional[int]:
+        """Convert a MAC address in any common notation to a 48-bit integer"""
+        clean = mac.replace(':', '').replace('-', '').replace('.', '')
+        if len(clean) != 12:
+            return None
+        try:
+            return int(clean, 16)
+        except ValueError:
+            return None
+    
+    def lookup(self, mac: str) -> Optional[str]:
+        """Return the vendor owning the longest registered prefix of mac"""
+        value = self.mac_to_int(mac)
+        if value is None:
+            return None
+        return self.lookup_int(value)
+    
+    def lookup_int(self, value: int) -> Optional[str]:
+        for bits in self.PREFIX_BITS:
+            keys = self.prefixes[bits]
+            key = value >> (48 - bits)
+            pos = bisect.bisect_left(keys, key)
+            if pos < len(keys) and keys[pos] == key:
+                return self.vendors[self.vendor_ids[bits][pos]]
+        return None
+    
+    @classmethod
+    def from_csv(cls, paths: List[str]) -> 'OUIDatabase':
+        """Parse IEEE registry CSV exports (Registry,Assignment,Organization Name,...)"""
+        entries: Dict[int, Dict[int, str]] = {bits: {} for bits in cls.PREFIX_BITS}
+        for path in paths:
+            with open(path, newline='', encoding='utf-8', errors='replace') as f:
+                for row in csv.reader(f):
+                    if len(row) < 3 or row[0] == 'Registry':
+                        continue
+                    assignment = row[1].strip()
+                    bits = len(assignment) * 4
+                    if bits not in entries:
+                        continue
+                    try:
+                        entries[bits][int(assignment, 16)] = row[2].strip()
+                    except ValueError:
+                        continue
+        
+        db = cls()
+        vendor_index: Dict[str, int] = {}
+        for bits, prefixes in entries.items():
+            for prefix in sorted(prefixes):
+                vendor = prefixes[prefix]
+                if vendor not in vendor_index:
+                    vendor_index[vendor] = len(db.vendors)
+                    db.vendors.append(vendor)
+                db.prefixes[bits].append(prefix)
+                db.vendor_ids[bits].append(vendor_index[vendor])
+        return db
+    
+    @staticmethod
+    def _fingerprint(paths: List[str]) -> bytes:
+        """Identify a set of source files by path, size and mtime"""
+        digest = hashlib.sha1()
+        for path in paths:
+            st = os.stat(path)
+            digest.update(f"{path}:{st.st_size}:{st.st_mtime_ns};".encode())
+        return digest.digest()
+    
+    def save_cache(self, cache_path: str, fingerprint: bytes):
+        """Write the index in native byte order; the cache is host-local"""
+        blob = '\n'.join(self.vendors).encode('utf-8')
+        counts = [len(self.prefixes[bits]) for bits in self.PREFIX_BITS]
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(self._HEADER.pack(self._MAGIC, fingerprint, *counts, len(blob)))
+            for bits in self.PREFIX_BITS:
+                self.prefixes[bits].tofile(f)
+                self.vendor_ids[bits].tofile(f)
+            f.write(blob)
+        os.replace(temp_path, cache_path)
+    
+    @classmethod
+    def load_cache(cls, cache_path: str,
+                   fingerprint: Optional[bytes] = None) -> Optional['OUIDatabase']:
+        """Load a cache file; returns None if missing, corrupt or built from other sources"""
+        try:
+            with open(cache_path, 'rb') as f:
+                header = f.read(cls._HEADER.size)
+                magic, stored_fingerprint, *counts, blob_size = cls._HEADER.unpack(header)
+                if magic != cls._MAGIC:
+                    return None
+                if fingerprint is not None and stored_fingerprint != fingerprint:
+                    return None
+                
+                db = cls()
+                for bits, count in zip(cls.PREFIX_BITS, counts):
+                    db.prefixes[bits].fromfile(f, count)
+                    db.vendor_ids[bits].fromfile(f, count)
+                blob = f.read(blob_size)
+        except (OSError, EOFError, struct.error):
+            return None
+        
+        db.vendors = blob.decode('utf-8').split('\n') if blob else []
+        return db
+    
+    @classmethod
+    def load(cls, sources: Tuple[str, ...] = DEFAULT_SOURCES,
+             cache_path: Optional[str] = DEFAULT_CACHE) -> 'OUIDatabase':
+        """
+        Load the registry, preferring an up-to-date cache over re-parsing CSVs
+        
+        Missing source files are skipped; with no sources at all an existing
+        cache is used as-is, otherwise an empty database is returned.
+        """
+        paths = [path for path in sources if os.path.isfile(path)]
+        
+        if not paths:
+            db = cls.load_cache(cache_path) if cache_path else None
+            if db is None:
+                logger.info("No IEEE OUI registry found, using built-in vendor table only")
+                return cls()
+            return db
+        
+        fingerprint = cls._fingerprint(paths)
+        if cache_path:
+            db = cls.load_cache(cache_path, fingerprint)
+            if db is not None:
+                return db
+        
+        db = cls.from_csv(paths)
+        logger.info(f"Loaded {len(db)} OUI prefixes from {len(paths)} registry file(s)")
+        if cache_path:
+            try:
+                db.save_cache(cache_path, fingerprint)
+            except OSError as e:
+                logger.warning(f"Could not write OUI cache {cache_path}: {e}")
+        return db
+
 class MACAnalyzer:
-    """Analyzes MAC addresses for randomization patterns"""
+    """Analyzes MAC addresses for randomization patterns and vendor"""
     
-    # Known OUI prefixes for major vendors
+    # Known OUI prefixes for major vendors; checked before the IEEE registry
+    # so virtualization platforms report a useful name
     VENDOR_OUIS = {
         '00:50:56': 'VMware',
         '08:00:27': 'VirtualBox',
@@ -83,6 +273,10 @@ class MACAnalyzer:
         '68:96:7b': 'Apple',
         '70:56:81': 'Apple',
     }
+    _VENDOR_OUIS_LOWER = {oui.lower(): vendor for oui, vendor in VENDOR_OUIS.items()}
+    
+    def __init__(self, oui_db: Optional[OUIDatabase] = None):
+        self.oui_db = oui_db
     
     @staticmethod
     def is_randomized_mac(mac: str) -> bool:
@@ -112,28 +306,84 @@ class MACAnalyzer:
         if locally_administered and not_multicast:
             # Additional heuristics for randomization
             oui = mac[:8].lower()
-            if oui not in [k.lower() for k in MACAnalyzer.VENDOR_OUIS.keys()]:
+            if oui not in MACAnalyzer._VENDOR_OUIS_LOWER:
                 return True
                 
         return False
     
-    @staticmethod
-    def get_vendor(mac: str) -> Optional[str]:
+    def get_vendor(self, mac: str) -> Optional[str]:
         """Get vendor from MAC OUI"""
         if not mac or len(mac) < 8:
             return None
-            
-        oui = mac[:8].upper()
-        return MACAnalyzer.VENDOR_OUIS.get(oui)
+        
+        vendor = self._VENDOR_OUIS_LOWER.get(mac[:8].lower())
+        if vendor is None and self.oui_db is not None:
+            vendor = self.oui_db.lookup(mac)
+        return vendor
+    
+    def classify_many(self, macs: List[str]) -> Dict[str, Tuple[Optional[str], bool]]:
+        """
+        Classify a batch of MACs as {mac: (vendor, is_randomized)}
+        
+        Each distinct OUI is resolved once per call.
+        """
+        results = {}
+        vendors_by_oui: Dict[str, Optional[str]] = {}
+        for mac in macs:
+            if mac in results:
+                continue
+            oui = mac[:8].lower()
+            if oui not in vendors_by_oui:
+                vendors_by_oui[oui] = self.get_vendor(mac)
+            results[mac] = (vendors_by_oui[oui], self.is_randomized_mac(mac))
+        return results
+
+class _ThreadConnection:
+    """A thread's SQLite connection, closed when the owning thread exits"""
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        # Thread-local storage is dropped at thread exit, which runs this
+        self.close = weakref.finalize(self, conn.close)
+
 
 class DeviceDatabase:
-    """Manages SQLite database for device tracking"""
+    """
+    Manages SQLite database for device tracking
+    
+    Each thread keeps one long-lived connection in WAL mode, so readers
+    (CLI, web API) never block the tracker's writes. A connection closes
+    when its thread exits or on close(). Wrap a poll cycle in batch() to
+    land all of its writes in a single transaction.
+    """
+    
+    # Applied to every new connection
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-16000",   # 16 MB page cache
+        "PRAGMA mmap_size=67108864",  # 64 MB memory-mapped I/O
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
+    
+    # SQLite caps bound parameters per statement; keep IN (...) lists below it
+    QUERY_CHUNK = 500
     
-    def __init__(self, db_path: str = "/var/lib/lnmt/device_tracker.db"):
+    PARTITION_PREFIX = 'device_history_'
+    
+    # Devices whose old history compact_history() folds per transaction
+    COMPACT_CHUNK = 500
+    
+    def __init__(self, db_path: str = "/var/lib/lnmt/device_tracker.db",
+                 retention: Optional[HistoryRetention] = None):
         self.db_path = db_path
+        self.retention = retention or HistoryRetention()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: "weakref.WeakSet[_ThreadConnection]" = weakref.WeakSet()
         self._ensure_db_dir()
         self._init_database()
-        self._lock = threading.Lock()
     
     def _ensure_db_dir(self):
         """Ensure database directory exists"""
@@ -176,26 +426,103 @@ class DeviceDatabase:
                     description TEXT
                 );
                 
+                -- Catalog of per-day compacted interval tables (device_history_YYYYMMDD)
+                CREATE TABLE IF NOT EXISTS device_history_partitions (
+                    day TEXT PRIMARY KEY,
+                    table_name TEXT NOT NULL,
+                    interval_count INTEGER DEFAULT 0
+                );
+                
                 CREATE INDEX IF NOT EXISTS idx_device_history_mac ON device_history(mac_address);
+                CREATE INDEX IF NOT EXISTS idx_device_history_mac_timestamp ON device_history(mac_address, timestamp);
                 CREATE INDEX IF NOT EXISTS idx_device_history_timestamp ON device_history(timestamp);
                 CREATE INDEX IF NOT EXISTS idx_device_events_timestamp ON device_events(timestamp);
                 CREATE INDEX IF NOT EXISTS idx_device_events_type ON device_events(event_type);
             """)
     
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's persistent connection, opening it on first use"""
+        holder = getattr(self._local, 'conn', None)
+        if holder is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            holder = _ThreadConnection(conn)
+            self._local.conn = holder
+            self._local.batch_depth = 0
+            with self._lock:
+                self._connections.add(holder)
+        return holder.conn
+    
     @contextmanager
     def _get_connection(self):
-        """Get database connection with proper locking"""
+        """Get this thread's connection; commits unless an enclosing batch() owns the transaction"""
+        conn = self._connection()
+        if self._local.batch_depth:
+            yield conn
+            return
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group writes into one transaction, committed on exit
+        
+        Example:
+            with db.batch():
+                db.save_devices(devices)
+                db.add_events(events)
+        """
+        conn = self._connection()
+        self._local.batch_depth += 1
+        try:
+            yield conn
+        except Exception:
+            self._local.batch_depth -= 1
+            if not self._local.batch_depth:
+                conn.rollback()
+            raise
+        else:
+            self._local.batch_depth -= 1
+            if not self._local.batch_depth:
+                conn.commit()
+    
+    def close(self):
+        """Close the connections of all threads"""
         with self._lock:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-            conn.row_factory = sqlite3.Row
+            holders = list(self._connections)
+            self._connections = weakref.WeakSet()
+            self._local = threading.local()
+        for holder in holders:
             try:
-                yield conn
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise
-            finally:
-                conn.close()
+                holder.close()
+            except sqlite3.Error:
+                pass
+    
+    @staticmethod
+    def _row_to_device(row: sqlite3.Row) -> Device:
+        return Device(
+            mac_address=row['mac_address'],
+            ip_address=row['ip_address'],
+            hostname=row['hostname'],
+            first_seen=row['first_seen'],
+            last_seen=row['last_seen'],
+            lease_expires=row['lease_expires'],
+            vendor=row['vendor'],
+            device_type=row['device_type'],
+            is_randomized_mac=bool(row['is_randomized_mac']),
+            alert_flags=json.loads(row['alert_flags'] or '[]')
+        )
     
     def get_device(self, mac_address: str) -> Optional[Device]:
         """Get device by MAC address"""
@@ -206,88 +533,301 @@ class DeviceDatabase:
             ).fetchone()
             
             if row:
-                return Device(
-                    mac_address=row['mac_address'],
-                    ip_address=row['ip_address'],
-                    hostname=row['hostname'],
-                    first_seen=row['first_seen'],
-                    last_seen=row['last_seen'],
-                    lease_expires=row['lease_expires'],
-                    vendor=row['vendor'],
-                    device_type=row['device_type'],
-                    is_randomized_mac=bool(row['is_randomized_mac']),
-                    alert_flags=json.loads(row['alert_flags'] or '[]')
-                )
+                return self._row_to_device(row)
         return None
     
+    def get_devices(self, mac_addresses: List[str]) -> Dict[str, Device]:
+        """Get several devices by MAC address, keyed by MAC"""
+        devices = {}
+        macs = list(mac_addresses)
+        with self._get_connection() as conn:
+            for start in range(0, len(macs), self.QUERY_CHUNK):
+                chunk = macs[start:start + self.QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT * FROM devices WHERE mac_address IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for row in rows:
+                    devices[row['mac_address']] = self._row_to_device(row)
+        return devices
+    
     def save_device(self, device: Device):
         """Save or update device"""
+        self.save_devices([device])
+    
+    def save_devices(self, devices: List[Device]):
+        """Save or update several devices in one statement"""
         with self._get_connection() as conn:
-            conn.execute("""
+            conn.executemany("""
                 INSERT OR REPLACE INTO devices 
                 (mac_address, ip_address, hostname, first_seen, last_seen, 
                  lease_expires, vendor, device_type, is_randomized_mac, alert_flags)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            """, [(
                 device.mac_address, device.ip_address, device.hostname,
                 device.first_seen, device.last_seen, device.lease_expires,
                 device.vendor, device.device_type, device.is_randomized_mac,
                 json.dumps(device.alert_flags)
-            ))
+            ) for device in devices])
+    
+    def touch_device(self, mac_address: str, last_seen: datetime,
+                     lease_expires: Optional[datetime] = None):
+        """Update seen/expiry timestamps of a device whose lease was renewed"""
+        self.touch_devices([(mac_address, last_seen, lease_expires)])
+    
+    def touch_devices(self, updates: List[Tuple[str, datetime, Optional[datetime]]]):
+        """Update seen/expiry timestamps from (mac, last_seen, lease_expires) tuples"""
+        with self._get_connection() as conn:
+            conn.executemany("""
+                UPDATE devices SET last_seen = ?, lease_expires = ?
+                WHERE mac_address = ?
+            """, [(last_seen, expires, mac) for mac, last_seen, expires in updates])
     
     def add_history_entry(self, mac_address: str, ip_address: str, 
                          hostname: str, lease_expires: Optional[datetime] = None):
         """Add device history entry"""
+        self.add_history_entries([(mac_address, ip_address, hostname, lease_expires)])
+    
+    def add_history_entries(self, entries: List[Tuple[str, str, str, Optional[datetime]]],
+                            timestamp: Optional[datetime] = None):
+        """Add history entries from (mac, ip, hostname, lease_expires) tuples"""
+        timestamp = timestamp or datetime.now()
         with self._get_connection() as conn:
-            conn.execute("""
+            conn.executemany("""
                 INSERT INTO device_history 
                 (mac_address, ip_address, hostname, timestamp, lease_expires)
                 VALUES (?, ?, ?, ?, ?)
-            """, (mac_address, ip_address, hostname, datetime.now(), lease_expires))
+            """, [(mac, ip, hostname, timestamp, expires)
+                  for mac, ip, hostname, expires in entries])
     
     def add_event(self, event: DeviceEvent):
         """Add device event"""
+        self.add_events([event])
+    
+    def add_events(self, events: List[DeviceEvent]):
+        """Add several device events in one statement"""
         with self._get_connection() as conn:
-            conn.execute("""
+            conn.executemany("""
                 INSERT INTO device_events 
                 (timestamp, event_type, mac_address, old_value, new_value, description)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (
+            """, [(
                 event.timestamp, event.event_type, event.mac_address,
                 event.old_value, event.new_value, event.description
-            ))
+            ) for event in events])
     
     def get_all_devices(self) -> List[Device]:
         """Get all devices"""
-        devices = []
         with self._get_connection() as conn:
             rows = conn.execute("SELECT * FROM devices ORDER BY last_seen DESC").fetchall()
-            for row in rows:
-                devices.append(Device(
-                    mac_address=row['mac_address'],
-                    ip_address=row['ip_address'],
-                    hostname=row['hostname'],
-                    first_seen=row['first_seen'],
-                    last_seen=row['last_seen'],
-                    lease_expires=row['lease_expires'],
-                    vendor=row['vendor'],
-                    device_type=row['device_type'],
-                    is_randomized_mac=bool(row['is_randomized_mac']),
-                    alert_flags=json.loads(row['alert_flags'] or '[]')
-                ))
-        return devices
+            return [self._row_to_device(row) for row in rows]
     
     def get_device_history(self, mac_address: str, days: int = 30) -> List[Dict]:
-        """Get device history"""
-        cutoff = datetime.now() - timedelta(days=days)
+        """
+        Get device history, newest first
+        
+        Raw rows still inside the retention window are returned as stored;
+        older history comes from the compacted interval partitions, with
+        'timestamp' set to the interval start and an extra 'end_time' key.
+        """
+        now = datetime.now()
+        cutoff = now - timedelta(days=days)
         with self._get_connection() as conn:
             rows = conn.execute("""
                 SELECT * FROM device_history 
                 WHERE mac_address = ? AND timestamp > ?
                 ORDER BY timestamp DESC
             """, (mac_address, cutoff)).fetchall()
+            history = [dict(row) for row in rows]
+        
+        for interval in self.get_device_intervals(mac_address, cutoff, now):
+            history.append({
+                'mac_address': interval['mac_address'],
+                'ip_address': interval['ip_address'],
+                'hostname': interval['hostname'],
+                'timestamp': interval['start_time'],
+                'end_time': interval['end_time'],
+                'lease_expires': None,
+            })
+        
+        history.sort(key=lambda entry: entry['timestamp'], reverse=True)
+        return history
+    
+    @classmethod
+    def _partition_table(cls, day: str) -> str:
+        return f"{cls.PARTITION_PREFIX}{day}"
+    
+    @staticmethod
+    def _split_by_day(start: datetime, end: datetime) -> List[Tuple[str, datetime, datetime]]:
+        """Split [start, end) at midnight into (YYYYMMDD, start, end) pieces"""
+        pieces = []
+        while start < end:
+            next_midnight = datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
+            piece_end = min(end, next_midnight)
+            pieces.append((start.strftime('%Y%m%d'), start, piece_end))
+            start = piece_end
+        return pieces
+    
+    def compact_history(self, now: Optional[datetime] = None,
+                        chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Fold raw history older than retention.raw_days into per-day interval partitions
+        
+        Consecutive rows with the same IP/hostname collapse into one
+        "MAC had IP X from t1 to t2" interval that ends at the next
+        transition, or at lease expiry if the device left. The newest row of
+        a device that is still holding its lease stays raw until superseded.
+        Partitions older than retention.interval_days are dropped.
+        
+        Devices are compacted chunk_size (COMPACT_CHUNK) at a time, each
+        chunk in its own transaction, so neither memory use nor the time
+        the write lock is held grows with the backlog.
+        
+        Returns counts of compacted rows, written intervals and dropped partitions.
+        """
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=self.retention.raw_days)
+        chunk_size = chunk_size or self.COMPACT_CHUNK
+        stats = {'compacted_rows': 0, 'intervals': 0, 'dropped_partitions': 0}
+        
+        last_mac = ''
+        while True:
+            with self.batch() as conn:
+                macs = [row[0] for row in conn.execute("""
+                    SELECT DISTINCT mac_address FROM device_history
+                    WHERE timestamp < ? AND mac_address > ?
+                    ORDER BY mac_address
+                    LIMIT ?
+                """, (cutoff, last_mac, chunk_size))]
+                if not macs:
+                    break
+                self._compact_devices(conn, macs[0], macs[-1], cutoff, stats)
+                last_mac = macs[-1]
+        
+        with self.batch() as conn:
+            expired_day = (now - timedelta(days=self.retention.interval_days)).strftime('%Y%m%d')
+            for day, table in conn.execute(
+                "SELECT day, table_name FROM device_history_partitions WHERE day < ?",
+                (expired_day,)
+            ).fetchall():
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute("DELETE FROM device_history_partitions WHERE day = ?", (day,))
+                stats['dropped_partitions'] += 1
+        
+        return stats
+    
+    def _compact_devices(self, conn: sqlite3.Connection, first_mac: str, last_mac: str,
+                         cutoff: datetime, stats: Dict[str, int]):
+        """Compact the old history of devices first_mac..last_mac (see compact_history)"""
+        rows = conn.execute("""
+            SELECT id, mac_address, ip_address, hostname, timestamp, lease_expires
+            FROM device_history
+            WHERE mac_address BETWEEN ? AND ? AND timestamp < ?
+            ORDER BY mac_address, timestamp, id
+        """, (first_mac, last_mac, cutoff)).fetchall()
+        # Aggregates bypass PARSE_DECLTYPES, so convert the timestamps here
+        next_transition = {
+            mac: datetime.fromisoformat(timestamp)
+            for mac, timestamp in conn.execute("""
+                SELECT mac_address, MIN(timestamp) FROM device_history
+                WHERE mac_address BETWEEN ? AND ? AND timestamp >= ?
+                GROUP BY mac_address
+            """, (first_mac, last_mac, cutoff)).fetchall()
+        }
+        # Renewals only update the devices row, so it holds the current expiry
+        current_expiry = dict(conn.execute(
+            "SELECT mac_address, lease_expires FROM devices WHERE mac_address BETWEEN ? AND ?",
+            (first_mac, last_mac)
+        ).fetchall())
+        
+        intervals: List[List] = []  # [mac, ip, hostname, start, end]
+        compacted_ids = []
+        for index, row in enumerate(rows):
+            mac = row['mac_address']
+            is_last = index + 1 == len(rows) or rows[index + 1]['mac_address'] != mac
+            end = rows[index + 1]['timestamp'] if not is_last else next_transition.get(mac)
+            expires = row['lease_expires']
+            if end is None and mac in current_expiry:
+                expires = current_expiry[mac]
+            
+            if expires and row['timestamp'] <= expires < cutoff and (end is None or expires < end):
+                end = expires
+            if end is None:
+                continue  # still the device's current state
+            
+            compacted_ids.append((row['id'],))
+            previous = intervals[-1] if intervals else None
+            if (previous and previous[0] == mac and previous[1] == row['ip_address'] and
+                    previous[2] == row['hostname'] and previous[4] >= row['timestamp']):
+                previous[4] = max(previous[4], end)
+            else:
+                intervals.append([mac, row['ip_address'], row['hostname'], row['timestamp'], end])
+        
+        by_day: Dict[str, List[Tuple]] = defaultdict(list)
+        for mac, ip, hostname, start, end in intervals:
+            for day, piece_start, piece_end in self._split_by_day(start, end):
+                by_day[day].append((mac, ip, hostname, piece_start, piece_end))
+        
+        for day, pieces in by_day.items():
+            table = self._partition_table(day)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    mac_address TEXT,
+                    ip_address TEXT,
+                    hostname TEXT,
+                    start_time TIMESTAMP,
+                    end_time TIMESTAMP
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_mac ON {table}(mac_address, start_time)")
+            conn.executemany(f"""
+                INSERT INTO {table} (mac_address, ip_address, hostname, start_time, end_time)
+                VALUES (?, ?, ?, ?, ?)
+            """, pieces)
+            conn.execute("""
+                INSERT INTO device_history_partitions (day, table_name, interval_count)
+                VALUES (?, ?, ?)
+                ON CONFLICT(day) DO UPDATE SET interval_count = interval_count + excluded.interval_count
+            """, (day, table, len(pieces)))
+            stats['intervals'] += len(pieces)
+        
+        conn.executemany("DELETE FROM device_history WHERE id = ?", compacted_ids)
+        stats['compacted_rows'] += len(compacted_ids)
+    
+    def get_device_intervals(self, mac_address: str, start: datetime,
+                             end: datetime) -> List[Dict]:
+        """
+        Get compacted intervals overlapping [start, end), oldest first
+        
+        Only the day partitions covering the range are read; intervals that
+        were split at midnight are stitched back together.
+        """
+        intervals: List[Dict] = []
+        with self._get_connection() as conn:
+            tables = conn.execute("""
+                SELECT table_name FROM device_history_partitions
+                WHERE day BETWEEN ? AND ?
+                ORDER BY day
+            """, (start.strftime('%Y%m%d'), end.strftime('%Y%m%d'))).fetchall()
             
-            return [dict(row) for row in rows]
+            for (table,) in tables:
+                rows = conn.execute(f"""
+                    SELECT mac_address, ip_address, hostname, start_time, end_time
+                    FROM {table}
+                    WHERE mac_address = ? AND end_time > ? AND start_time < ?
+                    ORDER BY start_time
+                """, (mac_address, start, end)).fetchall()
+                
+                for row in rows:
+                    previous = intervals[-1] if intervals else None
+                    if (previous and previous['ip_address'] == row['ip_address'] and
+                            previous['hostname'] == row['hostname'] and
+                            previous['end_time'] == row['start_time']):
+                        previous['end_time'] = row['end_time']
+                    else:
+                        intervals.append(dict(row))
+        return intervals
     
     def get_recent_events(self, hours: int = 24) -> List[DeviceEvent]:
         """Get recent device events"""
@@ -319,6 +859,17 @@ class DHCPLeaseParser:
     def __init__(self, lease_file: str = "/var/lib/misc/dnsmasq.leases"):
         self.lease_file = lease_file
     
+    def file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """
+        Return (inode, mtime_ns, size) of the lease file, or None if missing.
+        dnsmasq rewrites the file via rename, so any change moves at least one field.
+        """
+        try:
+            st = os.stat(self.lease_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
     def parse_leases(self) -> List[Tuple[str, str, str, datetime]]:
         """
         Parse DHCP leases from dnsmasq.leases file
@@ -359,73 +910,553 @@ class DHCPLeaseParser:
         
         return leases
 
+@dataclass
+class LeaseChangeset:
+    """Delta between two lease snapshots, as (mac, ip, hostname, expires) tuples"""
+    new: List[Tuple[str, str, str, datetime]] = field(default_factory=list)
+    ip_changed: List[Tuple[str, str, str, datetime]] = field(default_factory=list)
+    hostname_changed: List[Tuple[str, str, str, datetime]] = field(default_factory=list)
+    renewed: List[Tuple[str, str, str, datetime]] = field(default_factory=list)
+    expired: List[str] = field(default_factory=list)
+    
+    @property
+    def changed(self) -> List[Tuple[str, str, str, datetime]]:
+        """Leases whose IP and/or hostname changed, each MAC listed once"""
+        seen = set()
+        changed = []
+        for lease in self.ip_changed + self.hostname_changed:
+            if lease[0] not in seen:
+                seen.add(lease[0])
+                changed.append(lease)
+        return changed
+    
+    def is_empty(self) -> bool:
+        return not (self.new or self.ip_changed or self.hostname_changed
+                    or self.renewed or self.expired)
+
+class LeaseStateEngine:
+    """
+    Remembers the last lease snapshot and computes changesets against it
+    
+    State is a per-MAC (ip, hostname, expires) tuple plus the lease file
+    signature it was read from, so an unchanged file is never re-parsed and
+    unchanged leases never reach the database.
+    
+    Example:
+        engine = LeaseStateEngine()
+        engine.prime(db.get_all_devices())
+        changes = engine.apply(parser.parse_leases(), parser.file_signature())
+    """
+    
+    def __init__(self):
+        self.signature: Optional[Tuple[int, int, int]] = None
+        self.leases: Dict[str, Tuple[str, str, datetime]] = {}
+        self.active: Set[str] = set()
+        self.primed = False
+    
+    def prime(self, devices: List[Device], now: Optional[datetime] = None):
+        """Seed known state from stored devices so a restart is not a flood of 'new' leases"""
+        now = now or datetime.now()
+        for device in devices:
+            self.leases[device.mac_address] = (
+                device.ip_address, device.hostname, device.lease_expires
+            )
+            if self._is_live(device.lease_expires, now):
+                self.active.add(device.mac_address)
+        self.primed = True
+    
+    @staticmethod
+    def _is_live(expires: Optional[datetime], now: datetime) -> bool:
+        """dnsmasq writes 0 for infinite leases; everything else must be in the future"""
+        if expires is None or expires.timestamp() == 0:
+            return True
+        return expires > now
+    
+    def is_current(self, signature: Optional[Tuple[int, int, int]]) -> bool:
+        """True if the lease file has not changed since the last applied snapshot"""
+        return signature is not None and signature == self.signature
+    
+    def apply(self, leases: List[Tuple[str, str, str, datetime]],
+              signature: Optional[Tuple[int, int, int]] = None,
+              now: Optional[datetime] = None) -> LeaseChangeset:
+        """Diff a freshly parsed lease list against the stored snapshot and adopt it"""
+        now = now or datetime.now()
+        changes = LeaseChangeset()
+        present = set()
+        
+        for lease in leases:
+            mac, ip, hostname, expires = lease
+            if not self._is_live(expires, now):
+                continue
+            present.add(mac)
+            previous = self.leases.get(mac)
+            
+            # A lease that comes back after expiring is a fresh transition
+            if previous is None or mac not in self.active:
+                changes.new.append(lease)
+            else:
+                old_ip, old_hostname, old_expires = previous
+                if old_ip != ip:
+                    changes.ip_changed.append(lease)
+                if old_hostname != hostname:
+                    changes.hostname_changed.append(lease)
+                if old_ip == ip and old_hostname == hostname and old_expires != expires:
+                    changes.renewed.append(lease)
+            
+            self.leases[mac] = (ip, hostname, expires)
+        
+        changes.expired = sorted(self.active - present)
+        self.active = present
+        self.signature = signature
+        return changes
+    
+    def expire(self, now: Optional[datetime] = None) -> LeaseChangeset:
+        """Expire leases whose end time passed while the lease file stayed unchanged"""
+        now = now or datetime.now()
+        changes = LeaseChangeset()
+        for mac in list(self.active):
+            if not self._is_live(self.leases[mac][2], now):
+                self.active.discard(mac)
+                changes.expired.append(mac)
+        changes.expired.sort()
+        return changes
+
+class LeaseFileWatcher:
+    """
+    Blocks until the lease file changes, using inotify with a stat-polling fallback
+    
+    dnsmasq rewrites the lease file into a temp file and renames it over the
+    original, so the parent directory is watched and events are filtered by
+    file name. Bursts of events are debounced into a single wake-up.
+    
+    Example:
+        watcher = LeaseFileWatcher("/var/lib/misc/dnsmasq.leases")
+        while running:
+            if watcher.wait(timeout=30):
+                tracker._poll_devices()
+    """
+    
+    # inotify(7) constants
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+    
+    _EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+    
+    def __init__(self, lease_file: str, debounce: float = 0.2,
+                 max_debounce: float = 1.0, fallback_interval: float = 1.0,
+                 use_inotify: bool = True):
+        self.lease_file = os.path.abspath(lease_file)
+        self.lease_dir = os.path.dirname(self.lease_file)
+        self.lease_name = os.path.basename(self.lease_file).encode()
+        self.debounce = debounce
+        self.max_debounce = max_debounce
+        self.fallback_interval = fallback_interval
+        self._fd: Optional[int] = None
+        self._wd: Optional[int] = None
+        self._wake_r, self._wake_w = os.pipe()
+        self._stopped = threading.Event()
+        self._signature = self._stat()
+        
+        if use_inotify:
+            self._init_inotify()
+    
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self._fd is not None else 'polling'
+    
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.lease_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
+    def _init_inotify(self):
+        """Set up an inotify watch on the lease directory through libc"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            wd = libc.inotify_add_watch(fd, self.lease_dir.encode(), self.WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(errno, f"inotify_add_watch failed for {self.lease_dir}")
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), falling back to polling")
+            return
+        
+        self._fd, self._wd = fd, wd
+        logger.info(f"Watching {self.lease_file} via inotify")
+    
+    def _drain(self) -> bool:
+        """Read pending inotify events, return True if any concern the lease file"""
+        relevant = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            if not data:
+                return relevant
+            
+            offset = 0
+            while offset + self._EVENT.size <= len(data):
+                wd, mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                
+                if mask & self.IN_Q_OVERFLOW:
+                    relevant = True
+                elif mask & (self.IN_IGNORED | self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    # Lease directory went away; keep going on stat polling
+                    logger.warning(f"Lost inotify watch on {self.lease_dir}, falling back to polling")
+                    self._close_inotify()
+                    return True
+                elif name == self.lease_name:
+                    relevant = True
+    
+    def _select(self, timeout: Optional[float]) -> List[int]:
+        readable, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        if self._wake_r in readable:
+            os.read(self._wake_r, 4096)
+        return readable
+    
+    def _wait_inotify(self, deadline: float) -> bool:
+        while not self._stopped.is_set() and self._fd is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable = self._select(remaining)
+            if self._fd not in readable or not self._drain():
+                continue
+            
+            # Debounce the rewrite-then-rename burst, bounded by max_debounce
+            burst_end = time.monotonic() + self.max_debounce
+            while self._fd is not None:
+                quiet = min(self.debounce, burst_end - time.monotonic())
+                if quiet <= 0 or self._fd not in self._select(quiet):
+                    break
+                self._drain()
+            
+            signature = self._stat()
+            if signature != self._signature:
+                self._signature = signature
+                return True
+        return self._wait_polling(deadline)
+    
+    def _wait_polling(self, deadline: float) -> bool:
+        while not self._stopped.is_set():
+            signature = self._stat()
+            if signature != self._signature:
+                self._signature = signature
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._stopped.wait(min(self.fallback_interval, remaining))
+        return False
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the lease file changes or timeout expires
+        
+        Returns True if the file changed (inode, mtime or size), False on
+        timeout or stop.
+        """
+        deadline = time.monotonic() + (timeout if timeout is not None else float('inf'))
+        if self._fd is not None:
+            return self._wait_inotify(deadline)
+        return self._wait_polling(deadline)
+    
+    def stop(self):
+        """Wake up any thread blocked in wait()"""
+        self._stopped.set()
+        try:
+            os.write(self._wake_w, b'x')
+        except OSError:
+            pass
+    
+    def _close_inotify(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._wd = None
+    
+    def close(self):
+        """Release the inotify descriptor and wake-up pipe"""
+        self.stop()
+        self._close_inotify()
+        for fd in (self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+class LeaseFollower:
+    """
+    Follows the DHCP lease file read-only and reports lease changes
+    
+    This is the lease half of DeviceTracker without the device database, for
+    services that only need to know which leases are active. It offers the
+    same lease_state and add_lease_listener interface, so a listener works
+    with either.
+    
+    Example:
+        follower = LeaseFollower("/var/lib/misc/dnsmasq.leases")
+        follower.add_lease_listener(index.on_lease_changes)
+        threading.Thread(target=follower.start, daemon=True).start()
+    """
+    
+    def __init__(self, lease_file: str = "/var/lib/misc/dnsmasq.leases", watch: bool = True):
+        self.dhcp_parser = DHCPLeaseParser(lease_file)
+        self.lease_state = LeaseStateEngine()
+        self.running = False
+        self.poll_interval = 30  # seconds; upper bound between scans in watch mode
+        self.watch = watch
+        self.watcher: Optional[LeaseFileWatcher] = None
+        self.lease_listeners: List[Callable[[LeaseChangeset, LeaseStateEngine], None]] = []
+    
+    def add_lease_listener(self, listener: Callable[[LeaseChangeset, LeaseStateEngine], None]):
+        """Call listener(changes, lease_state) after each lease change and once after the first read"""
+        self.lease_listeners.append(listener)
+    
+    def start(self):
+        """Follow the lease file until stop() is called"""
+        self.running = True
+        if self.watch:
+            self.watcher = LeaseFileWatcher(self.dhcp_parser.lease_file)
+        
+        try:
+            while self.running:
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.error(f"Error following DHCP leases: {e}")
+                if self.watcher:
+                    self.watcher.wait(timeout=self.poll_interval)
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            if self.watcher:
+                self.watcher.close()
+                self.watcher = None
+    
+    def stop(self):
+        """Stop following the lease file"""
+        self.running = False
+        if self.watcher:
+            self.watcher.stop()
+    
+    def poll(self):
+        """Read the lease file if it changed and notify listeners of any changes"""
+        current_time = datetime.now()
+        
+        # Nothing to prime from; the first read reports every lease as new
+        first_read = not self.lease_state.primed
+        self.lease_state.primed = True
+        
+        # A missing lease file is not an empty one; keep the last snapshot
+        signature = self.dhcp_parser.file_signature()
+        if signature is None or self.lease_state.is_current(signature):
+            changes = self.lease_state.expire(current_time)
+        else:
+            changes = self.lease_state.apply(self.dhcp_parser.parse_leases(), signature, current_time)
+        
+        if first_read or not changes.is_empty():
+            for listener in self.lease_listeners:
+                try:
+                    listener(changes, self.lease_state)
+                except Exception as e:
+                    logger.error(f"Lease listener failed: {e}")
+
 class DeviceTracker:
     """Main device tracking service"""
     
-    def __init__(self, lease_file: str = "/var/lib/misc/dnsmasq.leases"):
+    def __init__(self, lease_file: str = "/var/lib/misc/dnsmasq.leases", watch: bool = True):
         self.db = DeviceDatabase()
         self.dhcp_parser = DHCPLeaseParser(lease_file)
-        self.mac_analyzer = MACAnalyzer()
+        self.mac_analyzer = MACAnalyzer(OUIDatabase.load())
+        self.lease_state = LeaseStateEngine()
         self.running = False
-        self.poll_interval = 30  # seconds
+        self.poll_interval = 30  # seconds; upper bound between scans in watch mode
+        self.watch = watch
+        self.watcher: Optional[LeaseFileWatcher] = None
+        self.compaction_interval = 3600  # seconds between history compaction passes
+        self._last_compaction: Optional[float] = None
+        self.lease_listeners: List[Callable[[LeaseChangeset, LeaseStateEngine], None]] = []
         
+    def add_lease_listener(self, listener: Callable[[LeaseChangeset, LeaseStateEngine], None]):
+        """Call listener(changes, lease_state) after each lease change and once after priming"""
+        self.lease_listeners.append(listener)
+    
+    def _notify_lease_listeners(self, changes: LeaseChangeset):
+        for listener in self.lease_listeners:
+            try:
+                listener(changes, self.lease_state)
+            except Exception as e:
+                logger.error(f"Lease listener failed: {e}")
+    
     def start(self):
         """Start the device tracking service"""
         self.running = True
         logger.info("Starting LNMT Device Tracker service")
         
-        while self.running:
-            try:
-                self._poll_devices()
-                time.sleep(self.poll_interval)
-            except KeyboardInterrupt:
-                logger.info("Received interrupt signal")
-                break
-            except Exception as e:
-                logger.error(f"Error in main loop: {e}")
-                time.sleep(self.poll_interval)
+        if self.watch:
+            self.watcher = LeaseFileWatcher(self.dhcp_parser.lease_file)
+            logger.info(f"Lease watch mode: {self.watcher.mode}")
+        
+        try:
+            while self.running:
+                try:
+                    self._poll_devices()
+                    self._maybe_compact_history()
+                    self._wait_for_leases()
+                except KeyboardInterrupt:
+                    logger.info("Received interrupt signal")
+                    break
+                except Exception as e:
+                    logger.error(f"Error in main loop: {e}")
+                    self._wait_for_leases()
+        finally:
+            if self.watcher:
+                self.watcher.close()
+                self.watcher = None
         
         logger.info("Device Tracker service stopped")
     
+    def _maybe_compact_history(self):
+        """Run history compaction at most once per compaction_interval"""
+        now = time.monotonic()
+        if self._last_compaction is not None and now - self._last_compaction < self.compaction_interval:
+            return
+        self._last_compaction = now
+        stats = self.db.compact_history()
+        if stats['compacted_rows'] or stats['dropped_partitions']:
+            logger.info(
+                f"Compacted {stats['compacted_rows']} history rows into {stats['intervals']} "
+                f"intervals, dropped {stats['dropped_partitions']} partitions"
+            )
+    
+    def _wait_for_leases(self):
+        """Sleep until the lease file changes, or at most poll_interval for expiry checks"""
+        if self.watcher:
+            self.watcher.wait(timeout=self.poll_interval)
+        else:
+            time.sleep(self.poll_interval)
+    
     def stop(self):
         """Stop the device tracking service"""
         self.running = False
+        if self.watcher:
+            self.watcher.stop()
     
     def _poll_devices(self):
-        """Poll for active devices"""
+        """Poll for active devices, touching the database only for lease changes"""
         logger.debug("Polling for active devices")
-        
-        # Parse current DHCP leases
-        leases = self.dhcp_parser.parse_leases()
         current_time = datetime.now()
         
-        for mac, ip, hostname, expires in leases:
-            self._process_device(mac, ip, hostname, expires, current_time)
-    
-    def _process_device(self, mac: str, ip: str, hostname: str, 
-                       expires: datetime, current_time: datetime):
-        """Process a single device"""
-        # Get existing device
-        existing_device = self.db.get_device(mac)
-        
-        # Add history entry
-        self.db.add_history_entry(mac, ip, hostname, expires)
+        primed_now = not self.lease_state.primed
+        if primed_now:
+            self.lease_state.prime(self.db.get_all_devices(), current_time)
         
-        if existing_device:
-            # Update existing device
-            self._update_existing_device(existing_device, mac, ip, hostname, expires, current_time)
+        # A missing lease file is not an empty one; keep the last snapshot
+        signature = self.dhcp_parser.file_signature()
+        if signature is None or self.lease_state.is_current(signature):
+            changes = self.lease_state.expire(current_time)
         else:
-            # New device
-            self._process_new_device(mac, ip, hostname, expires, current_time)
+            leases = self.dhcp_parser.parse_leases()
+            changes = self.lease_state.apply(leases, signature, current_time)
+        
+        if primed_now or not changes.is_empty():
+            self._notify_lease_listeners(changes)
+        if changes.is_empty():
+            return
+        
+        logger.debug(
+            f"Lease changes: {len(changes.new)} new, {len(changes.changed)} changed, "
+            f"{len(changes.renewed)} renewed, {len(changes.expired)} expired"
+        )
+        self._apply_changes(changes, current_time)
+    
+    def _apply_changes(self, changes: LeaseChangeset, current_time: datetime):
+        """Write a lease changeset to the database in a single transaction"""
+        transitions = changes.new + changes.changed
+        returned = {lease[0] for lease in changes.new}
+        devices: List[Device] = []
+        events: List[DeviceEvent] = []
+        
+        with self.db.batch():
+            existing = self.db.get_devices([lease[0] for lease in transitions])
+            classified = self.mac_analyzer.classify_many(
+                [lease[0] for lease in transitions if lease[0] not in existing]
+            )
+            
+            for mac, ip, hostname, expires in transitions:
+                existing_device = existing.get(mac)
+                if existing_device:
+                    if mac in returned:
+                        events.append(DeviceEvent(
+                            timestamp=current_time,
+                            event_type='lease_acquired',
+                            mac_address=mac,
+                            new_value=ip,
+                            description=f"Lease acquired for {mac} ({ip})"
+                        ))
+                    events.extend(self._update_existing_device(
+                        existing_device, mac, ip, hostname, expires, current_time
+                    ))
+                    devices.append(existing_device)
+                else:
+                    device, event = self._process_new_device(
+                        mac, ip, hostname, expires, current_time, classified.get(mac)
+                    )
+                    devices.append(device)
+                    events.append(event)
+            
+            for mac in changes.expired:
+                events.append(DeviceEvent(
+                    timestamp=current_time,
+                    event_type='lease_expired',
+                    mac_address=mac,
+                    description=f"Lease expired for {mac}"
+                ))
+            
+            # History is only recorded on real transitions
+            self.db.add_history_entries(transitions, current_time)
+            self.db.save_devices(devices)
+            self.db.touch_devices([
+                (mac, current_time, expires) for mac, _ip, _hostname, expires in changes.renewed
+            ])
+            self.db.add_events(events)
     
     def _process_new_device(self, mac: str, ip: str, hostname: str, 
-                          expires: datetime, current_time: datetime):
-        """Process a new device"""
+                          expires: datetime, current_time: datetime,
+                          classification: Optional[Tuple[Optional[str], bool]] = None
+                          ) -> Tuple[Device, DeviceEvent]:
+        """Build the record and event for a new device"""
         logger.info(f"New device detected: {mac} ({ip}) - {hostname}")
         
-        # Analyze MAC address
-        is_randomized = self.mac_analyzer.is_randomized_mac(mac)
-        vendor = self.mac_analyzer.get_vendor(mac)
+        # Analyze MAC address unless the caller already classified it in bulk
+        if classification is None:
+            classification = (self.mac_analyzer.get_vendor(mac),
+                              self.mac_analyzer.is_randomized_mac(mac))
+        vendor, is_randomized = classification
         
         # Create device
         device = Device(
@@ -444,21 +1475,18 @@ class DeviceTracker:
             device.alert_flags.append('randomized_mac')
             logger.warning(f"Randomized MAC detected: {mac}")
         
-        # Save device
-        self.db.save_device(device)
-        
-        # Add event
         event = DeviceEvent(
             timestamp=current_time,
             event_type='new_device',
             mac_address=mac,
             description=f"New device: {hostname} ({ip})"
         )
-        self.db.add_event(event)
+        return device, event
     
     def _update_existing_device(self, device: Device, mac: str, ip: str, 
-                              hostname: str, expires: datetime, current_time: datetime):
-        """Update existing device"""
+                              hostname: str, expires: datetime,
+                              current_time: datetime) -> List[DeviceEvent]:
+        """Apply lease changes to an existing device and return the resulting events"""
         events = []
         
         # Check for changes
@@ -488,11 +1516,9 @@ class DeviceTracker:
         device.last_seen = current_time
         device.lease_expires = expires
         
-        # Save device and events
-        self.db.save_device(device)
         for event in events:
-            self.db.add_event(event)
             logger.info(f"Device change: {event.description}")
+        return events
 
     def get_device_status(self) -> Dict:
         """Get current device status summary"""
@@ -15,13 +15,18 @@ import json
 import logging
 import os
 import psutil
+import sqlite3
+import stat
 import subprocess
+import threading
 import time
 import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Union
 from dataclasses import dataclass, asdict
 
 
@@ -49,6 +54,8 @@ class Alert:
     service: str
     message: str
     details: Dict[str, Any]
+    count: int = 1  # occurrences coalesced into this alert
+    first_seen: Optional[str] = None  # timestamp of the first occurrence
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -56,10 +63,192 @@ class Alert:
             'level': self.level.value,
             'service': self.service,
             'message': self.message,
-            'details': self.details
+            'details': self.details,
+            'count': self.count,
+            'first_seen': self.first_seen or self.timestamp
         }
 
 
+class AlertStore:
+    """
+    Persistent alert log in SQLite, indexed for time-range queries
+    
+    Repeats of an alert (same level, service and message) within
+    COALESCE_WINDOW of its last occurrence update that row's count and
+    timestamp instead of adding a new one. Times are stored as epoch
+    seconds, so ordering and windows hold across DST changes and between
+    processes in other timezones. The table is trimmed to the newest
+    max_alerts rows, and nothing is held in memory.
+    
+    Example:
+        store = AlertStore('/var/lib/lnmt/health_alerts.db')
+        store.add(alert)
+        critical = store.query(since='2025-01-01T00:00:00', level=AlertLevel.CRITICAL)
+    """
+    
+    DEFAULT_DB_PATH = '/var/lib/lnmt/health_alerts.db'
+    COALESCE_WINDOW = 3600  # seconds
+    TRIM_EVERY = 100  # inserts between trims
+    
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_alerts: int = 10000):
+        self.max_alerts = max_alerts
+        self._lock = threading.Lock()
+        self._inserts = 0
+        
+        try:
+            if db_path != ':memory:':
+                os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            self.conn = self._connect(db_path)
+        except (OSError, sqlite3.Error) as e:
+            logging.getLogger(__name__).warning(
+                f"Could not open alert store {db_path}, keeping alerts in memory: {e}")
+            db_path = ':memory:'
+            self.conn = self._connect(db_path)
+        self.db_path = db_path
+    
+    def _connect(self, db_path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            self._init_database(conn, db_path)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+    
+    @staticmethod
+    def _init_database(conn: sqlite3.Connection, db_path: str) -> None:
+        with conn:
+            if db_path != ':memory:':
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp REAL NOT NULL,
+                    first_seen REAL NOT NULL,
+                    level TEXT NOT NULL,
+                    service TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    details TEXT NOT NULL DEFAULT '{}',
+                    count INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_level ON alerts (level, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_service ON alerts (service, timestamp)")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_alerts_repeat
+                ON alerts (service, level, message, timestamp)
+            """)
+    
+    @staticmethod
+    def _to_epoch(value: Union[str, float, datetime]) -> float:
+        """Epoch seconds from an ISO string, datetime or epoch; naive values are local time"""
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value.timestamp()
+    
+    @staticmethod
+    def _to_iso(epoch: float) -> str:
+        return datetime.fromtimestamp(epoch).astimezone().isoformat()
+    
+    def add(self, alert: Alert) -> Alert:
+        """Store an alert, coalescing it into a recent repeat; returns the stored alert"""
+        stamp = self._to_epoch(alert.timestamp)
+        cutoff = stamp - self.COALESCE_WINDOW
+        details = json.dumps(alert.details, default=str)
+        
+        with self._lock, self.conn:
+            row = self.conn.execute("""
+                SELECT id, count, first_seen FROM alerts
+                WHERE service = ? AND level = ? AND message = ? AND timestamp >= ?
+                ORDER BY timestamp DESC LIMIT 1
+            """, (alert.service, alert.level.value, alert.message, cutoff)).fetchone()
+            
+            if row:
+                alert_id, count, first_seen = row
+                self.conn.execute(
+                    "UPDATE alerts SET timestamp = ?, details = ?, count = ? WHERE id = ?",
+                    (stamp, details, count + 1, alert_id)
+                )
+                return Alert(alert.timestamp, alert.level, alert.service, alert.message,
+                             alert.details, count + 1, self._to_iso(first_seen))
+            
+            self.conn.execute("""
+                INSERT INTO alerts (timestamp, first_seen, level, service, message, details)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (stamp, stamp, alert.level.value, alert.service, alert.message, details))
+            
+            self._inserts += 1
+            if self._inserts >= self.TRIM_EVERY:
+                self._inserts = 0
+                self._trim()
+        
+        return Alert(alert.timestamp, alert.level, alert.service, alert.message,
+                     alert.details, 1, alert.timestamp)
+    
+    def _trim(self) -> None:
+        """Drop all but the newest max_alerts alerts"""
+        self.conn.execute("""
+            DELETE FROM alerts WHERE timestamp < (
+                SELECT timestamp FROM alerts ORDER BY timestamp DESC LIMIT 1 OFFSET ?
+            )
+        """, (self.max_alerts - 1,))
+    
+    def query(self, since: Union[str, float, datetime, None] = None,
+              until: Union[str, float, datetime, None] = None,
+              level: Optional[AlertLevel] = None, service: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Alert]:
+        """Get alerts last seen in [since, until], newest first"""
+        query = "SELECT timestamp, level, service, message, details, count, first_seen FROM alerts"
+        conditions, params = [], []
+        if level is not None:
+            conditions.append("level = ?")
+            params.append(level.value)
+        if service is not None:
+            conditions.append("service = ?")
+            params.append(service)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(self._to_epoch(since))
+        if until is not None:
+            conditions.append("timestamp <= ?")
+            params.append(self._to_epoch(until))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [
+            Alert(self._to_iso(timestamp), AlertLevel(level_value), service_name, message,
+                  json.loads(details), count, self._to_iso(first_seen))
+            for timestamp, level_value, service_name, message, details, count, first_seen in rows
+        ]
+    
+    def clear(self, before: Union[str, float, datetime, None] = None) -> int:
+        """Delete alerts last seen before a timestamp, or all; returns the number deleted"""
+        with self._lock, self.conn:
+            if before is None:
+                cursor = self.conn.execute("DELETE FROM alerts")
+            else:
+                cursor = self.conn.execute("DELETE FROM alerts WHERE timestamp < ?",
+                                           (self._to_epoch(before),))
+            return cursor.rowcount
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+    
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
 @dataclass
 class ServiceInfo:
     """Service information structure"""
@@ -72,6 +261,133 @@ class ServiceInfo:
     config_files: List[str]
 
 
+@dataclass
+class ProcessEntry:
+    """One process from a process table snapshot"""
+    pid: int
+    name: str
+    rss_bytes: int
+    cpu_seconds: float
+    create_time: float
+
+
+class ProcessSnapshot:
+    """
+    Process table captured in a single pass and indexed by process name
+    
+    On Linux each process costs one read of /proc/<pid>/stat; elsewhere
+    psutil.process_iter is walked once. CPU usage is measured against the
+    previous snapshot, so a fresh monitor reports 0% until its second cycle.
+    
+    Example:
+        snapshot = ProcessSnapshot.capture()
+        proc = snapshot.find("dnsmasq")
+        if proc:
+            print(proc.pid, snapshot.cpu_percent(proc))
+    """
+    
+    # Kernel truncates process names (comm) to this many characters
+    COMM_LENGTH = 15
+    
+    def __init__(self, processes: List[ProcessEntry], taken_at: float,
+                 previous: Optional['ProcessSnapshot'] = None):
+        self.taken_at = taken_at
+        self.by_pid: Dict[int, ProcessEntry] = {}
+        self.by_name: Dict[str, List[ProcessEntry]] = {}
+        for proc in sorted(processes, key=lambda p: p.pid):
+            self.by_pid[proc.pid] = proc
+            self.by_name.setdefault(proc.name, []).append(proc)
+        
+        # Only the CPU counters of the previous snapshot are kept
+        self._previous_cpu: Dict[int, Tuple[float, float]] = {}
+        self._previous_taken_at: Optional[float] = None
+        if previous is not None:
+            self._previous_taken_at = previous.taken_at
+            self._previous_cpu = {
+                pid: (proc.create_time, proc.cpu_seconds) for pid, proc in previous.by_pid.items()
+            }
+    
+    def __len__(self) -> int:
+        return len(self.by_pid)
+    
+    @classmethod
+    def capture(cls, previous: Optional['ProcessSnapshot'] = None,
+                proc_root: str = '/proc') -> 'ProcessSnapshot':
+        """Walk the process table once"""
+        taken_at = time.time()
+        if os.path.exists(os.path.join(proc_root, 'stat')):
+            processes = cls._read_proc(proc_root)
+        else:
+            processes = cls._read_psutil()
+        return cls(processes, taken_at, previous)
+    
+    @staticmethod
+    def _read_proc(proc_root: str) -> List[ProcessEntry]:
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        boot_time = 0.0
+        with open(os.path.join(proc_root, 'stat')) as f:
+            for line in f:
+                if line.startswith('btime '):
+                    boot_time = float(line.split()[1])
+                    break
+        
+        processes = []
+        for entry in os.scandir(proc_root):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(os.path.join(entry.path, 'stat'), 'rb') as f:
+                    stat = f.read().decode(errors='replace')
+            except OSError:
+                continue  # exited while we were walking
+            
+            # The name may itself contain spaces or parentheses
+            head, _, tail = stat.rpartition(')')
+            fields = tail.split()
+            processes.append(ProcessEntry(
+                pid=int(entry.name),
+                name=head.partition('(')[2],
+                rss_bytes=int(fields[21]) * page_size,
+                cpu_seconds=(int(fields[11]) + int(fields[12])) / clock_ticks,
+                create_time=boot_time + int(fields[19]) / clock_ticks
+            ))
+        return processes
+    
+    @staticmethod
+    def _read_psutil() -> List[ProcessEntry]:
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name', 'memory_info', 'cpu_times', 'create_time']):
+            info = proc.info
+            if info['memory_info'] is None or info['cpu_times'] is None:
+                continue  # access denied
+            processes.append(ProcessEntry(
+                pid=info['pid'],
+                name=info['name'] or '',
+                rss_bytes=info['memory_info'].rss,
+                cpu_seconds=info['cpu_times'].user + info['cpu_times'].system,
+                create_time=info['create_time'] or 0.0
+            ))
+        return processes
+    
+    def find(self, process_name: str) -> Optional[ProcessEntry]:
+        """Get the lowest-pid process with this name"""
+        matches = self.by_name.get(process_name)
+        if not matches and len(process_name) > self.COMM_LENGTH:
+            matches = self.by_name.get(process_name[:self.COMM_LENGTH])
+        return matches[0] if matches else None
+    
+    def cpu_percent(self, proc: ProcessEntry) -> float:
+        """CPU usage of a process since the previous snapshot"""
+        previous = self._previous_cpu.get(proc.pid)
+        if previous is None or previous[0] != proc.create_time:
+            return 0.0
+        elapsed = self.taken_at - self._previous_taken_at
+        if elapsed <= 0:
+            return 0.0
+        return max(0.0, (proc.cpu_seconds - previous[1]) / elapsed * 100)
+
+
 @dataclass
 class SystemResources:
     """System resource usage data"""
@@ -82,6 +398,179 @@ class SystemResources:
     uptime: str
 
 
+@dataclass
+class ResourceSample:
+    """One reading of system resource usage"""
+    timestamp: float
+    cpu_percent: float
+    memory_percent: float
+    disk_percent: float
+    load_avg: Tuple[float, float, float]
+    net_sent_rate: float  # bytes/s since the previous sample
+    net_recv_rate: float
+
+
+class ResourceSampler:
+    """
+    Samples system resources in a background thread into a ring buffer
+    
+    Readers get the latest sample, 1/5/15-minute averages and percentiles
+    without waiting. CPU usage is measured between consecutive samples from
+    psutil.cpu_times, so it does not disturb other psutil.cpu_percent callers.
+    
+    Example:
+        sampler = ResourceSampler(interval=5.0)
+        sampler.start()
+        print(sampler.latest().cpu_percent)
+        print(sampler.percentile('cpu_percent', 95))
+    """
+    
+    METRICS = ('cpu_percent', 'memory_percent', 'disk_percent', 'load_1m',
+               'net_sent_rate', 'net_recv_rate')
+    AGGREGATE_WINDOWS = {'1m': 60, '5m': 300, '15m': 900}
+    
+    # Shortest span a CPU reading is measured over
+    MIN_CPU_INTERVAL = 0.1
+    
+    def __init__(self, interval: float = 5.0, window: float = 900, disk_path: str = '/'):
+        self.interval = interval
+        self.window = window
+        self.disk_path = disk_path
+        self.samples: deque = deque(maxlen=max(2, int(window / interval) + 1))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_counters = self._read_counters()
+    
+    @staticmethod
+    def _read_counters() -> Tuple[float, float, float, int, int]:
+        cpu = psutil.cpu_times()
+        idle = cpu.idle + getattr(cpu, 'iowait', 0.0)
+        net = psutil.net_io_counters()
+        return time.time(), sum(cpu), idle, net.bytes_sent, net.bytes_recv
+    
+    def start(self) -> None:
+        """Start the sampling thread if it is not already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            # Measure the first reading from now, not from construction
+            self._last_counters = self._read_counters()
+            self._thread = threading.Thread(target=self._run, name='lnmt-resource-sampler',
+                                            daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the sampling thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Resource sampling failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+    
+    def sample(self, rebaseline: bool = False) -> ResourceSample:
+        """
+        Take a sample now and add it to the buffer. With rebaseline the
+        reading covers only the last MIN_CPU_INTERVAL instead of the time
+        since the previous sample.
+        """
+        with self._lock:
+            if rebaseline:
+                self._last_counters = self._read_counters()
+            wait = self._last_counters[0] + self.MIN_CPU_INTERVAL - time.time()
+        # Give a cold reading a minimal span to measure, without blocking other callers
+        if wait > 0:
+            time.sleep(wait)
+        
+        with self._lock:
+            counters = self._read_counters()
+            then, total_then, idle_then, sent_then, recv_then = self._last_counters
+            now, total, idle, sent, recv = counters
+            self._last_counters = counters
+            
+            elapsed = max(now - then, 1e-6)
+            busy = (total - total_then) - (idle - idle_then)
+            cpu_percent = min(100.0, max(0.0, busy / max(total - total_then, 1e-6) * 100))
+            
+            sample = ResourceSample(
+                timestamp=now,
+                cpu_percent=round(cpu_percent, 1),
+                memory_percent=psutil.virtual_memory().percent,
+                disk_percent=psutil.disk_usage(self.disk_path).percent,
+                load_avg=os.getloadavg(),
+                net_sent_rate=max(0, sent - sent_then) / elapsed,
+                net_recv_rate=max(0, recv - recv_then) / elapsed
+            )
+            self.samples.append(sample)
+            return sample
+    
+    def latest(self) -> ResourceSample:
+        """Get the newest sample, taking one if the buffer is empty or stale"""
+        sample = self.samples[-1] if self.samples else None
+        if sample is None or time.time() - sample.timestamp > 2 * self.interval:
+            sample = self.sample(rebaseline=True)
+        return sample
+    
+    def window_samples(self, seconds: Optional[float] = None) -> List[ResourceSample]:
+        """Get the samples taken in the last seconds (default: the whole buffer)"""
+        samples = list(self.samples)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [sample for sample in samples if sample.timestamp >= cutoff]
+    
+    @staticmethod
+    def _metric(sample: ResourceSample, metric: str) -> float:
+        if metric == 'load_1m':
+            return sample.load_avg[0]
+        return getattr(sample, metric)
+    
+    def aggregates(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the average and maximum of every metric over the last 1, 5 and
+        15 minutes, e.g. aggregates()['5m']['cpu_percent_avg']
+        """
+        result = {}
+        for name, seconds in self.AGGREGATE_WINDOWS.items():
+            samples = self.window_samples(seconds)
+            stats: Dict[str, float] = {'samples': len(samples)}
+            for metric in self.METRICS:
+                values = [self._metric(sample, metric) for sample in samples]
+                stats[f'{metric}_avg'] = sum(values) / len(values) if values else 0.0
+                stats[f'{metric}_max'] = max(values) if values else 0.0
+            result[name] = stats
+        return result
+    
+    def percentile(self, metric: str, percentile: float,
+                   seconds: Optional[float] = None) -> Optional[float]:
+        """
+        Get a percentile (0-100) of a metric over the last seconds, or None
+        if there are no samples. Interpolates between the nearest ranks.
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        values = sorted(self._metric(sample, metric) for sample in self.window_samples(seconds))
+        if not values:
+            return None
+        rank = (len(values) - 1) * min(max(percentile, 0.0), 100.0) / 100
+        low = int(rank)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (rank - low)
+
+
 class HealthMonitor:
     """
     Main health monitoring class for LNMT system
@@ -127,10 +616,24 @@ class HealthMonitor:
         'disk_critical': 95.0
     }
     
-    def __init__(self, log_file: str = '/var/log/lnmt-health.log'):
+    # A process snapshot younger than this is reused by service checks
+    SNAPSHOT_MAX_AGE = 2.0
+    
+    # Config hashes per monitored path, and the per-file (inode, size, mtime_ns,
+    # sha256) manifest that lets unchanged files skip rehashing
+    CONFIG_HASH_FILE = '/var/lib/lnmt/config_hashes.json'
+    CONFIG_MANIFEST_FILE = '/var/lib/lnmt/config_manifest.json'
+    HASH_CHUNK_SIZE = 1024 * 1024
+    HASH_WORKERS = 4
+    
+    def __init__(self, log_file: str = '/var/log/lnmt-health.log', sample_interval: float = 5.0,
+                 alert_db: str = AlertStore.DEFAULT_DB_PATH):
         """Initialize health monitor with logging setup"""
         self.log_file = log_file
-        self.alerts: List[Alert] = []
+        self._process_snapshot: Optional[ProcessSnapshot] = None
+        
+        # Started on first use so short-lived callers do not pay for a thread
+        self.sampler = ResourceSampler(interval=sample_interval)
         
         # Setup logging
         logging.basicConfig(
@@ -143,62 +646,136 @@ class HealthMonitor:
         )
         self.logger = logging.getLogger(__name__)
         
+        self.alert_store = AlertStore(alert_db)
+        
         # Config file hash cache for change detection
         self.config_hashes: Dict[str, str] = {}
+        self.config_manifest: Dict[str, List[Any]] = {}
+        self.config_changes: Dict[str, Dict[str, str]] = {}
+        self._config_hashes_dirty = False
         self._load_config_hashes()
     
     def _load_config_hashes(self) -> None:
-        """Load stored configuration file hashes"""
-        hash_file = '/var/lib/lnmt/config_hashes.json'
+        """Load stored configuration file hashes and the per-file manifest"""
         try:
-            if os.path.exists(hash_file):
-                with open(hash_file, 'r') as f:
+            if os.path.exists(self.CONFIG_HASH_FILE):
+                with open(self.CONFIG_HASH_FILE, 'r') as f:
                     self.config_hashes = json.load(f)
+            if os.path.exists(self.CONFIG_MANIFEST_FILE):
+                with open(self.CONFIG_MANIFEST_FILE, 'r') as f:
+                    self.config_manifest = json.load(f)
         except Exception as e:
             self.logger.warning(f"Could not load config hashes: {e}")
     
     def _save_config_hashes(self) -> None:
-        """Save configuration file hashes"""
-        hash_file = '/var/lib/lnmt/config_hashes.json'
+        """Save configuration file hashes, if anything changed since the last save"""
+        if not self._config_hashes_dirty:
+            return
         try:
-            os.makedirs(os.path.dirname(hash_file), exist_ok=True)
-            with open(hash_file, 'w') as f:
+            os.makedirs(os.path.dirname(self.CONFIG_HASH_FILE), exist_ok=True)
+            with open(self.CONFIG_HASH_FILE, 'w') as f:
                 json.dump(self.config_hashes, f, indent=2)
+            with open(self.CONFIG_MANIFEST_FILE, 'w') as f:
+                json.dump(self.config_manifest, f)
+            self._config_hashes_dirty = False
         except Exception as e:
             self.logger.error(f"Could not save config hashes: {e}")
     
+    def _digest_file(self, filepath: str) -> str:
+        """SHA256 of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
     def _hash_file(self, filepath: str) -> Optional[str]:
-        """Calculate SHA256 hash of a file"""
+        """
+        Calculate SHA256 hash of a file, or of a directory's files in walk order
+        
+        Files whose (inode, size, mtime_ns) match the manifest reuse their
+        stored digest; the rest are rehashed in parallel. Per-file changes
+        since the last pass are left in config_changes[filepath].
+        """
         try:
+            entries = []
             if os.path.isfile(filepath):
-                with open(filepath, 'rb') as f:
-                    return hashlib.sha256(f.read()).hexdigest()
+                entries.append((filepath, os.stat(filepath)))
             elif os.path.isdir(filepath):
-                # Hash directory contents
-                file_hashes = []
                 for root, dirs, files in os.walk(filepath):
                     for file in sorted(files):
                         file_path = os.path.join(root, file)
-                        if os.path.isfile(file_path):
-                            with open(file_path, 'rb') as f:
-                                file_hashes.append(hashlib.sha256(f.read()).hexdigest())
-                return hashlib.sha256(''.join(file_hashes).encode()).hexdigest()
+                        try:
+                            st = os.stat(file_path)
+                        except OSError:
+                            continue
+                        if stat.S_ISREG(st.st_mode):
+                            entries.append((file_path, st))
+            else:
+                return None
+            
+            digests = self._file_digests(filepath, entries)
+            if os.path.isfile(filepath):
+                return digests[0]
+            return hashlib.sha256(''.join(digests).encode()).hexdigest()
         except Exception as e:
             self.logger.error(f"Error hashing {filepath}: {e}")
         return None
     
+    def _file_digests(self, config_path: str, entries: List[Tuple[str, os.stat_result]]) -> List[str]:
+        """Digests of the given files, rehashing only those whose stat changed"""
+        prefix = config_path.rstrip('/') + '/'
+        previous = {
+            path: entry for path, entry in self.config_manifest.items()
+            if path == config_path or path.startswith(prefix)
+        }
+        changes: Dict[str, str] = {}
+        
+        stale = [
+            (path, [st.st_ino, st.st_size, st.st_mtime_ns]) for path, st in entries
+            if previous.get(path, [None])[:3] != [st.st_ino, st.st_size, st.st_mtime_ns]
+        ]
+        if len(stale) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.HASH_WORKERS, len(stale))) as pool:
+                digests = list(pool.map(self._digest_file, [path for path, _ in stale]))
+        else:
+            digests = [self._digest_file(path) for path, _ in stale]
+        
+        for (path, key), digest in zip(stale, digests):
+            old = previous.get(path)
+            if old is None:
+                # Files are only "added" once the path has been scanned before
+                if previous:
+                    changes[path] = 'added'
+            elif old[3] != digest:
+                changes[path] = 'modified'
+            self.config_manifest[path] = key + [digest]
+        
+        current = {path for path, _ in entries}
+        for path in previous.keys() - current:
+            changes[path] = 'removed'
+            del self.config_manifest[path]
+        
+        if stale or len(current) != len(previous):
+            self._config_hashes_dirty = True
+        self.config_changes[config_path] = changes
+        return [self.config_manifest[path][3] for path, _ in entries]
+    
     def _add_alert(self, level: AlertLevel, service: str, message: str, 
                    details: Dict[str, Any] = None) -> None:
-        """Add an alert to the system"""
+        """Add an alert to the system, coalescing repeats of a recent one"""
         alert = Alert(
-            timestamp=datetime.now().isoformat(),
+            timestamp=datetime.now().astimezone().isoformat(),
             level=level,
             service=service,
             message=message,
             details=details or {}
         )
         
-        self.alerts.append(alert)
+        try:
+            alert = self.alert_store.add(alert)
+        except Exception as e:
+            self.logger.error(f"Could not store alert: {e}")
         
         # Log the alert
         log_level = {
@@ -209,15 +786,25 @@ class HealthMonitor:
         }[level]
         
         self.logger.log(log_level, f"[{service}] {message}")
-        
-        # Keep only recent alerts (last 1000)
-        if len(self.alerts) > 1000:
-            self.alerts = self.alerts[-1000:]
     
-    def check_service(self, service_name: str) -> ServiceInfo:
+    def get_process_snapshot(self, refresh: bool = False) -> ProcessSnapshot:
+        """
+        Get the current process table snapshot, capturing a new one when
+        refresh is set or the last one is older than SNAPSHOT_MAX_AGE
+        """
+        snapshot = self._process_snapshot
+        if refresh or snapshot is None or time.time() - snapshot.taken_at > self.SNAPSHOT_MAX_AGE:
+            snapshot = ProcessSnapshot.capture(previous=snapshot)
+            self._process_snapshot = snapshot
+        return snapshot
+    
+    def check_service(self, service_name: str,
+                      snapshot: Optional[ProcessSnapshot] = None) -> ServiceInfo:
         """
         Check status of a specific service
         
+        Processes are looked up in snapshot, or in the monitor's current one.
+        
         Example:
             info = monitor.check_service("dnsmasq")
             if info.status == ServiceStatus.STOPPED:
@@ -237,15 +824,15 @@ class HealthMonitor:
         status = ServiceStatus.STOPPED
         
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'memory_info', 'cpu_percent', 'create_time']):
-                if proc.info['name'] == process_name:
-                    pid = proc.info['pid']
-                    memory_mb = proc.info['memory_info'].rss / 1024 / 1024
-                    cpu_percent = proc.info['cpu_percent']
-                    create_time = datetime.fromtimestamp(proc.info['create_time'])
-                    uptime = str(datetime.now() - create_time)
-                    status = ServiceStatus.RUNNING
-                    break
+            snapshot = snapshot or self.get_process_snapshot()
+            proc = snapshot.find(process_name)
+            if proc:
+                pid = proc.pid
+                memory_mb = proc.rss_bytes / 1024 / 1024
+                cpu_percent = snapshot.cpu_percent(proc)
+                create_time = datetime.fromtimestamp(proc.create_time)
+                uptime = str(datetime.now() - create_time)
+                status = ServiceStatus.RUNNING
             
             # Additional checks for specific services
             if status == ServiceStatus.RUNNING:
@@ -298,22 +885,25 @@ class HealthMonitor:
         """
         Get current system resource usage
         
+        Reads the background sampler's latest sample instead of blocking to
+        measure CPU; the first call starts the sampler.
+        
         Example:
             resources = monitor.get_system_resources()
             if resources.cpu_percent > 90:
                 print("High CPU usage detected!")
         """
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            load_avg = os.getloadavg()
+            sample = self.sampler.latest()
+            self.sampler.start()
+            cpu_percent = sample.cpu_percent
+            load_avg = sample.load_avg
             uptime = str(timedelta(seconds=time.time() - psutil.boot_time()))
             
             resources = SystemResources(
                 cpu_percent=cpu_percent,
-                memory_percent=memory.percent,
-                disk_percent=disk.percent,
+                memory_percent=sample.memory_percent,
+                disk_percent=sample.disk_percent,
                 load_avg=load_avg,
                 uptime=uptime
             )
@@ -334,34 +924,34 @@ class HealthMonitor:
                     {'cpu_percent': cpu_percent, 'threshold': self.THRESHOLDS['cpu_warning']}
                 )
             
-            if memory.percent >= self.THRESHOLDS['memory_critical']:
+            if sample.memory_percent >= self.THRESHOLDS['memory_critical']:
                 self._add_alert(
                     AlertLevel.CRITICAL,
                     'system',
-                    f"Critical memory usage: {memory.percent:.1f}%",
-                    {'memory_percent': memory.percent, 'threshold': self.THRESHOLDS['memory_critical']}
+                    f"Critical memory usage: {sample.memory_percent:.1f}%",
+                    {'memory_percent': sample.memory_percent, 'threshold': self.THRESHOLDS['memory_critical']}
                 )
-            elif memory.percent >= self.THRESHOLDS['memory_warning']:
+            elif sample.memory_percent >= self.THRESHOLDS['memory_warning']:
                 self._add_alert(
                     AlertLevel.WARNING,
                     'system',
-                    f"High memory usage: {memory.percent:.1f}%",
-                    {'memory_percent': memory.percent, 'threshold': self.THRESHOLDS['memory_warning']}
+                    f"High memory usage: {sample.memory_percent:.1f}%",
+                    {'memory_percent': sample.memory_percent, 'threshold': self.THRESHOLDS['memory_warning']}
                 )
             
-            if disk.percent >= self.THRESHOLDS['disk_critical']:
+            if sample.disk_percent >= self.THRESHOLDS['disk_critical']:
                 self._add_alert(
                     AlertLevel.CRITICAL,
                     'system',
-                    f"Critical disk usage: {disk.percent:.1f}%",
-                    {'disk_percent': disk.percent, 'threshold': self.THRESHOLDS['disk_critical']}
+                    f"Critical disk usage: {sample.disk_percent:.1f}%",
+                    {'disk_percent': sample.disk_percent, 'threshold': self.THRESHOLDS['disk_critical']}
                 )
-            elif disk.percent >= self.THRESHOLDS['disk_warning']:
+            elif sample.disk_percent >= self.THRESHOLDS['disk_warning']:
                 self._add_alert(
                     AlertLevel.WARNING,
                     'system',
-                    f"High disk usage: {disk.percent:.1f}%",
-                    {'disk_percent': disk.percent, 'threshold': self.THRESHOLDS['disk_warning']}
+                    f"High disk usage: {sample.disk_percent:.1f}%",
+                    {'disk_percent': sample.disk_percent, 'threshold': self.THRESHOLDS['disk_warning']}
                 )
             
             return resources
@@ -376,6 +966,29 @@ class HealthMonitor:
             )
             raise
     
+    def get_resource_trends(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get 1/5/15-minute averages and maxima from the resource sampler
+        
+        Example:
+            trends = monitor.get_resource_trends()
+            print(f"CPU 5m avg: {trends['5m']['cpu_percent_avg']:.1f}%")
+        """
+        self.sampler.start()
+        return self.sampler.aggregates()
+    
+    def get_resource_percentile(self, metric: str, percentile: float,
+                                minutes: Optional[float] = None) -> Optional[float]:
+        """
+        Get a percentile of a sampled metric over the last minutes (default: whole window)
+        
+        Example:
+            p95 = monitor.get_resource_percentile('cpu_percent', 95, minutes=15)
+        """
+        self.sampler.start()
+        seconds = minutes * 60 if minutes is not None else None
+        return self.sampler.percentile(metric, percentile, seconds)
+    
     def validate_configs(self) -> Dict[str, bool]:
         """
         Validate configuration files for all services
@@ -426,10 +1039,13 @@ class HealthMonitor:
                                     AlertLevel.INFO,
                                     service_name,
                                     f"Configuration file changed: {config_path}",
-                                    {'config_path': config_path, 'action': 'recommend_service_restart'}
+                                    {'config_path': config_path, 'action': 'recommend_service_restart',
+                                     'changed_files': self.config_changes.get(config_path, {})}
                                 )
                         
-                        self.config_hashes[config_path] = current_hash
+                        if self.config_hashes.get(config_path) != current_hash:
+                            self.config_hashes[config_path] = current_hash
+                            self._config_hashes_dirty = True
                     
                     # Service-specific validation
                     if service_name == 'dnsmasq' and config_path.endswith('dnsmasq.conf'):
@@ -506,10 +1122,16 @@ class HealthMonitor:
         services = []
         failed_services = 0
         
-        # Check all critical services
+        # Check all critical services against one walk of the process table
+        try:
+            snapshot = self.get_process_snapshot(refresh=True)
+        except Exception as e:
+            self.logger.error(f"Error reading process table: {e}")
+            snapshot = None
+        
         for service_name in self.CRITICAL_SERVICES:
             try:
-                service_info = self.check_service(service_name)
+                service_info = self.check_service(service_name, snapshot)
                 services.append(asdict(service_info))
                 
                 if service_info.status in [ServiceStatus.STOPPED, ServiceStatus.FAILED]:
@@ -562,13 +1184,15 @@ class HealthMonitor:
             }
         }
     
-    def get_recent_alerts(self, hours: int = 24, level: Optional[AlertLevel] = None) -> List[Dict[str, Any]]:
+    def get_recent_alerts(self, hours: int = 24, level: Optional[AlertLevel] = None,
+                          service: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Get recent alerts within specified timeframe
+        Get recent alerts within specified timeframe, newest first
         
         Args:
             hours: Number of hours to look back
             level: Filter by alert level (optional)
+            service: Filter by service (optional)
             
         Returns:
             List of alert dictionaries
@@ -579,16 +1203,8 @@ class HealthMonitor:
             for alert in critical_alerts:
                 print(f"CRITICAL: {alert['message']}")
         """
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        
-        recent_alerts = []
-        for alert in self.alerts:
-            alert_time = datetime.fromisoformat(alert.timestamp)
-            if alert_time >= cutoff_time:
-                if level is None or alert.level == level:
-                    recent_alerts.append(alert.to_dict())
-        
-        return sorted(recent_alerts, key=lambda x: x['timestamp'], reverse=True)
+        alerts = self.alert_store.query(since=time.time() - hours * 3600, level=level, service=service)
+        return [alert.to_dict() for alert in alerts]
     
     def clear_alerts(self, hours: Optional[int] = None) -> int:
         """
@@ -598,19 +1214,9 @@ class HealthMonitor:
             Number of alerts cleared
         """
         if hours is None:
-            cleared = len(self.alerts)
-            self.alerts = []
-            return cleared
-        
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        original_count = len(self.alerts)
-        
-        self.alerts = [
-            alert for alert in self.alerts
-            if datetime.fromisoformat(alert.timestamp) >= cutoff_time
-        ]
+            return self.alert_store.clear()
         
-        return original_count - len(self.alerts)
+        return self.alert_store.clear(before=time.time() - hours * 3600)
     
     def send_web_alert(self, alert: Alert) -> bool:
         """
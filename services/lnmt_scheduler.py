@@ -5,6 +5,14 @@ A robust, pluggable scheduler for automating polling, backup, reporting, and mai
 """
 
 import asyncio
+import atexit
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import re
 import threading
 import time
 import json
@@ -20,6 +28,8 @@ import traceback
 import signal
 import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+from importlib import import_module
 from abc import ABC, abstractmethod
 
 # Job Status Enumeration
@@ -31,6 +41,14 @@ class JobStatus(Enum):
     CANCELLED = "cancelled"
     RETRYING = "retrying"
 
+# How a job function is run: in a scheduler thread, a warm worker process,
+# or a fresh interpreter per run
+EXECUTOR_MODES = ("thread", "process", "subprocess")
+
+# What to do about runs missed while the scheduler was down, busy, or the job
+# was still running: drop them, run once to catch up, or run each missed slot
+MISFIRE_POLICIES = ("skip", "run_once", "run_all")
+
 # Job Priority Enumeration
 class JobPriority(Enum):
     LOW = 1
@@ -65,6 +83,12 @@ class JobConfig:
     enabled: bool = True
     args: List[Any] = None
     kwargs: Dict[str, Any] = None
+    executor: str = "thread"  # one of EXECUTOR_MODES
+    history_limit: Optional[int] = None  # runs kept in job_history; None uses the registry default
+    misfire_policy: str = "skip"  # one of MISFIRE_POLICIES
+    max_catchup: int = 10  # most missed runs run_all queues behind the current one
+    jitter: Optional[float] = None  # spreading window in seconds; None uses the scheduler default
+    triggered_by_dependencies: bool = False  # also run in a dependency's run, right after it succeeds
     
     def __post_init__(self):
         if self.dependencies is None:
@@ -73,18 +97,296 @@ class JobConfig:
             self.args = []
         if self.kwargs is None:
             self.kwargs = {}
+        if self.executor not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode for job {self.id}: {self.executor}")
+        if self.misfire_policy not in MISFIRE_POLICIES:
+            raise ValueError(f"Unknown misfire policy for job {self.id}: {self.misfire_policy}")
+
+@lru_cache(maxsize=None)
+def resolve_job_callable(module_name: str, function_path: str) -> Callable:
+    """Import a job's module and look up its (possibly dotted) function, once per process"""
+    target = import_module(module_name)
+    for name in function_path.split('.'):
+        target = getattr(target, name)
+    return target
+
+def _invoke_job(module_name: str, function_path: str, args: List[Any], kwargs: Dict[str, Any]):
+    """Entry point for jobs run in the worker process pool"""
+    output = resolve_job_callable(module_name, function_path)(*args, **kwargs)
+    return str(output) if output else None
+
+def _process_worker_main(conn):
+    """Loop of a warm worker process: run one job spec at a time until told to stop"""
+    while True:
+        try:
+            spec = conn.recv()
+        except EOFError:
+            return
+        if spec is None:
+            return
+        try:
+            reply = (True, _invoke_job(*spec))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Unpicklable result or exception
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+class ProcessWorkerPool:
+    """
+    Warm worker processes for process-mode jobs, one job per worker at a time.
+    
+    Each worker imports job modules once and keeps them between jobs. A job
+    owns its worker while it runs, so a timed-out job is stopped by killing
+    just that worker; other jobs keep theirs, and a fresh worker replaces
+    the killed one on demand.
+    """
+    
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._context = multiprocessing.get_context()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._idle: List[tuple] = []
+        self._lock = threading.Lock()
+    
+    def _checkout(self) -> tuple:
+        with self._lock:
+            while self._idle:
+                process, conn = self._idle.pop()
+                if process.is_alive():
+                    return process, conn
+                conn.close()
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_process_worker_main, args=(child_conn,),
+                                        name="lnmt-job-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        return process, conn
+    
+    def run(self, module_name: str, function_path: str, args: List[Any],
+            kwargs: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Run a job in a worker, blocking; on timeout kill the worker and raise TimeoutError"""
+        with self._slots:
+            process, conn = self._checkout()
+            try:
+                conn.send((module_name, function_path, args, kwargs))
+                finished = conn.poll(timeout)
+                if finished:
+                    ok, value = conn.recv()
+            except (EOFError, OSError):
+                self._kill(process, conn)
+                raise RuntimeError(f"worker process exited with code {process.exitcode}")
+            except Exception:
+                # e.g. unpicklable job arguments; the pipe state is unknown, so drop the worker
+                self._kill(process, conn)
+                raise
+            if not finished:
+                self._kill(process, conn)
+                raise asyncio.TimeoutError()
+            
+            with self._lock:
+                self._idle.append((process, conn))
+        if not ok:
+            raise value
+        return value
+    
+    @staticmethod
+    def _kill(process, conn):
+        process.kill()
+        process.join()
+        conn.close()
+    
+    def shutdown(self):
+        """Stop the idle workers"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for process, conn in idle:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            conn.close()
+
+# Runs one job in a fresh interpreter; the job spec arrives as JSON on stdin and
+# the result goes back on the original stdout, while the job's own prints go to stderr
+_SUBPROCESS_RUNNER = """
+import json, sys
+from importlib import import_module
+spec = json.load(sys.stdin)
+sys.path[:0] = spec['path']
+target = import_module(spec['module'])
+for name in spec['function'].split('.'):
+    target = getattr(target, name)
+result_stream, sys.stdout = sys.stdout, sys.stderr
+output = target(*spec['args'], **spec['kwargs'])
+json.dump({'output': str(output) if output else None}, result_stream)
+"""
+
+class JobHistoryWriter:
+    """
+    Buffers job results and writes them to job_history in batches.
+    
+    Results are queued without touching SQLite and a background thread
+    writes them over one connection, a batch per transaction. Each batch
+    also bumps the per-day success/failure counts in job_history_daily and
+    trims every job it touched to its most recent runs.
+    """
+    
+    def __init__(self, db_path: str, limit_for: Callable[[str], int],
+                 batch_size: int = 200, flush_interval: float = 1.0):
+        self.db_path = db_path
+        self.limit_for = limit_for
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+    
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lnmt-history",
+                                                daemon=True)
+                self._thread.start()
+                # Short-lived users (e.g. schedctl run) still get their results written
+                atexit.register(self.close)
+    
+    def write(self, result: JobResult):
+        """Queue a result for the next batch"""
+        self._ensure_started()
+        self._queue.put(result)
+    
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """Block until everything queued so far has been written"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+    
+    def close(self):
+        """Write what is pending and stop the writer thread"""
+        if self._thread is None:
+            return
+        atexit.unregister(self.close)
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+    
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                
+                batch, markers, stopping = [], [], False
+                while True:
+                    if item is None:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        markers.append(item)
+                    else:
+                        batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                
+                if batch:
+                    self._write_batch(conn, batch)
+                for marker in markers:
+                    marker.set()
+                if stopping:
+                    return
+        finally:
+            conn.close()
+    
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[JobResult]):
+        daily: Dict[tuple, List[int]] = {}
+        for result in batch:
+            counts = daily.setdefault((result.job_id, result.start_time.date().isoformat()), [0, 0])
+            counts[0 if result.status == JobStatus.COMPLETED else 1] += 1
+        
+        try:
+            with conn:
+                conn.executemany("""
+                    INSERT INTO job_history 
+                    (job_id, status, start_time, end_time, error, output, retry_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [(
+                    r.job_id, r.status.value, r.start_time.isoformat(" "),
+                    r.end_time.isoformat(" ") if r.end_time else None,
+                    r.error, r.output, r.retry_count
+                ) for r in batch])
+                
+                conn.executemany("""
+                    INSERT INTO job_history_daily (job_id, day, successes, failures)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (job_id, day) DO UPDATE SET
+                        successes = successes + excluded.successes,
+                        failures = failures + excluded.failures
+                """, [key + tuple(counts) for key, counts in daily.items()])
+                
+                for job_id in {r.job_id for r in batch}:
+                    conn.execute("""
+                        DELETE FROM job_history WHERE job_id = ? AND start_time < (
+                            SELECT start_time FROM job_history WHERE job_id = ?
+                            ORDER BY start_time DESC LIMIT 1 OFFSET ?
+                        )
+                    """, (job_id, job_id, self.limit_for(job_id) - 1))
+        except Exception as e:
+            logging.error(f"Failed to save {len(batch)} job results: {e}")
 
 class JobRegistry:
     """Registry for managing job definitions and configurations"""
     
-    def __init__(self, db_path: str = "scheduler.db"):
+    # Runs kept per job in job_history unless the job sets history_limit
+    DEFAULT_HISTORY_LIMIT = 500
+    
+    # Columns added to jobs after its first release, in table order
+    ADDED_COLUMNS = [
+        ('executor', "TEXT DEFAULT 'thread'"),
+        ('history_limit', "INTEGER"),
+        ('misfire_policy', "TEXT DEFAULT 'skip'"),
+        ('max_catchup', "INTEGER DEFAULT 10"),
+        ('jitter', "REAL"),
+        ('triggered_by_dependencies', "BOOLEAN DEFAULT FALSE"),
+    ]
+    
+    def __init__(self, db_path: str = "scheduler.db", history_limit: int = DEFAULT_HISTORY_LIMIT):
         self.db_path = db_path
         self.jobs: Dict[str, JobConfig] = {}
+        self.history_limit = history_limit
         self._init_database()
+        self.history = JobHistoryWriter(db_path, self._history_limit_for)
+        
+        # Read-only connection that watches for edits made by other processes
+        self._watch_conn: Optional[sqlite3.Connection] = None
+        self._watch_version: Optional[int] = None
     
     def _init_database(self):
         """Initialize the SQLite database for job storage"""
         with sqlite3.connect(self.db_path) as conn:
+            # WAL lets the history writer commit alongside registry reads. The
+            # mode is stored in the file, and switching needs an exclusive lock,
+            # so it is done once here rather than by the writer thread.
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Could not switch {self.db_path} to WAL mode: {e}")
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS jobs (
                     id TEXT PRIMARY KEY,
@@ -101,9 +403,39 @@ class JobRegistry:
                     args TEXT DEFAULT '[]',
                     kwargs TEXT DEFAULT '{}',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    executor TEXT DEFAULT 'thread',
+                    history_limit INTEGER,
+                    misfire_policy TEXT DEFAULT 'skip',
+                    max_catchup INTEGER DEFAULT 10,
+                    jitter REAL,
+                    triggered_by_dependencies BOOLEAN DEFAULT FALSE
+                )
+            """)
+            
+            # Databases created before these columns existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in self.ADDED_COLUMNS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            
+            # Bumped by any change to jobs, so a running scheduler can spot
+            # edits from other processes without re-reading the table
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
                 )
             """)
+            conn.execute("INSERT OR IGNORE INTO jobs_version (id, version) VALUES (1, 0)")
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS jobs_version_{event.lower()}
+                    AFTER {event} ON jobs
+                    BEGIN
+                        UPDATE jobs_version SET version = version + 1 WHERE id = 1;
+                    END
+                """)
             
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS job_history (
@@ -118,6 +450,25 @@ class JobRegistry:
                     FOREIGN KEY (job_id) REFERENCES jobs (id)
                 )
             """)
+            
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_job_history_job_start
+                ON job_history (job_id, start_time)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_job_history_start
+                ON job_history (start_time)
+            """)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_history_daily (
+                    job_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    successes INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (job_id, day)
+                )
+            """)
     
     def register_job(self, job_config: JobConfig) -> bool:
         """Register a new job or update existing one"""
@@ -126,13 +477,17 @@ class JobRegistry:
                 conn.execute("""
                     INSERT OR REPLACE INTO jobs 
                     (id, name, module, function, schedule, priority, max_retries, 
-                     retry_delay, timeout, dependencies, enabled, args, kwargs, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                     retry_delay, timeout, dependencies, enabled, args, kwargs, executor,
+                     history_limit, misfire_policy, max_catchup, jitter, triggered_by_dependencies,
+                     updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                 """, (
                     job_config.id, job_config.name, job_config.module, job_config.function,
                     job_config.schedule, job_config.priority.value, job_config.max_retries,
                     job_config.retry_delay, job_config.timeout, json.dumps(job_config.dependencies),
-                    job_config.enabled, json.dumps(job_config.args), json.dumps(job_config.kwargs)
+                    job_config.enabled, json.dumps(job_config.args), json.dumps(job_config.kwargs),
+                    job_config.executor, job_config.history_limit, job_config.misfire_policy,
+                    job_config.max_catchup, job_config.jitter, job_config.triggered_by_dependencies
                 ))
             
             self.jobs[job_config.id] = job_config
@@ -158,23 +513,40 @@ class JobRegistry:
         return None
     
     def get_all_jobs(self) -> List[JobConfig]:
-        """Get all registered jobs"""
+        """Get all registered jobs, replacing the in-memory cache"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.execute("SELECT * FROM jobs ORDER BY priority DESC, name")
-            jobs = []
-            for row in cursor.fetchall():
-                job_config = self._row_to_job_config(row)
-                self.jobs[job_config.id] = job_config
-                jobs.append(job_config)
+            jobs = [self._row_to_job_config(row) for row in cursor.fetchall()]
+        self.jobs = {job_config.id: job_config for job_config in jobs}
         return jobs
     
+    def jobs_changed(self) -> bool:
+        """
+        True if the jobs table changed since the last call, including edits
+        made by other processes such as schedctl.
+        
+        Only the trigger-maintained jobs_version row is read, so history
+        writes and other tables never cause a rescan.
+        """
+        if self._watch_conn is None:
+            self._watch_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        version = self._watch_conn.execute("SELECT version FROM jobs_version WHERE id = 1").fetchone()[0]
+        if version == self._watch_version:
+            return False
+        self._watch_version = version
+        return True
+    
     def _row_to_job_config(self, row) -> JobConfig:
         """Convert database row to JobConfig object"""
         return JobConfig(
             id=row[0], name=row[1], module=row[2], function=row[3],
             schedule=row[4], priority=JobPriority(row[5]), max_retries=row[6],
             retry_delay=row[7], timeout=row[8], dependencies=json.loads(row[9]),
-            enabled=bool(row[10]), args=json.loads(row[11]), kwargs=json.loads(row[12])
+            enabled=bool(row[10]), args=json.loads(row[11]), kwargs=json.loads(row[12]),
+            executor=row[15] or "thread", history_limit=row[16],
+            misfire_policy=row[17] or "skip",
+            max_catchup=row[18] if row[18] is not None else 10, jitter=row[19],
+            triggered_by_dependencies=bool(row[20])
         )
     
     def unregister_job(self, job_id: str) -> bool:
@@ -190,30 +562,145 @@ class JobRegistry:
             logging.error(f"Failed to unregister job {job_id}: {e}")
             return False
     
+    def _history_limit_for(self, job_id: str) -> int:
+        job = self.jobs.get(job_id)
+        if job and job.history_limit:
+            return job.history_limit
+        return self.history_limit
+    
     def save_job_result(self, result: JobResult):
-        """Save job execution result to history"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO job_history 
-                    (job_id, status, start_time, end_time, error, output, retry_count)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    result.job_id, result.status.value, result.start_time,
-                    result.end_time, result.error, result.output, result.retry_count
-                ))
-        except Exception as e:
-            logging.error(f"Failed to save job result for {result.job_id}: {e}")
+        """Queue a job execution result for the batched history writer"""
+        self.history.write(result)
+    
+    def flush_history(self):
+        """Make every result saved so far visible to readers"""
+        if not self.history.flush():
+            logging.warning("Timed out waiting for job history to flush")
+    
+    def get_job_history(self, job_id: Optional[str] = None, limit: int = 10) -> List[tuple]:
+        """Get the most recent runs, newest first, optionally for one job"""
+        self.flush_history()
+        with sqlite3.connect(self.db_path) as conn:
+            if job_id:
+                cursor = conn.execute("""
+                    SELECT job_id, status, start_time, end_time, error, retry_count
+                    FROM job_history 
+                    WHERE job_id = ?
+                    ORDER BY start_time DESC 
+                    LIMIT ?
+                """, (job_id, limit))
+            else:
+                cursor = conn.execute("""
+                    SELECT job_id, status, start_time, end_time, error, retry_count
+                    FROM job_history 
+                    ORDER BY start_time DESC 
+                    LIMIT ?
+                """, (limit,))
+            return cursor.fetchall()
+    
+    def get_last_run_times(self) -> Dict[str, datetime]:
+        """Get the start time of each job's most recent run"""
+        self.flush_history()
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute("""
+                SELECT job_id, MAX(start_time) FROM job_history GROUP BY job_id
+            """)
+            return {job_id: datetime.fromisoformat(start) for job_id, start in cursor}
+    
+    def get_daily_counts(self, job_id: Optional[str] = None, days: int = 14) -> List[tuple]:
+        """Get (job_id, day, successes, failures) for recent days, newest first"""
+        self.flush_history()
+        since = (datetime.now() - timedelta(days=days)).date().isoformat()
+        with sqlite3.connect(self.db_path) as conn:
+            if job_id:
+                cursor = conn.execute("""
+                    SELECT job_id, day, successes, failures FROM job_history_daily
+                    WHERE job_id = ? AND day > ? ORDER BY day DESC
+                """, (job_id, since))
+            else:
+                cursor = conn.execute("""
+                    SELECT job_id, day, successes, failures FROM job_history_daily
+                    WHERE day > ? ORDER BY day DESC, job_id
+                """, (since,))
+            return cursor.fetchall()
+    
+    def close(self):
+        """Flush and stop the history writer"""
+        self.history.close()
+        if self._watch_conn is not None:
+            self._watch_conn.close()
+            self._watch_conn = None
 
 class JobExecutor:
     """Handles job execution with timeout, retries, and error handling"""
     
-    def __init__(self, max_workers: int = 5):
+    def __init__(self, max_workers: int = 5, process_workers: Optional[int] = None):
         self.max_workers = max_workers
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self._process_pool: Optional[ProcessWorkerPool] = None
+        self._process_lock = threading.Lock()
         self.running_jobs: Dict[str, asyncio.Future] = {}
     
-    async def execute_job(self, job_config: JobConfig, registry: JobRegistry) -> JobResult:
+    def _get_process_pool(self) -> ProcessWorkerPool:
+        """Get the warm worker process pool, starting it on first use"""
+        with self._process_lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessWorkerPool(self.process_workers)
+            return self._process_pool
+    
+    async def _run_job_function(self, job_config: JobConfig,
+                                pool: Optional[ThreadPoolExecutor]) -> Any:
+        """Run the job function once in its executor mode, enforcing the timeout"""
+        loop = asyncio.get_running_loop()
+        
+        if job_config.executor == "process":
+            # The pool enforces the timeout by killing only this job's worker
+            return await loop.run_in_executor(
+                None, self._get_process_pool().run,
+                job_config.module, job_config.function, job_config.args, job_config.kwargs,
+                job_config.timeout
+            )
+        
+        if job_config.executor == "subprocess":
+            return await self._run_in_subprocess(job_config)
+        
+        job_function = resolve_job_callable(job_config.module, job_config.function)
+        future = loop.run_in_executor(
+            pool or self.executor,
+            partial(job_function, *job_config.args, **job_config.kwargs)
+        )
+        # A timed-out thread can't be stopped; use process/subprocess mode for that
+        return await asyncio.wait_for(future, timeout=job_config.timeout)
+    
+    async def _run_in_subprocess(self, job_config: JobConfig) -> Optional[str]:
+        """Run the job in a fresh interpreter, killing it on timeout"""
+        spec = json.dumps({
+            'path': sys.path, 'module': job_config.module, 'function': job_config.function,
+            'args': job_config.args, 'kwargs': job_config.kwargs
+        }).encode()
+        
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-c', _SUBPROCESS_RUNNER,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(spec),
+                                                    timeout=job_config.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        
+        if process.returncode != 0:
+            error_tail = stderr.decode(errors='replace').strip().splitlines()[-5:]
+            raise RuntimeError(f"subprocess exited with {process.returncode}: " + "\n".join(error_tail))
+        return json.loads(stdout)['output']
+    
+    async def execute_job(self, job_config: JobConfig, registry: JobRegistry,
+                          pool: Optional[ThreadPoolExecutor] = None) -> JobResult:
         """Execute a single job with proper error handling and retries"""
         result = JobResult(
             job_id=job_config.id,
@@ -226,19 +713,8 @@ class JobExecutor:
                 result.retry_count = attempt
                 result.status = JobStatus.RUNNING
                 
-                # Import and execute the job function
-                module = __import__(job_config.module, fromlist=[job_config.function])
-                job_function = getattr(module, job_config.function)
-                
-                # Execute in thread pool with timeout
-                loop = asyncio.get_event_loop()
-                future = loop.run_in_executor(
-                    self.executor,
-                    lambda: job_function(*job_config.args, **job_config.kwargs)
-                )
-                
-                # Wait with timeout
-                job_output = await asyncio.wait_for(future, timeout=job_config.timeout)
+                # Execute in the job's executor mode with timeout
+                job_output = await self._run_job_function(job_config, pool)
                 
                 result.status = JobStatus.COMPLETED
                 result.end_time = datetime.now()
@@ -270,21 +746,95 @@ class JobExecutor:
     def shutdown(self):
         """Shutdown the executor"""
         self.executor.shutdown(wait=True)
+        with self._process_lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            pool.shutdown()
+
+class DagRun:
+    """
+    One execution of a job and the dependents it triggers.
+    
+    Dependency state is scoped to the run: a job becomes ready once every
+    dependency that is part of the same run has completed in this run, and
+    a failure skips everything downstream of it.
+    """
+    
+    def __init__(self, run_id: int, jobs: List[JobConfig]):
+        self.run_id = run_id
+        self.jobs = {job.id: job for job in jobs}
+        self.order = [job.id for job in jobs]
+        self.waiting = {
+            job.id: {dep for dep in job.dependencies if dep in self.jobs}
+            for job in jobs
+        }
+        self.started: set = set()
+        self.completed: set = set()
+        self.failed: set = set()
+        self.skipped: set = set()
+        self.started_at = time.time()
+    
+    @property
+    def done(self) -> bool:
+        return len(self.completed) + len(self.failed) + len(self.skipped) == len(self.jobs)
+    
+    def ready(self) -> List[JobConfig]:
+        """Jobs whose in-run dependencies are all complete, in topological order"""
+        ready = []
+        for job_id in self.order:
+            if job_id not in self.started and job_id not in self.skipped and not self.waiting[job_id]:
+                self.started.add(job_id)
+                ready.append(self.jobs[job_id])
+        return ready
+    
+    def finish(self, job_id: str, success: bool):
+        """Record a job's outcome, releasing or skipping its dependents"""
+        if success:
+            self.completed.add(job_id)
+            for waiting in self.waiting.values():
+                waiting.discard(job_id)
+        else:
+            self.failed.add(job_id)
+            self._skip_dependents(job_id)
+    
+    def skip(self, job_id: str):
+        """Drop a job that could not be started, along with its dependents"""
+        self.skipped.add(job_id)
+        self._skip_dependents(job_id)
+    
+    def _skip_dependents(self, job_id: str):
+        for other_id in self.order:
+            if job_id in self.waiting[other_id] and other_id not in self.skipped:
+                self.skip(other_id)
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'run_id': self.run_id,
+            'jobs': list(self.order),
+            'completed': sorted(self.completed),
+            'failed': sorted(self.failed),
+            'skipped': sorted(self.skipped),
+            'running': sorted(self.started - self.completed - self.failed),
+        }
 
 class DependencyManager:
     """Manages job dependencies and execution order"""
     
     def __init__(self, registry: JobRegistry):
         self.registry = registry
+        # Latest outcome of each job; a newer run replaces an older result
         self.completed_jobs: set = set()
         self.failed_jobs: set = set()
+        self._run_ids = itertools.count(1)
     
-    def can_execute_job(self, job_config: JobConfig) -> bool:
-        """Check if job dependencies are satisfied"""
+    def can_execute_job(self, job_config: JobConfig, exclude: Optional[set] = None) -> bool:
+        """Check if job dependencies (other than those in exclude) are satisfied"""
         if not job_config.dependencies:
             return True
         
         for dep_id in job_config.dependencies:
+            if exclude and dep_id in exclude:
+                continue
             if dep_id in self.failed_jobs:
                 logging.warning(f"Job {job_config.id} cannot run due to failed dependency: {dep_id}")
                 return False
@@ -297,8 +847,10 @@ class DependencyManager:
         """Mark a job as completed or failed"""
         if success:
             self.completed_jobs.add(job_id)
+            self.failed_jobs.discard(job_id)
         else:
             self.failed_jobs.add(job_id)
+            self.completed_jobs.discard(job_id)
     
     def get_executable_jobs(self, all_jobs: List[JobConfig]) -> List[JobConfig]:
         """Get list of jobs that can be executed based on dependencies"""
@@ -310,17 +862,347 @@ class DependencyManager:
         # Sort by priority
         executable.sort(key=lambda x: x.priority.value, reverse=True)
         return executable
+    
+    @staticmethod
+    def find_cycle(dependencies: Dict[str, List[str]],
+                   roots: Optional[List[str]] = None) -> Optional[List[str]]:
+        """
+        Return a dependency cycle as a list of job ids, or None if the graph is acyclic
+        
+        With roots, only cycles reachable from those jobs are searched for.
+        """
+        visiting, visited = set(), set()
+        path: List[str] = []
+        
+        def visit(job_id: str) -> Optional[List[str]]:
+            visiting.add(job_id)
+            path.append(job_id)
+            for dep_id in dependencies.get(job_id, ()):
+                if dep_id in visiting:
+                    return path[path.index(dep_id):] + [dep_id]
+                if dep_id not in visited:
+                    cycle = visit(dep_id)
+                    if cycle:
+                        return cycle
+            visiting.discard(job_id)
+            visited.add(job_id)
+            path.pop()
+            return None
+        
+        for job_id in (dependencies if roots is None else roots):
+            if job_id not in visited:
+                cycle = visit(job_id)
+                if cycle:
+                    return cycle
+        return None
+    
+    def check_registration(self, job_config: JobConfig,
+                           dependencies: Dict[str, List[str]]) -> Optional[List[str]]:
+        """
+        Return the cycle registering job_config would create, if any
+        
+        dependencies maps the registered job ids to their dependencies. A
+        new cycle has to pass through job_config, so only paths from it are
+        searched.
+        """
+        graph = dict(dependencies)
+        graph[job_config.id] = job_config.dependencies
+        return self.find_cycle(graph, roots=[job_config.id])
+    
+    def plan_run(self, root: JobConfig, jobs: Dict[str, JobConfig]) -> DagRun:
+        """
+        Plan a run of root and its triggered dependents, topologically ordered
+        
+        Only enabled jobs that set triggered_by_dependencies join a run, along
+        with their own triggered dependents. Other dependents keep to their
+        own schedules.
+        """
+        dependents: Dict[str, List[str]] = {}
+        for job in jobs.values():
+            for dep_id in job.dependencies:
+                dependents.setdefault(dep_id, []).append(job.id)
+        
+        members = {root.id}
+        stack = [root.id]
+        while stack:
+            for child_id in dependents.get(stack.pop(), ()):
+                child = jobs.get(child_id)
+                if (child and child.enabled and child.triggered_by_dependencies
+                        and child_id not in members):
+                    members.add(child_id)
+                    stack.append(child_id)
+        
+        # Kahn's algorithm over the run's subgraph
+        remaining = {job_id: sum(1 for d in jobs[job_id].dependencies if d in members)
+                     for job_id in members}
+        ready = [job_id for job_id, count in remaining.items() if count == 0]
+        order = []
+        while ready:
+            job_id = ready.pop(0)
+            order.append(job_id)
+            for child_id in dependents.get(job_id, ()):
+                if child_id in remaining:
+                    remaining[child_id] -= 1
+                    if remaining[child_id] == 0:
+                        ready.append(child_id)
+        
+        run_jobs = [root] + [jobs[job_id] for job_id in order if job_id != root.id]
+        return DagRun(next(self._run_ids), run_jobs)
+
+class JobDispatcher:
+    """
+    Runs due jobs concurrently in per-priority lanes.
+    
+    Each priority has its own bounded queue, worker tasks and thread pool,
+    so a lane full of slow LOW jobs can never hold up CRITICAL ones. A job
+    that is already queued or running is not submitted again, and a full
+    lane rejects new work instead of blocking the scheduler loop.
+    """
+    
+    DEFAULT_LANE_LIMITS = {
+        JobPriority.CRITICAL: 2,
+        JobPriority.HIGH: 3,
+        JobPriority.NORMAL: 3,
+        JobPriority.LOW: 1,
+    }
+    
+    def __init__(self, executor: 'JobExecutor', registry: JobRegistry,
+                 lane_limits: Optional[Dict[JobPriority, int]] = None,
+                 max_queue: int = 100,
+                 on_complete: Optional[Callable[[JobConfig, JobResult], None]] = None):
+        self.executor = executor
+        self.registry = registry
+        self.lane_limits = dict(self.DEFAULT_LANE_LIMITS)
+        self.lane_limits.update(lane_limits or {})
+        self.max_queue = max_queue
+        self.on_complete = on_complete
+        
+        self.pools = {
+            lane: ThreadPoolExecutor(max_workers=limit,
+                                     thread_name_prefix=f"lnmt-{lane.name.lower()}")
+            for lane, limit in self.lane_limits.items()
+        }
+        self.stats = {
+            lane: {'running': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'overlapped': 0}
+            for lane in self.lane_limits
+        }
+        self._active: set = set()
+        self._active_lock = threading.Lock()
+        self._queues: Dict[JobPriority, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+    
+    def start(self):
+        """Create lane queues and workers on the running event loop"""
+        # Unbounded so stop() can always enqueue worker sentinels; submit enforces max_queue
+        self._queues = {lane: asyncio.Queue() for lane in self.lane_limits}
+        self._workers = [
+            asyncio.create_task(self._worker(lane))
+            for lane, limit in self.lane_limits.items()
+            for _ in range(limit)
+        ]
+    
+    def acquire(self, job_id: str) -> bool:
+        """Mark a job active; False if it is already queued or running"""
+        with self._active_lock:
+            if job_id in self._active:
+                return False
+            self._active.add(job_id)
+            return True
+    
+    def release(self, job_id: str):
+        """Mark a job no longer active"""
+        with self._active_lock:
+            self._active.discard(job_id)
+    
+    def is_active(self, job_id: str) -> bool:
+        return job_id in self._active
+    
+    def submit(self, job_config: JobConfig) -> bool:
+        """Queue a job on its priority lane without waiting"""
+        lane = job_config.priority
+        if not self.acquire(job_config.id):
+            self.stats[lane]['overlapped'] += 1
+            logging.warning(f"Job {job_config.id} is still running, skipping this run")
+            return False
+        
+        lane_queue = self._queues[lane]
+        if lane_queue.qsize() >= self.max_queue:
+            self.release(job_config.id)
+            self.stats[lane]['rejected'] += 1
+            logging.warning(f"{lane.name} lane is full, dropping run of job {job_config.id}")
+            return False
+        
+        lane_queue.put_nowait(job_config)
+        return True
+    
+    async def _worker(self, lane: JobPriority):
+        lane_queue = self._queues[lane]
+        while True:
+            job_config = await lane_queue.get()
+            if job_config is None:
+                lane_queue.task_done()
+                return
+            
+            self.stats[lane]['running'] += 1
+            released = False
+            try:
+                result = await self.executor.execute_job(job_config, self.registry,
+                                                         pool=self.pools[lane])
+                key = 'completed' if result.status == JobStatus.COMPLETED else 'failed'
+                self.stats[lane][key] += 1
+                # Released first so on_complete may queue the job again; a run it
+                # queues owns the active marker from then on
+                self.release(job_config.id)
+                released = True
+                if self.on_complete:
+                    self.on_complete(job_config, result)
+            except Exception as e:
+                self.stats[lane]['failed'] += 1
+                logging.error(f"Failed to execute job {job_config.id}: {e}")
+            finally:
+                self.stats[lane]['running'] -= 1
+                if not released:
+                    self.release(job_config.id)
+                lane_queue.task_done()
+    
+    async def stop(self):
+        """Drop queued jobs and wait for running ones to finish"""
+        for lane, lane_queue in self._queues.items():
+            while not lane_queue.empty():
+                job_config = lane_queue.get_nowait()
+                lane_queue.task_done()
+                if job_config is not None:
+                    self.release(job_config.id)
+            for _ in range(self.lane_limits[lane]):
+                lane_queue.put_nowait(None)
+        
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+    
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        """Live per-lane queue depth, concurrency and outcome counters"""
+        return {
+            lane.name: {
+                'queued': self._queues[lane].qsize() if lane in self._queues else 0,
+                'limit': self.lane_limits[lane],
+                **self.stats[lane]
+            }
+            for lane in self.lane_limits
+        }
+    
+    def shutdown(self):
+        """Shutdown the lane thread pools"""
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+
+class JobTimerQueue:
+    """
+    In-memory priority queue of job fire times.
+    
+    Entries are (fire_time, seq, job_id) on a heap. Rescheduling or removing
+    a job just records its new fire time; superseded heap entries are
+    discarded lazily when they reach the top.
+    """
+    
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._fire_times: Dict[str, float] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._fire_times)
+    
+    def schedule(self, job_id: str, fire_time: float):
+        """Set the next fire time (epoch seconds) of a job"""
+        with self._lock:
+            self._fire_times[job_id] = fire_time
+            self._seq += 1
+            heapq.heappush(self._heap, (fire_time, self._seq, job_id))
+            
+            # Compact once stale entries dominate the heap
+            if len(self._heap) > 2 * len(self._fire_times) + 64:
+                self._heap = [(t, n, j) for t, n, j in self._heap if self._fire_times.get(j) == t]
+                heapq.heapify(self._heap)
+    
+    def remove(self, job_id: str):
+        """Stop scheduling a job"""
+        with self._lock:
+            self._fire_times.pop(job_id, None)
+    
+    def clear(self):
+        """Remove all jobs"""
+        with self._lock:
+            self._heap.clear()
+            self._fire_times.clear()
+    
+    def next_fire_time(self, job_id: str) -> Optional[float]:
+        """Get the scheduled fire time of a job"""
+        return self._fire_times.get(job_id)
+    
+    def _discard_stale(self):
+        while self._heap:
+            fire_time, _, job_id = self._heap[0]
+            if self._fire_times.get(job_id) == fire_time:
+                return
+            heapq.heappop(self._heap)
+    
+    def peek(self) -> Optional[float]:
+        """Earliest pending fire time, or None if nothing is scheduled"""
+        with self._lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+    
+    def pop_due(self, now: float) -> List[tuple]:
+        """Remove and return (job_id, fire_time) for every job due at or before now"""
+        due = []
+        with self._lock:
+            while True:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                fire_time, _, job_id = heapq.heappop(self._heap)
+                del self._fire_times[job_id]
+                due.append((job_id, fire_time))
+        return due
 
 class LNMTScheduler:
     """Main scheduler class that orchestrates job execution"""
     
-    def __init__(self, config_file: str = "scheduler_config.json", db_path: str = "scheduler.db"):
+    # Interval schedules, e.g. "@every 250ms", "@every 1.5s", "@every 5m"
+    INTERVAL_PATTERN = re.compile(r'^@every\s+(\d+(?:\.\d+)?)\s*(ms|s|m|h)$')
+    INTERVAL_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    
+    # A fire handled later than this fraction of the job's interval counts as
+    # misfired, but never one handled within MISFIRE_GRACE seconds
+    MISFIRE_GRACE = 1.0
+    MISFIRE_GRACE_FRACTION = 0.5
+    
+    # Longest the loop sleeps before checking the registry for external edits
+    RESCAN_INTERVAL = 60.0
+    
+    def __init__(self, config_file: str = "scheduler_config.json", db_path: str = "scheduler.db",
+                 lane_limits: Optional[Dict[JobPriority, int]] = None, max_queue: int = 100,
+                 jitter_window: float = 0.0, misfire_grace: Optional[float] = None):
         self.config_file = config_file
+        self.jitter_window = jitter_window
+        self.misfire_grace = misfire_grace  # fixed grace in seconds, overrides the fraction
         self.registry = JobRegistry(db_path)
         self.executor = JobExecutor()
         self.dependency_manager = DependencyManager(self.registry)
+        self.dispatcher = JobDispatcher(self.executor, self.registry, lane_limits, max_queue,
+                                        on_complete=self._job_finished)
+        self._active_runs: Dict[str, DagRun] = {}
+        self._pending_runs: Dict[str, int] = {}
+        self.timers = JobTimerQueue()
         self.running = False
         self.logger = self._setup_logging()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_done = threading.Event()  # set while no scheduler loop is running
+        self._loop_done.set()
         
         # Load configuration
         self.load_config()
@@ -358,8 +1240,9 @@ class LNMTScheduler:
             with open(self.config_file, 'r') as f:
                 config = json.load(f)
             
+            job_configs = []
             for job_data in config.get('jobs', []):
-                job_config = JobConfig(
+                job_configs.append(JobConfig(
                     id=job_data['id'],
                     name=job_data['name'],
                     module=job_data['module'],
@@ -372,11 +1255,17 @@ class LNMTScheduler:
                     dependencies=job_data.get('dependencies', []),
                     enabled=job_data.get('enabled', True),
                     args=job_data.get('args', []),
-                    kwargs=job_data.get('kwargs', {})
-                )
-                self.registry.register_job(job_config)
+                    kwargs=job_data.get('kwargs', {}),
+                    executor=job_data.get('executor', 'thread'),
+                    history_limit=job_data.get('history_limit'),
+                    misfire_policy=job_data.get('misfire_policy', 'skip'),
+                    max_catchup=job_data.get('max_catchup', 10),
+                    jitter=job_data.get('jitter'),
+                    triggered_by_dependencies=job_data.get('triggered_by_dependencies', False)
+                ))
+            registered = self.register_jobs(job_configs)
             
-            self.logger.info(f"Loaded {len(config.get('jobs', []))} jobs from config")
+            self.logger.info(f"Loaded {len(registered)} of {len(job_configs)} jobs from config")
             
         except Exception as e:
             self.logger.error(f"Failed to load config: {e}")
@@ -399,7 +1288,13 @@ class LNMTScheduler:
                     'dependencies': job.dependencies,
                     'enabled': job.enabled,
                     'args': job.args,
-                    'kwargs': job.kwargs
+                    'kwargs': job.kwargs,
+                    'executor': job.executor,
+                    'history_limit': job.history_limit,
+                    'misfire_policy': job.misfire_policy,
+                    'max_catchup': job.max_catchup,
+                    'jitter': job.jitter,
+                    'triggered_by_dependencies': job.triggered_by_dependencies
                 })
             
             config = {'jobs': jobs_data}
@@ -412,11 +1307,41 @@ class LNMTScheduler:
             self.logger.error(f"Failed to save config: {e}")
     
     def register_job(self, job_config: JobConfig) -> bool:
-        """Register a new job"""
-        return self.registry.register_job(job_config)
+        """Register a new job, rejecting it if it would create a dependency cycle"""
+        return bool(self.register_jobs([job_config]))
+    
+    def register_jobs(self, job_configs: List[JobConfig]) -> List[str]:
+        """
+        Register jobs in order, rejecting any that would create a dependency cycle
+        
+        The registered jobs are read once for the whole batch. Returns the
+        ids of the jobs that were registered.
+        """
+        dependencies = {job.id: job.dependencies for job in self.registry.get_all_jobs()}
+        registered = []
+        
+        for job_config in job_configs:
+            cycle = self.dependency_manager.check_registration(job_config, dependencies)
+            if cycle:
+                self.logger.error(f"Cannot register job {job_config.id}: dependency cycle "
+                                  f"{' -> '.join(cycle)}")
+                continue
+            
+            if not self.registry.register_job(job_config):
+                continue
+            dependencies[job_config.id] = job_config.dependencies
+            registered.append(job_config.id)
+            
+            if self.running:
+                self._schedule_job(job_config)
+        
+        if registered and self.running:
+            self._wake()
+        return registered
     
     def unregister_job(self, job_id: str) -> bool:
         """Unregister a job"""
+        self.timers.remove(job_id)
         return self.registry.unregister_job(job_id)
     
     def get_job_status(self, job_id: str) -> Optional[Dict]:
@@ -426,48 +1351,180 @@ class LNMTScheduler:
             return None
         
         # Get latest execution result
-        with sqlite3.connect(self.registry.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT status, start_time, end_time, error, retry_count
-                FROM job_history 
-                WHERE job_id = ? 
-                ORDER BY start_time DESC 
-                LIMIT 1
-            """, (job_id,))
-            
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'job_id': job_id,
-                    'name': job.name,
-                    'enabled': job.enabled,
-                    'last_status': row[0],
-                    'last_run': row[1],
-                    'last_end': row[2],
-                    'last_error': row[3],
-                    'retry_count': row[4]
-                }
-            else:
-                return {
-                    'job_id': job_id,
-                    'name': job.name,
-                    'enabled': job.enabled,
-                    'last_status': 'never_run',
-                    'last_run': None,
-                    'last_end': None,
-                    'last_error': None,
-                    'retry_count': 0
-                }
-    
-    def get_next_run_time(self, job_config: JobConfig) -> Optional[datetime]:
-        """Calculate next run time for a job"""
+        history = self.registry.get_job_history(job_id, limit=1)
+        row = history[0][1:] if history else None
+        
+        if row:
+            return {
+                'job_id': job_id,
+                'name': job.name,
+                'enabled': job.enabled,
+                'last_status': row[0],
+                'last_run': row[1],
+                'last_end': row[2],
+                'last_error': row[3],
+                'retry_count': row[4],
+                'next_run': self._next_run_iso(job_id)
+            }
+        else:
+            return {
+                'job_id': job_id,
+                'name': job.name,
+                'enabled': job.enabled,
+                'last_status': 'never_run',
+                'last_run': None,
+                'last_end': None,
+                'last_error': None,
+                'retry_count': 0,
+                'next_run': self._next_run_iso(job_id)
+            }
+    
+    def _next_run_iso(self, job_id: str) -> Optional[str]:
+        fire_time = self.timers.next_fire_time(job_id)
+        return datetime.fromtimestamp(fire_time).isoformat() if fire_time is not None else None
+    
+    def get_next_run_time(self, job_config: JobConfig,
+                          base: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Calculate the next run time for a job after base (default: now).
+        
+        Schedules are cron expressions (a sixth field adds seconds) or
+        "@every <n><ms|s|m|h>" intervals for sub-minute and sub-second jobs.
+        """
+        base = base or datetime.now()
+        
+        interval = self.INTERVAL_PATTERN.match(job_config.schedule.strip())
+        if interval:
+            seconds = float(interval.group(1)) * self.INTERVAL_UNITS[interval.group(2)]
+            if seconds > 0:
+                return base + timedelta(seconds=seconds)
+        
         try:
-            cron = croniter.croniter(job_config.schedule, datetime.now())
+            cron = croniter.croniter(job_config.schedule, base)
             return cron.get_next(datetime)
         except Exception as e:
             self.logger.error(f"Invalid cron expression for job {job_config.id}: {e}")
             return None
     
+    def get_jitter_offset(self, job_config: JobConfig) -> float:
+        """
+        Get the fixed delay, within the job's jitter window, added to each of its fire times.
+        
+        The offset comes from a hash of the job id, so it is stable across
+        restarts and jobs sharing a cron minute are spread evenly over it.
+        """
+        window = job_config.jitter if job_config.jitter is not None else self.jitter_window
+        if not window or window <= 0:
+            return 0.0
+        digest = hashlib.sha1(job_config.id.encode()).digest()
+        return window * int.from_bytes(digest[:4], 'big') / 2**32
+    
+    def _schedule_job(self, job_config: JobConfig, base: Optional[datetime] = None):
+        """Queue the next fire time of an enabled job, or drop it from the queue"""
+        next_run = None
+        if job_config.enabled:
+            offset = timedelta(seconds=self.get_jitter_offset(job_config))
+            next_run = self.get_next_run_time(job_config, (base or datetime.now()) - offset)
+            if next_run is not None:
+                next_run += offset
+        if next_run is None:
+            self.timers.remove(job_config.id)
+        else:
+            self.timers.schedule(job_config.id, next_run.timestamp())
+    
+    def _count_missed_runs(self, job_config: JobConfig, after: datetime, until: datetime,
+                           cap: int) -> int:
+        """Count the job's fire times in (after, until], stopping once past cap"""
+        missed = 0
+        while missed <= cap:
+            after = self.get_next_run_time(job_config, after)
+            if after is None or after > until:
+                break
+            missed += 1
+        return missed
+    
+    def _is_misfire(self, job_config: JobConfig, fire_time: float, now: float) -> bool:
+        """True if a fire handled at now is late enough to count as misfired"""
+        lateness = now - fire_time
+        if self.misfire_grace is not None:
+            return lateness > self.misfire_grace
+        if lateness <= self.MISFIRE_GRACE:
+            return False
+        next_run = self.get_next_run_time(job_config, datetime.fromtimestamp(fire_time))
+        if next_run is None:
+            return False
+        interval = next_run.timestamp() - fire_time
+        return lateness > interval * self.MISFIRE_GRACE_FRACTION
+    
+    def _rebuild_schedule(self, catch_up_missed: bool = True):
+        """
+        Load all jobs from the registry, rebuild the timer queue and catch up missed runs
+        
+        With catch_up_missed=False (a refresh after the registry changed
+        under a running loop) unchanged jobs keep their fire times and no
+        missed runs are replayed.
+        """
+        previous = self.registry.jobs
+        fire_times = {} if catch_up_missed else {
+            job_id: self.timers.next_fire_time(job_id) for job_id in previous
+        }
+        self.timers.clear()
+        if catch_up_missed:
+            self._pending_runs.clear()
+            last_runs = self.registry.get_last_run_times()
+        now = datetime.now()
+        
+        catch_up = []
+        for job in self.registry.get_all_jobs():
+            kept = fire_times.get(job.id)
+            if kept is not None and job.enabled and previous.get(job.id) == job:
+                self.timers.schedule(job.id, kept)
+            else:
+                self._schedule_job(job)
+            if (catch_up_missed and job.enabled and job.misfire_policy != "skip"
+                    and job.id in last_runs):
+                offset = timedelta(seconds=self.get_jitter_offset(job))
+                missed = self._count_missed_runs(job, last_runs[job.id] - offset, now - offset,
+                                                 job.max_catchup)
+                if missed:
+                    catch_up.append((job, missed))
+        self.logger.info(f"Scheduled {len(self.timers)} jobs")
+        
+        for job, missed in catch_up:
+            self.logger.info(f"Job {job.id} missed {missed} run(s) while stopped, "
+                             f"catching up ({job.misfire_policy})")
+            self._trigger(job, missed - 1)
+    
+    def _trigger(self, job: JobConfig, missed: int = 0):
+        """
+        Start a run of a due job, applying its misfire policy to any further
+        runs missed since it last fired or lost because it is still running.
+        """
+        if job.misfire_policy == "run_all":
+            extra = missed + 1 if self.dispatcher.is_active(job.id) else missed
+            pending = min(self._pending_runs.get(job.id, 0) + extra, job.max_catchup)
+            if pending > 0:
+                self._pending_runs[job.id] = pending
+        elif job.misfire_policy == "run_once" and self.dispatcher.is_active(job.id):
+            self._pending_runs[job.id] = 1
+        
+        if not self.dispatcher.is_active(job.id):
+            self._start_run(job)
+        elif job.id in self._pending_runs:
+            self.logger.info(f"Job {job.id} is still running, "
+                             f"{self._pending_runs[job.id]} run(s) pending")
+        else:
+            self.dispatcher.stats[job.priority]['overlapped'] += 1
+            self.logger.warning(f"Job {job.id} is still running, skipping this run")
+    
+    def _wake(self):
+        """Wake the scheduler loop so it re-reads the timer queue"""
+        if self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass  # loop already closed
+    
     async def run_job_now(self, job_id: str) -> JobResult:
         """Execute a job immediately"""
         job = self.registry.get_job(job_id)
@@ -477,61 +1534,149 @@ class LNMTScheduler:
         if not self.dependency_manager.can_execute_job(job):
             raise RuntimeError(f"Job {job_id} dependencies not satisfied")
         
-        result = await self.executor.execute_job(job, self.registry)
+        if not self.dispatcher.acquire(job_id):
+            raise RuntimeError(f"Job {job_id} is already running")
+        try:
+            result = await self.executor.execute_job(job, self.registry)
+        finally:
+            self.dispatcher.release(job_id)
         self.dependency_manager.mark_job_completed(job_id, result.status == JobStatus.COMPLETED)
         
         return result
     
+    def _job_finished(self, job: JobConfig, result: JobResult):
+        """Record the outcome of a dispatched job and start any dependents it unblocked"""
+        success = result.status == JobStatus.COMPLETED
+        self.dependency_manager.mark_job_completed(job.id, success)
+        self.logger.info(f"Job {job.id} completed with status: {result.status.value}")
+        
+        run = self._active_runs.pop(job.id, None)
+        if run:
+            run.finish(job.id, success)
+            self._advance_run(run)
+        
+        # Replay runs the misfire policy held back while this one was running
+        pending = self._pending_runs.pop(job.id, 0)
+        if pending and self.running:
+            if pending > 1:
+                self._pending_runs[job.id] = pending - 1
+            self._start_run(job)
+    
+    def _start_run(self, job: JobConfig) -> DagRun:
+        """Start a DAG run of job and its triggered dependents"""
+        run = self.dependency_manager.plan_run(job, self.registry.jobs)
+        if len(run.jobs) > 1:
+            self.logger.info(f"Starting run {run.run_id}: {' -> '.join(run.order)}")
+        self._advance_run(run)
+        return run
+    
+    def _advance_run(self, run: DagRun):
+        """Dispatch every job in the run whose dependencies are now satisfied"""
+        for job in run.ready():
+            # Dependencies outside this run must have succeeded on their latest run
+            if not self.dependency_manager.can_execute_job(job, exclude=set(run.jobs)):
+                run.skip(job.id)
+            elif self.dispatcher.submit(job):
+                self._active_runs[job.id] = run
+            else:
+                run.skip(job.id)
+        
+        if run.done and len(run.jobs) > 1:
+            summary = run.summary()
+            self.logger.info(
+                f"Run {run.run_id} finished in {time.time() - run.started_at:.1f}s: "
+                f"{len(summary['completed'])} completed, {len(summary['failed'])} failed, "
+                f"{len(summary['skipped'])} skipped"
+            )
+    
+    def get_queue_metrics(self) -> Dict[str, Dict[str, int]]:
+        """Get live per-priority lane metrics"""
+        return self.dispatcher.metrics()
+    
     async def scheduler_loop(self):
         """Main scheduler loop"""
+        self._loop_done.clear()
+        self._loop_thread = threading.current_thread()
+        try:
+            await self._run_scheduler_loop()
+        finally:
+            self._loop_thread = None
+            self._loop_done.set()
+    
+    async def _run_scheduler_loop(self):
         self.logger.info("Scheduler started")
         
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.dispatcher.start()
+        self.registry.jobs_changed()
+        self._rebuild_schedule()
+        
         while self.running:
             try:
-                current_time = datetime.now()
+                # Pick up jobs added, edited or toggled by other processes
+                if self.registry.jobs_changed():
+                    self._rebuild_schedule(catch_up_missed=False)
+                
+                now = time.time()
                 jobs_to_run = []
                 
-                # Check which jobs are due to run
-                for job in self.registry.get_all_jobs():
-                    if not job.enabled:
+                for job_id, fire_time in self.timers.pop_due(now):
+                    job = self.registry.get_job(job_id)
+                    if not job or not job.enabled:
                         continue
                     
-                    next_run = self.get_next_run_time(job)
-                    if next_run and next_run <= current_time + timedelta(minutes=1):
-                        if self.dependency_manager.can_execute_job(job):
-                            jobs_to_run.append(job)
+                    # Always schedule the next future slot; the misfire policy
+                    # decides what happens to a late fire and the slots it passed
+                    self._schedule_job(job, datetime.fromtimestamp(max(fire_time, now)))
+                    missed = 0
+                    if self._is_misfire(job, fire_time, now):
+                        if job.misfire_policy == "skip":
+                            # The late fire still runs; only the slots it passed are dropped
+                            self.logger.warning(f"Job {job.id} misfired by "
+                                                f"{now - fire_time:.1f}s, skipping missed runs")
+                            jobs_to_run.append((job, 0))
+                            continue
+                        offset = timedelta(seconds=self.get_jitter_offset(job))
+                        missed = self._count_missed_runs(
+                            job, datetime.fromtimestamp(fire_time) - offset,
+                            datetime.fromtimestamp(now) - offset, job.max_catchup)
+                    jobs_to_run.append((job, missed))
                 
-                # Execute jobs
-                if jobs_to_run:
-                    self.logger.info(f"Running {len(jobs_to_run)} scheduled jobs")
-                    
-                    # Execute jobs in priority order
-                    jobs_to_run.sort(key=lambda x: x.priority.value, reverse=True)
-                    
-                    for job in jobs_to_run:
-                        try:
-                            result = await self.executor.execute_job(job, self.registry)
-                            self.dependency_manager.mark_job_completed(
-                                job.id, result.status == JobStatus.COMPLETED
-                            )
-                            
-                            self.logger.info(f"Job {job.id} completed with status: {result.status.value}")
-                            
-                        except Exception as e:
-                            self.logger.error(f"Failed to execute job {job.id}: {e}")
+                # Each due job starts a DAG run; jobs go to their priority lanes
+                # and dependents follow as soon as their parents finish
+                jobs_to_run.sort(key=lambda x: x[0].priority.value, reverse=True)
+                for job, missed in jobs_to_run:
+                    self._trigger(job, missed)
                 
-                # Sleep for a minute before next check
-                await asyncio.sleep(60)
+                # Sleep until the next job is due or the queue changes, waking
+                # at least every RESCAN_INTERVAL to look for external edits
+                next_fire = self.timers.peek()
+                timeout = self.RESCAN_INTERVAL
+                if next_fire is not None:
+                    timeout = min(timeout, max(0.0, next_fire - time.time()))
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
                 
             except Exception as e:
                 self.logger.error(f"Error in scheduler loop: {e}")
-                await asyncio.sleep(60)
+                await asyncio.sleep(1)
         
+        await self.dispatcher.stop()
+        self._active_runs.clear()
+        self._pending_runs.clear()
+        self.registry.flush_history()
+        self._loop = None
+        self._wakeup = None
         self.logger.info("Scheduler stopped")
     
     def start(self):
         """Start the scheduler"""
         self.running = True
+        self._loop_done.clear()
         try:
             asyncio.run(self.scheduler_loop())
         except KeyboardInterrupt:
@@ -540,9 +1685,22 @@ class LNMTScheduler:
             self.stop()
     
     def stop(self):
-        """Stop the scheduler"""
+        """
+        Stop the scheduler
+        
+        The loop stops its dispatcher first, which drops queued jobs and
+        waits for running ones, and only then are the pools shut down.
+        Called on the loop's own thread (e.g. from a signal handler) this
+        only asks the loop to stop, and start() completes the shutdown.
+        """
         self.running = False
+        self._wake()
+        if threading.current_thread() is self._loop_thread:
+            return
+        self._loop_done.wait()
         self.executor.shutdown()
+        self.dispatcher.shutdown()
+        self.registry.close()
         self.save_config()
 
 # Example job functions for LNMT modules
@@ -13,15 +13,21 @@ Features:
 - Multiple export formats (text, JSON, HTML)
 - DNS whitelist support for filtering OS updates/telemetry
 - Rolling time period analysis (24h, 14d, custom ranges)
+- Incremental hourly/daily rollups for fast long-range reports
+- Opt-in report result cache invalidated by session changes
 """
 
+import os
 import sqlite3
 import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
-from collections import defaultdict
+from typing import Dict, List, Optional, Tuple, Any, Iterable, Iterator
+from dataclasses import dataclass, asdict, fields, is_dataclass
+from collections import defaultdict, OrderedDict
+from functools import lru_cache
 import re
 
 # Configure logging
@@ -47,6 +53,33 @@ class SessionData:
     device_mac: Optional[str] = None
 
 
+class SessionRecord:
+    """Compact, slotted session record yielded by ReportEngine.iter_sessions."""
+    __slots__ = ('session_id', 'timestamp', 'src_ip', 'dst_ip', 'src_port', 'dst_port',
+                 'protocol', 'bytes_sent', 'bytes_received', 'duration',
+                 'hostname', 'vlan_id', 'device_mac')
+    
+    def __init__(self, session_id, timestamp, src_ip, dst_ip, src_port, dst_port,
+                 protocol, bytes_sent, bytes_received, duration,
+                 hostname=None, vlan_id=None, device_mac=None):
+        self.session_id = session_id
+        self.timestamp = timestamp
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.src_port = src_port
+        self.dst_port = dst_port
+        self.protocol = protocol
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.duration = duration
+        self.hostname = hostname
+        self.vlan_id = vlan_id
+        self.device_mac = device_mac
+    
+    def __repr__(self):
+        return f"SessionRecord({self.session_id!r}, {self.timestamp.isoformat()}, {self.src_ip} -> {self.dst_ip})"
+
+
 @dataclass
 class UsageStats:
     """Statistics for bandwidth and session usage."""
@@ -87,7 +120,7 @@ class VLANReport:
 class DNSClassifier:
     """Classifies network traffic based on DNS hostnames and patterns."""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 65536):
         # Application classification patterns
         self.app_patterns = {
             'YouTube': [
@@ -150,39 +183,453 @@ class DNSClassifier:
             r'.*fedoraproject\.org$',
             r'.*centos\.org$'
         ]
+        
+        self.cache_size = cache_size
+        self.compile()
+    
+    # Regex metacharacters that make a pattern more than a literal suffix
+    _REGEX_SPECIALS = set('.^$*+?{}[]()|\\')
+    _RANK = ''  # trie key holding the rank of a pattern ending at that node
+    
+    @classmethod
+    def _literal_suffix(cls, pattern: str) -> Optional[str]:
+        """Return the literal suffix for patterns of the form '.*<literal>$', else None"""
+        if not (pattern.startswith('.*') and pattern.endswith('$')):
+            return None
+        body = pattern[2:-1]
+        literal = []
+        index = 0
+        while index < len(body):
+            char = body[index]
+            if char == '\\' and index + 1 < len(body) and body[index + 1] in cls._REGEX_SPECIALS:
+                literal.append(body[index + 1])
+                index += 2
+            elif char in cls._REGEX_SPECIALS:
+                return None
+            else:
+                literal.append(char)
+                index += 1
+        return ''.join(literal)
+    
+    def compile(self):
+        """
+        Build the matcher from whitelist_patterns and app_patterns
+        
+        Every pattern gets a rank in evaluation order (whitelist first, then
+        applications in declaration order), so the lowest matching rank
+        reproduces the original first-match loop. Literal suffix patterns go
+        into a trie keyed on the reversed hostname; anything else is kept as
+        a precompiled regex. Call again after editing the pattern lists.
+        """
+        self._trie: Dict[str, Any] = {}
+        self._regexes: List[Tuple[int, Any]] = []
+        self._results: List[Optional[str]] = []
+        
+        rules = [(pattern, None) for pattern in self.whitelist_patterns]
+        for app_name, patterns in self.app_patterns.items():
+            rules.extend((pattern, app_name) for pattern in patterns)
+        
+        for rank, (pattern, result) in enumerate(rules):
+            self._results.append(result)
+            suffix = self._literal_suffix(pattern)
+            if suffix is None:
+                self._regexes.append((rank, re.compile(pattern)))
+                continue
+            
+            node = self._trie
+            for char in reversed(suffix):
+                node = node.setdefault(char, {})
+            # Keep the earliest rank if two patterns share a suffix
+            node[self._RANK] = min(node.get(self._RANK, rank), rank)
+        
+        self._classify_cached = lru_cache(maxsize=self.cache_size)(self._classify_uncached)
+    
+    def _classify_uncached(self, hostname: str) -> Optional[str]:
+        best = len(self._results)
+        
+        # A node reached after consuming k reversed characters matches every
+        # hostname ending in that k-character suffix
+        node = self._trie
+        if self._RANK in node:
+            best = node[self._RANK]
+        for char in reversed(hostname):
+            node = node.get(char)
+            if node is None:
+                break
+            rank = node.get(self._RANK)
+            if rank is not None and rank < best:
+                best = rank
+        
+        for rank, regex in self._regexes:
+            if rank >= best:
+                break
+            if regex.match(hostname):
+                best = rank
+                break
+        
+        if best == len(self._results):
+            return 'Other'
+        return self._results[best]
     
     def classify_hostname(self, hostname: str) -> Optional[str]:
         """Classify a hostname into an application category."""
         if not hostname:
             return 'Unknown'
-            
-        hostname = hostname.lower().strip()
-        
-        # Check whitelist first (return None to exclude)
-        for pattern in self.whitelist_patterns:
-            if re.match(pattern, hostname):
-                return None
         
-        # Check application patterns
-        for app_name, patterns in self.app_patterns.items():
-            for pattern in patterns:
-                if re.match(pattern, hostname):
-                    return app_name
-        
-        return 'Other'
+        return self._classify_cached(hostname.lower().strip())
+    
+    def classify_batch(self, hostnames: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """Classify many hostnames, in order; repeated names hit the cache."""
+        classify = self.classify_hostname
+        return [classify(hostname) for hostname in hostnames]
     
     def is_whitelisted(self, hostname: str) -> bool:
         """Check if hostname should be excluded from reports."""
         return self.classify_hostname(hostname) is None
 
 
+class UsageAggregator:
+    """
+    Accumulates overall, per-device, per-VLAN and per-application usage
+    from a single pass over session rows.
+    
+    Overall and application totals exclude whitelisted traffic; device and
+    VLAN bandwidth/session totals include it, matching the SQL aggregates
+    the per-entity reports were originally built from.
+    """
+    
+    def __init__(self):
+        # Overall usage
+        self.total_bytes = 0
+        self.total_sessions = 0
+        self.total_duration = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.app_usage: Dict[str, int] = defaultdict(int)
+        self.hourly_usage: Dict[int, int] = defaultdict(int)
+        
+        # mac -> [name, vlan_id, bandwidth, sessions, first_ts, last_ts, {app: bytes}]
+        self.devices: Dict[str, list] = {}
+        # vlan key (None for unknown) -> [name, bandwidth, sessions, {mac: bytes}, {app: bytes}]
+        self.vlans: Dict[Optional[int], list] = {}
+    
+    def add_usage(self, hour: Optional[int], bytes_sent: int, bytes_received: int,
+                  duration: float, app_name: Optional[str], sessions: int = 1):
+        """
+        Fold non-whitelisted traffic into the overall statistics.
+        
+        A rollup row passes its session count; hour may be None when the
+        row spans a whole day, in which case add_hourly supplies the
+        hour-of-day totals separately.
+        """
+        session_bytes = bytes_sent + bytes_received
+        self.total_bytes += session_bytes
+        self.total_sessions += sessions
+        self.total_duration += duration
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        if app_name:
+            self.app_usage[app_name] += session_bytes
+        if hour is not None:
+            self.hourly_usage[hour] += session_bytes
+    
+    def add_hourly(self, hour: int, usage_bytes: int):
+        """Add non-whitelisted bytes to one hour of the day."""
+        self.hourly_usage[hour] += usage_bytes
+    
+    def add_device(self, mac: str, name: Optional[str], vlan_id: Optional[int],
+                   timestamp: str, session_bytes: int, app_name: Optional[str],
+                   sessions: int = 1, last_seen: Optional[str] = None):
+        """Fold one session, or a rollup row spanning timestamp..last_seen, into a device report."""
+        last_seen = last_seen or timestamp
+        entry = self.devices.get(mac)
+        if entry is None:
+            entry = self.devices[mac] = [name, vlan_id, 0, 0, timestamp, last_seen, defaultdict(int)]
+        entry[2] += session_bytes
+        entry[3] += sessions
+        if timestamp < entry[4]:
+            entry[4] = timestamp
+        if last_seen > entry[5]:
+            entry[5] = last_seen
+        if app_name:
+            entry[6][app_name] += session_bytes
+    
+    def add_vlan(self, vlan_id: Optional[int], name: Optional[str], mac: Optional[str],
+                 session_bytes: int, app_name: Optional[str], sessions: int = 1):
+        """Fold one session or rollup row into its source device's VLAN report."""
+        entry = self.vlans.get(vlan_id)
+        if entry is None:
+            entry = self.vlans[vlan_id] = [name, 0, 0, defaultdict(int), defaultdict(int)]
+        entry[1] += session_bytes
+        entry[2] += sessions
+        if mac:
+            entry[3][mac] += session_bytes
+        if app_name:
+            entry[4][app_name] += session_bytes
+    
+    @staticmethod
+    def _top(usage: Dict, count: int) -> Dict:
+        return dict(sorted(usage.items(), key=lambda x: x[1], reverse=True)[:count])
+    
+    def usage_stats(self) -> UsageStats:
+        """Overall statistics, as calculate_usage_stats reports them."""
+        if not self.total_sessions:
+            return UsageStats(0, 0, 0.0, {}, 0, 0, 0)
+        
+        peak_hour = max(self.hourly_usage.items(), key=lambda x: x[1])[0] if self.hourly_usage else 0
+        return UsageStats(
+            total_bytes=self.total_bytes,
+            total_sessions=self.total_sessions,
+            avg_session_duration=self.total_duration / self.total_sessions,
+            top_applications=self._top(self.app_usage, 10),
+            peak_usage_hour=peak_hour,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received
+        )
+    
+    def device_reports(self) -> List[DeviceReport]:
+        """Per-device reports, highest bandwidth first."""
+        reports = [
+            DeviceReport(
+                device_mac=mac,
+                device_name=name,
+                vlan_id=vlan_id or 0,
+                total_bandwidth=bandwidth,
+                session_count=sessions,
+                top_apps=self._top(apps, 5),
+                first_seen=datetime.fromisoformat(first_seen),
+                last_seen=datetime.fromisoformat(last_seen)
+            )
+            for mac, (name, vlan_id, bandwidth, sessions, first_seen, last_seen, apps)
+            in self.devices.items()
+        ]
+        reports.sort(key=lambda r: r.total_bandwidth, reverse=True)
+        return reports
+    
+    def vlan_reports(self) -> List[VLANReport]:
+        """Per-VLAN reports, highest bandwidth first."""
+        reports = [
+            VLANReport(
+                vlan_id=vlan_id or 0,
+                vlan_name=name,
+                total_bandwidth=bandwidth,
+                device_count=len(device_usage),
+                session_count=sessions,
+                top_devices=sorted(device_usage.items(), key=lambda x: x[1], reverse=True)[:5],
+                top_applications=self._top(apps, 10)
+            )
+            for vlan_id, (name, bandwidth, sessions, device_usage, apps)
+            in self.vlans.items()
+        ]
+        reports.sort(key=lambda r: r.total_bandwidth, reverse=True)
+        return reports
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt: datetime) -> datetime:
+    floor = _floor_hour(dt)
+    return floor if floor == dt else floor + timedelta(hours=1)
+
+
+def _ceil_minute(dt: datetime) -> datetime:
+    floor = dt.replace(second=0, microsecond=0)
+    return floor if floor == dt else floor + timedelta(minutes=1)
+
+
+def _floor_day(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil_day(dt: datetime) -> datetime:
+    floor = _floor_day(dt)
+    return floor if floor == dt else floor + timedelta(days=1)
+
+
+# One hostname per IP (its latest DNS record), so joining it never fans a
+# session out into one row per record
+_LATEST_DNS_RECORDS = """
+(SELECT ip_address, hostname, MAX(rowid) FROM dns_records GROUP BY ip_address)
+""".strip()
+
+
+# Report types that cached entries are rebuilt into
+_CACHED_DATACLASSES = {cls.__name__: cls for cls in (UsageStats, DeviceReport, VLANReport)}
+
+
+def _to_json(value: Any) -> Any:
+    """Tag the types plain JSON would lose so _from_json can restore them."""
+    if is_dataclass(value):
+        return {'__dataclass__': type(value).__name__,
+                'fields': {f.name: _to_json(getattr(value, f.name)) for f in fields(value)}}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_to_json(item) for item in value]}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _to_json(item) for key, item in value.items()}
+        return {'__items__': [[_to_json(key), _to_json(item)] for key, item in value.items()]}
+    return value
+
+
+def _from_json(value: Dict[str, Any]) -> Any:
+    """json.loads object hook reversing _to_json."""
+    if '__dataclass__' in value:
+        return _CACHED_DATACLASSES[value['__dataclass__']](**value['fields'])
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__tuple__' in value:
+        return tuple(value['__tuple__'])
+    if '__items__' in value:
+        return {(tuple(key) if isinstance(key, list) else key): item for key, item in value['__items__']}
+    return value
+
+
+class ReportCache:
+    """
+    LRU/TTL cache of generated reports, optionally backed by a SQLite file.
+    
+    Each entry records the sessions version it was computed at (a counter
+    bumped by triggers on every insert, update and delete) and is only
+    served while that version is unchanged, so a report is never returned
+    once session data has changed. The TTL bounds how long edits to devices
+    or DNS records can go unnoticed.
+    
+    Entries are stored as JSON, so every hit returns an independent copy
+    and a cache file shared between processes (e.g. repeated reportctl
+    runs) never holds anything but data.
+    
+    Example:
+        cache = ReportCache(max_entries=64, ttl=300)
+        with ReportEngine("network.db", cache=cache) as engine:
+            engine.generate_comprehensive_report(24)  # computed
+            engine.generate_comprehensive_report(24)  # served from cache
+    """
+    
+    def __init__(self, max_entries: int = 128, ttl: Optional[float] = 300.0,
+                 path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[int, float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        if path:
+            self._init_store()
+    
+    def _init_store(self):
+        """Create the on-disk cache table."""
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    watermark INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+    
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a cache key from report type, window and filters."""
+        return json.dumps(parts, default=str)
+    
+    def _is_fresh(self, entry_watermark: int, created: float, watermark: int) -> bool:
+        if entry_watermark != watermark:
+            return False
+        return self.ttl is None or time.time() - created < self.ttl
+    
+    def get(self, key: str, watermark: int) -> Optional[Any]:
+        """Return a copy of the cached value if it is still valid at this watermark."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry[0], entry[1], watermark):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[2], object_hook=_from_json)
+                del self._entries[key]
+            
+            if self.path:
+                with sqlite3.connect(self.path) as conn:
+                    row = conn.execute(
+                        "SELECT watermark, created, payload FROM report_cache WHERE cache_key = ?",
+                        (key,)
+                    ).fetchone()
+                if row and self._is_fresh(row[0], row[1], watermark):
+                    try:
+                        value = json.loads(row[2], object_hook=_from_json)
+                    except (TypeError, ValueError, KeyError):
+                        value = None  # written by an older version, or not ours
+                    if value is not None:
+                        self._store(key, (row[0], row[1], row[2]))
+                        self.hits += 1
+                        return value
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key: str, watermark: int, value: Any):
+        """Cache a value computed at the given watermark."""
+        entry = (watermark, time.time(), json.dumps(_to_json(value)))
+        
+        with self._lock:
+            self._store(key, entry)
+            
+            if self.path:
+                with sqlite3.connect(self.path) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO report_cache VALUES (?, ?, ?, ?)",
+                        (key,) + entry
+                    )
+                    if self.ttl is not None:
+                        conn.execute("DELETE FROM report_cache WHERE created < ?",
+                                     (entry[1] - self.ttl,))
+                    conn.execute("""
+                        DELETE FROM report_cache WHERE cache_key NOT IN (
+                            SELECT cache_key FROM report_cache ORDER BY created DESC LIMIT ?
+                        )
+                    """, (self.max_entries,))
+    
+    def _store(self, key: str, entry: Tuple[int, float, str]):
+        """Insert into the in-memory LRU, evicting the oldest entries."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop all cached reports."""
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                with sqlite3.connect(self.path) as conn:
+                    conn.execute("DELETE FROM report_cache")
+
+
 class ReportEngine:
     """Main reporting engine for network usage analysis."""
     
-    def __init__(self, db_path: str):
-        """Initialize the report engine with database connection."""
+    # Rows pulled from SQLite per fetchmany() call when streaming sessions
+    FETCH_BATCH_SIZE = 1000
+    
+    # Rollup granularity -> table, and the timestamp prefix length naming a bucket
+    ROLLUP_TABLES = {'hour': 'usage_rollup_hourly', 'day': 'usage_rollup_daily'}
+    ROLLUP_BUCKETS = {'hour': 13, 'day': 10}
+    ROLLUP_CHUNK_SIZE = 50000
+    
+    def __init__(self, db_path: str, cache: Optional[ReportCache] = None):
+        """Initialize the report engine; pass a ReportCache to reuse generated reports."""
         self.db_path = db_path
         self.classifier = DNSClassifier()
+        self.cache = cache
         self.conn = None
     
     def connect(self):
@@ -226,12 +673,38 @@ class ReportEngine:
             logger.error(f"Query execution failed: {e}")
             raise
     
-    def get_session_data(self, 
-                        start_time: datetime, 
-                        end_time: datetime,
-                        vlan_id: Optional[int] = None,
-                        device_mac: Optional[str] = None) -> List[SessionData]:
-        """Query session data from the database."""
+    def _iter_query(self, query: str, params: Optional[Tuple] = None,
+                    batch_size: Optional[int] = None) -> Iterator[tuple]:
+        """Execute a query and yield plain row tuples in fetchmany batches."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
+        
+        batch_size = batch_size or self.FETCH_BATCH_SIZE
+        # A private cursor without the Row factory keeps per-row overhead low
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except sqlite3.Error as e:
+            logger.error(f"Query execution failed: {e}")
+            raise
+        finally:
+            # An abandoned generator may be finalized after disconnect()
+            if self.conn is not None:
+                cursor.close()
+    
+    def _iter_session_rows(self,
+                           start_time: datetime,
+                           end_time: datetime,
+                           vlan_id: Optional[int] = None,
+                           device_mac: Optional[str] = None,
+                           batch_size: Optional[int] = None) -> Iterator[tuple]:
+        """Yield non-whitelisted session rows in SessionData field order."""
         
         base_query = """
         SELECT 
@@ -247,7 +720,7 @@ class ReportEngine:
             s.duration,
             d.hostname,
             d.vlan_id,
-            d.mac_address as device_mac
+            dev.mac_address as device_mac
         FROM sessions s
         LEFT JOIN dns_records d ON s.dst_ip = d.ip_address
         LEFT JOIN devices dev ON s.src_ip = dev.ip_address
@@ -266,210 +739,475 @@ class ReportEngine:
         
         base_query += " ORDER BY s.timestamp DESC"
         
-        rows = self._execute_query(base_query, tuple(params))
+        is_whitelisted = self.classifier.is_whitelisted
+        fromisoformat = datetime.fromisoformat
         
-        sessions = []
-        for row in rows:
+        for (session_id, timestamp, src_ip, dst_ip, src_port, dst_port, protocol,
+             sent, received, duration, hostname, dns_vlan, mac) in self._iter_query(
+                base_query, tuple(params), batch_size):
             # Skip whitelisted hostnames
-            if row['hostname'] and self.classifier.is_whitelisted(row['hostname']):
+            if hostname and is_whitelisted(hostname):
                 continue
-                
-            session = SessionData(
-                session_id=row['session_id'],
-                timestamp=datetime.fromisoformat(row['timestamp']),
-                src_ip=row['src_ip'],
-                dst_ip=row['dst_ip'],
-                src_port=row['src_port'],
-                dst_port=row['dst_port'],
-                protocol=row['protocol'],
-                bytes_sent=row['bytes_sent'] or 0,
-                bytes_received=row['bytes_received'] or 0,
-                duration=row['duration'] or 0.0,
-                hostname=row['hostname'],
-                vlan_id=row['vlan_id'],
-                device_mac=row['device_mac']
-            )
-            sessions.append(session)
-        
-        return sessions
+            
+            yield (session_id, fromisoformat(timestamp), src_ip, dst_ip, src_port, dst_port,
+                   protocol, sent or 0, received or 0, duration or 0.0, hostname, dns_vlan, mac)
     
-    def calculate_usage_stats(self, sessions: List[SessionData]) -> UsageStats:
-        """Calculate usage statistics from session data."""
-        if not sessions:
-            return UsageStats(0, 0, 0.0, {}, 0, 0, 0)
+    def iter_sessions(self,
+                      start_time: datetime,
+                      end_time: datetime,
+                      vlan_id: Optional[int] = None,
+                      device_mac: Optional[str] = None,
+                      batch_size: Optional[int] = None) -> Iterator[SessionRecord]:
+        """
+        Stream session data from the database.
         
-        total_bytes = 0
-        total_sessions = len(sessions)
-        total_duration = 0.0
-        bytes_sent = 0
-        bytes_received = 0
-        app_usage = defaultdict(int)
-        hourly_usage = defaultdict(int)
+        Rows are fetched in batches of batch_size (FETCH_BATCH_SIZE by
+        default) and yielded as SessionRecord objects, so memory use does
+        not grow with the length of the reporting window.
+        """
+        for row in self._iter_session_rows(start_time, end_time, vlan_id, device_mac, batch_size):
+            yield SessionRecord(*row)
+    
+    def get_session_data(self, 
+                        start_time: datetime, 
+                        end_time: datetime,
+                        vlan_id: Optional[int] = None,
+                        device_mac: Optional[str] = None) -> List[SessionData]:
+        """Query session data from the database."""
+        return [SessionData(*row) for row in
+                self._iter_session_rows(start_time, end_time, vlan_id, device_mac)]
+    
+    def calculate_usage_stats(self, sessions: Iterable[SessionData]) -> UsageStats:
+        """Calculate usage statistics from any iterable of sessions."""
+        usage = UsageAggregator()
+        classify = self.classifier.classify_hostname
         
         for session in sessions:
-            session_bytes = session.bytes_sent + session.bytes_received
-            total_bytes += session_bytes
-            bytes_sent += session.bytes_sent
-            bytes_received += session.bytes_received
-            total_duration += session.duration
-            
-            # Classify application
-            app_name = self.classifier.classify_hostname(session.hostname)
-            if app_name:
-                app_usage[app_name] += session_bytes
-            
-            # Track hourly usage
-            hour = session.timestamp.hour
-            hourly_usage[hour] += session_bytes
+            usage.add_usage(session.timestamp.hour, session.bytes_sent, session.bytes_received,
+                            session.duration, classify(session.hostname))
         
-        avg_duration = total_duration / total_sessions if total_sessions > 0 else 0.0
-        peak_hour = max(hourly_usage.items(), key=lambda x: x[1])[0] if hourly_usage else 0
+        return usage.usage_stats()
+    
+    def aggregate_sessions(self,
+                           start_time: datetime,
+                           end_time: datetime,
+                           split_time: Optional[datetime] = None
+                           ) -> Tuple[UsageAggregator, Optional[UsageAggregator]]:
+        """
+        Build device, VLAN, application and overall aggregates for a window.
         
-        # Sort applications by usage
-        top_apps = dict(sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:10])
+        If split_time is given, the window is divided there: usage before
+        it goes into a second aggregator that only tracks overall usage,
+        which generate_comprehensive_report uses for the previous period.
+        Each part is answered from the rollup tables where possible (see
+        update_rollups) and from raw session rows otherwise.
+        """
+        current = UsageAggregator()
+        previous = None
+        watermark = self._rollup_watermark()
         
-        return UsageStats(
-            total_bytes=total_bytes,
-            total_sessions=total_sessions,
-            avg_session_duration=avg_duration,
-            top_applications=top_apps,
-            peak_usage_hour=peak_hour,
-            bytes_sent=bytes_sent,
-            bytes_received=bytes_received
-        )
+        if split_time is not None:
+            previous = UsageAggregator()
+            self._aggregate_window(previous, start_time, split_time, watermark,
+                                   include_end=False, overall_only=True)
+            start_time = split_time
+        self._aggregate_window(current, start_time, end_time, watermark)
+        
+        return current, previous
     
-    def generate_device_reports(self, 
-                              start_time: datetime, 
-                              end_time: datetime) -> List[DeviceReport]:
-        """Generate per-device usage reports."""
+    def _aggregate_window(self,
+                          usage: UsageAggregator,
+                          start_time: datetime,
+                          end_time: datetime,
+                          watermark: Optional[int],
+                          include_end: bool = True,
+                          overall_only: bool = False):
+        """
+        Fold one time window into an aggregator.
         
+        Whole days and hours inside the window are read from the rollup
+        tables. Raw sessions are only scanned for the partial hours at
+        either edge, plus any sessions added since the last rollup update.
+        """
         query = """
         SELECT 
-            d.mac_address,
-            d.device_name,
-            d.vlan_id,
-            MIN(s.timestamp) as first_seen,
-            MAX(s.timestamp) as last_seen,
-            COUNT(s.session_id) as session_count,
-            SUM(s.bytes_sent + s.bytes_received) as total_bandwidth
-        FROM devices d
-        LEFT JOIN sessions s ON d.ip_address = s.src_ip
-        WHERE s.timestamp BETWEEN ? AND ?
-        GROUP BY d.mac_address, d.device_name, d.vlan_id
-        ORDER BY total_bandwidth DESC
-        """
-        
-        rows = self._execute_query(query, (start_time.isoformat(), end_time.isoformat()))
+            s.timestamp,
+            s.bytes_sent,
+            s.bytes_received,
+            s.duration,
+            d.hostname,
+            dev.mac_address,
+            dev.device_name,
+            dev.vlan_id,
+            v.vlan_name
+        FROM sessions s
+        LEFT JOIN {dns_records} d ON s.dst_ip = d.ip_address
+        LEFT JOIN devices dev ON s.src_ip = dev.ip_address
+        LEFT JOIN vlans v ON dev.vlan_id = v.vlan_id
+        WHERE s.timestamp >= ? AND s.timestamp {end_op} ?
+        """.format(dns_records=_LATEST_DNS_RECORDS, end_op='<=' if include_end else '<')
+        params = [start_time.isoformat(), end_time.isoformat()]
         
-        reports = []
-        for row in rows:
-            # Get detailed session data for this device
-            device_sessions = self.get_session_data(
-                start_time, end_time, device_mac=row['mac_address']
-            )
+        hour_start = _ceil_hour(start_time)
+        hour_end = _floor_hour(end_time)
+        if watermark is not None and hour_start < hour_end:
+            day_start = _ceil_day(hour_start)
+            day_end = _floor_day(hour_end)
+            if day_start < day_end:
+                self._add_rollups(usage, 'day', day_start, day_end, overall_only)
+                self._add_hour_totals(usage, day_start, day_end)
+                self._add_rollups(usage, 'hour', hour_start, day_start, overall_only)
+                self._add_rollups(usage, 'hour', day_end, hour_end, overall_only)
+            else:
+                self._add_rollups(usage, 'hour', hour_start, hour_end, overall_only)
             
-            # Calculate top applications for this device
-            app_usage = defaultdict(int)
-            for session in device_sessions:
-                app_name = self.classifier.classify_hostname(session.hostname)
-                if app_name:
-                    app_usage[app_name] += session.bytes_sent + session.bytes_received
+            query += " AND (s.timestamp < ? OR s.timestamp >= ? OR s.rowid > ?)"
+            params += [hour_start.isoformat(), hour_end.isoformat(), watermark]
+        
+        classify = self.classifier.classify_hostname
+        
+        for (timestamp, sent, received, duration, hostname,
+             mac, device_name, vlan_id, vlan_name) in self._iter_query(query, tuple(params)):
+            sent = sent or 0
+            received = received or 0
+            app_name = classify(hostname)
             
-            top_apps = dict(sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:5])
+            if not (hostname and app_name is None):
+                usage.add_usage(int(timestamp[11:13]), sent, received,
+                                duration or 0.0, app_name)
+            if overall_only:
+                continue
             
-            report = DeviceReport(
-                device_mac=row['mac_address'],
-                device_name=row['device_name'],
-                vlan_id=row['vlan_id'] or 0,
-                total_bandwidth=row['total_bandwidth'] or 0,
-                session_count=row['session_count'] or 0,
-                top_apps=top_apps,
-                first_seen=datetime.fromisoformat(row['first_seen']) if row['first_seen'] else start_time,
-                last_seen=datetime.fromisoformat(row['last_seen']) if row['last_seen'] else end_time
-            )
-            reports.append(report)
-        
-        return reports
+            session_bytes = sent + received
+            if mac is not None:
+                usage.add_device(mac, device_name, vlan_id, timestamp, session_bytes, app_name)
+            usage.add_vlan(vlan_id, vlan_name if vlan_id is not None else None,
+                           mac, session_bytes, app_name)
     
-    def generate_vlan_reports(self, 
-                            start_time: datetime, 
-                            end_time: datetime) -> List[VLANReport]:
-        """Generate per-VLAN usage reports."""
+    def _add_rollups(self, usage: UsageAggregator, granularity: str,
+                     start: datetime, end: datetime, overall_only: bool):
+        """Fold rollup rows for buckets in [start, end) into an aggregator."""
+        if start >= end:
+            return
         
-        query = """
+        width = self.ROLLUP_BUCKETS[granularity]
+        query = f"""
         SELECT 
-            COALESCE(d.vlan_id, 0) as vlan_id,
+            r.bucket,
+            r.device_mac,
+            dev.device_name,
+            r.vlan_id,
             v.vlan_name,
-            COUNT(DISTINCT d.mac_address) as device_count,
-            COUNT(s.session_id) as session_count,
-            SUM(s.bytes_sent + s.bytes_received) as total_bandwidth
-        FROM sessions s
-        LEFT JOIN devices d ON s.src_ip = d.ip_address
-        LEFT JOIN vlans v ON d.vlan_id = v.vlan_id
-        WHERE s.timestamp BETWEEN ? AND ?
-        GROUP BY d.vlan_id, v.vlan_name
-        ORDER BY total_bandwidth DESC
+            r.app_class,
+            r.bytes_sent,
+            r.bytes_received,
+            r.session_count,
+            r.duration,
+            r.first_seen,
+            r.last_seen
+        FROM {self.ROLLUP_TABLES[granularity]} r
+        LEFT JOIN devices dev ON r.device_mac = dev.mac_address
+        LEFT JOIN vlans v ON r.vlan_id = v.vlan_id
+        WHERE r.bucket >= ? AND r.bucket < ?
         """
+        params = (start.isoformat()[:width], end.isoformat()[:width])
         
-        rows = self._execute_query(query, (start_time.isoformat(), end_time.isoformat()))
+        for (bucket, mac, device_name, vlan_id, vlan_name, app_class, sent, received,
+             sessions, duration, first_seen, last_seen) in self._iter_query(query, params):
+            # Sentinels used to keep the rollup key NOT NULL
+            app_name = app_class or None
+            mac = mac or None
+            vlan_id = None if vlan_id == -1 else vlan_id
+            
+            if app_class:
+                hour = int(bucket[11:13]) if granularity == 'hour' else None
+                usage.add_usage(hour, sent, received, duration, app_name, sessions)
+            if overall_only:
+                continue
+            
+            session_bytes = sent + received
+            if mac is not None:
+                usage.add_device(mac, device_name, vlan_id, first_seen, session_bytes,
+                                 app_name, sessions, last_seen)
+            usage.add_vlan(vlan_id, vlan_name if vlan_id is not None else None,
+                           mac, session_bytes, app_name, sessions)
+    
+    def _add_hour_totals(self, usage: UsageAggregator, start: datetime, end: datetime):
+        """Fold per-hour usage totals for [start, end) into the aggregator's peak-hour data."""
+        query = """
+        SELECT bucket, bytes FROM usage_rollup_hour_totals
+        WHERE bucket >= ? AND bucket < ?
+        """
+        for bucket, usage_bytes in self._iter_query(query, (start.isoformat()[:13],
+                                                             end.isoformat()[:13])):
+            usage.add_hourly(int(bucket[11:13]), usage_bytes)
+    
+    def _rollup_watermark(self) -> Optional[int]:
+        """Highest sessions rowid folded into the rollups, or None if rollups are not set up."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
         
-        reports = []
-        for row in rows:
-            vlan_id = row['vlan_id']
+        try:
+            row = self.conn.execute(
+                "SELECT value FROM usage_rollup_state WHERE name = 'sessions_rowid'"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+    
+    def _init_rollups(self):
+        """Create the rollup tables if they don't exist."""
+        with self.conn:
+            for table in self.ROLLUP_TABLES.values():
+                self.conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        bucket TEXT NOT NULL,
+                        device_mac TEXT NOT NULL,
+                        vlan_id INTEGER NOT NULL,
+                        app_class TEXT NOT NULL,
+                        bytes_sent INTEGER NOT NULL DEFAULT 0,
+                        bytes_received INTEGER NOT NULL DEFAULT 0,
+                        session_count INTEGER NOT NULL DEFAULT 0,
+                        duration REAL NOT NULL DEFAULT 0.0,
+                        first_seen TEXT,
+                        last_seen TEXT,
+                        PRIMARY KEY (bucket, device_mac, vlan_id, app_class)
+                    )
+                """)
             
-            # Get top devices for this VLAN
-            device_query = """
-            SELECT d.mac_address, SUM(s.bytes_sent + s.bytes_received) as bandwidth
-            FROM devices d
-            JOIN sessions s ON d.ip_address = s.src_ip
-            WHERE d.vlan_id = ? AND s.timestamp BETWEEN ? AND ?
-            GROUP BY d.mac_address
-            ORDER BY bandwidth DESC
-            LIMIT 5
-            """
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS usage_rollup_hour_totals (
+                    bucket TEXT PRIMARY KEY,
+                    bytes INTEGER NOT NULL DEFAULT 0
+                )
+            """)
             
-            device_rows = self._execute_query(
-                device_query, 
-                (vlan_id, start_time.isoformat(), end_time.isoformat())
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS usage_rollup_state (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute(
+                "INSERT OR IGNORE INTO usage_rollup_state (name, value) VALUES ('sessions_rowid', 0)"
             )
-            top_devices = [(r['mac_address'], r['bandwidth']) for r in device_rows]
+    
+    def update_rollups(self, chunk_size: Optional[int] = None) -> int:
+        """
+        Fold sessions added since the last update into the rollup tables.
+        
+        Rollups are keyed by (bucket, device_mac, vlan_id, app_class) at
+        hourly and daily granularity. Progress is tracked by the sessions
+        rowid, so late-arriving rows land in the right bucket. Each chunk is
+        committed together with the watermark. Returns the number of
+        sessions folded.
+        """
+        self._init_rollups()
+        chunk_size = chunk_size or self.ROLLUP_CHUNK_SIZE
+        watermark = self._rollup_watermark()
+        classify = self.classifier.classify_hostname
+        
+        # Limit in a subquery so a session's join rows never straddle chunks
+        query = """
+        SELECT 
+            s.rid,
+            s.timestamp,
+            s.bytes_sent,
+            s.bytes_received,
+            s.duration,
+            d.hostname,
+            dev.mac_address,
+            dev.vlan_id
+        FROM (SELECT rowid AS rid, * FROM sessions WHERE rowid > ? ORDER BY rowid LIMIT ?) s
+        LEFT JOIN {dns_records} d ON s.dst_ip = d.ip_address
+        LEFT JOIN devices dev ON s.src_ip = dev.ip_address
+        """.format(dns_records=_LATEST_DNS_RECORDS)
+        
+        folded = 0
+        while True:
+            buckets = {'hour': {}, 'day': {}}
+            hour_totals = defaultdict(int)
+            last_rowid = watermark
+            sessions = set()
+            
+            for (rowid, timestamp, sent, received, duration, hostname,
+                 mac, vlan_id) in self._iter_query(query, (watermark, chunk_size)):
+                sent = sent or 0
+                received = received or 0
+                duration = duration or 0.0
+                app_name = classify(hostname)
+                if not (hostname and app_name is None):
+                    hour_totals[timestamp[:13]] += sent + received
+                
+                for granularity, width in self.ROLLUP_BUCKETS.items():
+                    key = (timestamp[:width], mac or '', -1 if vlan_id is None else vlan_id,
+                           app_name or '')
+                    entry = buckets[granularity].get(key)
+                    if entry is None:
+                        buckets[granularity][key] = [sent, received, 1, duration, timestamp, timestamp]
+                        continue
+                    entry[0] += sent
+                    entry[1] += received
+                    entry[2] += 1
+                    entry[3] += duration
+                    if timestamp < entry[4]:
+                        entry[4] = timestamp
+                    if timestamp > entry[5]:
+                        entry[5] = timestamp
+                
+                sessions.add(rowid)
+                if rowid > last_rowid:
+                    last_rowid = rowid
             
-            # Get application usage for this VLAN
-            vlan_sessions = self.get_session_data(start_time, end_time, vlan_id=vlan_id)
-            app_usage = defaultdict(int)
-            for session in vlan_sessions:
-                app_name = self.classifier.classify_hostname(session.hostname)
-                if app_name:
-                    app_usage[app_name] += session.bytes_sent + session.bytes_received
+            if not sessions:
+                break
             
-            top_apps = dict(sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:10])
+            with self.conn:
+                for granularity, rows in buckets.items():
+                    self.conn.executemany(f"""
+                        INSERT INTO {self.ROLLUP_TABLES[granularity]} (
+                            bucket, device_mac, vlan_id, app_class, bytes_sent, bytes_received,
+                            session_count, duration, first_seen, last_seen
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (bucket, device_mac, vlan_id, app_class) DO UPDATE SET
+                            bytes_sent = bytes_sent + excluded.bytes_sent,
+                            bytes_received = bytes_received + excluded.bytes_received,
+                            session_count = session_count + excluded.session_count,
+                            duration = duration + excluded.duration,
+                            first_seen = MIN(first_seen, excluded.first_seen),
+                            last_seen = MAX(last_seen, excluded.last_seen)
+                    """, (key + tuple(values) for key, values in rows.items()))
+                
+                self.conn.executemany("""
+                    INSERT INTO usage_rollup_hour_totals (bucket, bytes) VALUES (?, ?)
+                    ON CONFLICT (bucket) DO UPDATE SET bytes = bytes + excluded.bytes
+                """, hour_totals.items())
+                
+                self.conn.execute(
+                    "UPDATE usage_rollup_state SET value = ? WHERE name = 'sessions_rowid'",
+                    (last_rowid,)
+                )
             
-            report = VLANReport(
-                vlan_id=vlan_id,
-                vlan_name=row['vlan_name'],
-                total_bandwidth=row['total_bandwidth'] or 0,
-                device_count=row['device_count'] or 0,
-                session_count=row['session_count'] or 0,
-                top_devices=top_devices,
-                top_applications=top_apps
+            folded += len(sessions)
+            watermark = last_rowid
+        
+        if folded:
+            logger.info(f"Folded {folded} sessions into usage rollups")
+        return folded
+    
+    def _init_change_tracking(self):
+        """Create the sessions version counter and the triggers that bump it."""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_cache_state (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            # Start from the clock so a recreated database never reuses old versions
+            self.conn.execute(
+                "INSERT OR IGNORE INTO report_cache_state (name, value) VALUES ('sessions_version', ?)",
+                (time.time_ns() // 1000,)
             )
-            reports.append(report)
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                self.conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS report_cache_sessions_{event.lower()}
+                    AFTER {event} ON sessions
+                    BEGIN
+                        UPDATE report_cache_state SET value = value + 1 WHERE name = 'sessions_version';
+                    END
+                """)
+    
+    def _sessions_watermark(self) -> int:
+        """Sessions version used to invalidate cached reports."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
         
-        return reports
+        query = "SELECT value FROM report_cache_state WHERE name = 'sessions_version'"
+        try:
+            row = self.conn.execute(query).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        if row is None:
+            self._init_change_tracking()
+            row = self.conn.execute(query).fetchone()
+        return row[0]
+    
+    def _cached(self, compute, report_type: str, *params: Any):
+        """Serve a report from the cache, or compute and cache it."""
+        if self.cache is None:
+            return compute()
+        
+        try:
+            watermark = self._sessions_watermark()
+        except sqlite3.OperationalError as e:
+            # e.g. a read-only database, where the triggers cannot be created
+            logger.warning(f"Report caching disabled, session changes cannot be tracked: {e}")
+            self.cache = None
+            return compute()
+        key = ReportCache.make_key(os.path.abspath(self.db_path), report_type, *params)
+        
+        result = self.cache.get(key, watermark)
+        if result is None:
+            result = compute()
+            self.cache.put(key, watermark, result)
+        return result
+    
+    def generate_device_reports(self, 
+                              start_time: datetime, 
+                              end_time: datetime) -> List[DeviceReport]:
+        """Generate per-device usage reports."""
+        def compute():
+            current, _ = self.aggregate_sessions(start_time, end_time)
+            return current.device_reports()
+        
+        return self._cached(compute, 'devices', start_time, end_time)
+    
+    def generate_vlan_reports(self, 
+                            start_time: datetime, 
+                            end_time: datetime) -> List[VLANReport]:
+        """Generate per-VLAN usage reports."""
+        def compute():
+            current, _ = self.aggregate_sessions(start_time, end_time)
+            return current.vlan_reports()
+        
+        return self._cached(compute, 'vlans', start_time, end_time)
     
     def generate_comprehensive_report(self, 
                                     period_hours: int = 24,
                                     include_historical: bool = True) -> Dict[str, Any]:
-        """Generate a comprehensive usage report."""
+        """
+        Generate a comprehensive usage report.
+        
+        With a cache, the period ends at the next whole minute, so requests
+        within the same minute share a window. Reports are cached per
+        (window, historical flag) and reused until session data changes or
+        the cache TTL expires.
+        """
+        if self.cache is None:
+            return self._build_comprehensive_report(period_hours, include_historical)
+        end_time = _ceil_minute(datetime.now())
+        return self._cached(
+            lambda: self._build_comprehensive_report(period_hours, include_historical, end_time),
+            'comprehensive', end_time - timedelta(hours=period_hours), end_time, include_historical
+        )
+    
+    def _build_comprehensive_report(self, period_hours: int, include_historical: bool,
+                                    end_time: Optional[datetime] = None) -> Dict[str, Any]:
+        """Generate a comprehensive usage report without consulting the cache."""
         
-        end_time = datetime.now()
+        end_time = end_time or datetime.now()
         start_time = end_time - timedelta(hours=period_hours)
+        with_history = include_historical and period_hours <= 24
         
-        # Get current period data
-        sessions = self.get_session_data(start_time, end_time)
-        current_stats = self.calculate_usage_stats(sessions)
-        device_reports = self.generate_device_reports(start_time, end_time)
-        vlan_reports = self.generate_vlan_reports(start_time, end_time)
+        # One scan covers the current period and, if requested, the previous one
+        if with_history:
+            historical_start = start_time - timedelta(hours=period_hours)
+            current, previous = self.aggregate_sessions(historical_start, end_time, split_time=start_time)
+        else:
+            current, previous = self.aggregate_sessions(start_time, end_time)
+        
+        current_stats = current.usage_stats()
         
         report = {
             'report_metadata': {
@@ -477,18 +1215,16 @@ class ReportEngine:
                 'period_start': start_time.isoformat(),
                 'period_end': end_time.isoformat(),
                 'period_hours': period_hours,
-                'total_sessions_analyzed': len(sessions)
+                'total_sessions_analyzed': current_stats.total_sessions
             },
             'overall_stats': asdict(current_stats),
-            'device_reports': [asdict(dr) for dr in device_reports],
-            'vlan_reports': [asdict(vr) for vr in vlan_reports]
+            'device_reports': [asdict(dr) for dr in current.device_reports()],
+            'vlan_reports': [asdict(vr) for vr in current.vlan_reports()]
         }
         
         # Add historical comparison if requested
-        if include_historical and period_hours <= 24:
-            historical_start = start_time - timedelta(hours=period_hours)
-            historical_sessions = self.get_session_data(historical_start, start_time)
-            historical_stats = self.calculate_usage_stats(historical_sessions)
+        if with_history:
+            historical_stats = previous.usage_stats()
             
             report['historical_comparison'] = {
                 'previous_period_stats': asdict(historical_stats),
@@ -11,11 +11,15 @@ import time
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Collection, Dict, List, Optional, Set, Tuple
 import sqlite3
 import ipaddress
 import threading
-from collections import defaultdict
+import math
+import bisect
+import heapq
+from array import array
+from collections import defaultdict, deque
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -53,14 +57,575 @@ class VLANStats:
     bandwidth_usage: float  # Mbps
     connected_devices: int
     timestamp: str
+
+@dataclass
+class InterfaceCounters:
+    """Cumulative traffic counters of one network interface"""
+    rx_bytes: int
+    rx_packets: int
+    rx_errors: int
+    rx_dropped: int
+    tx_bytes: int
+    tx_packets: int
+    tx_errors: int
+    tx_dropped: int
+
+@dataclass
+class CounterSnapshot:
+    """Counters of every interface, read in one pass"""
+    counters: Dict[str, InterfaceCounters]
+    taken_at: float  # time.monotonic()
+    
+    def get(self, interface: str) -> Optional[InterfaceCounters]:
+        return self.counters.get(interface)
+
+class InterfaceCounterCollector:
+    """Reads all interface counters from /proc/net/dev with a single read"""
+    
+    def __init__(self, proc_path: str = "/proc/net/dev"):
+        self.proc_path = proc_path
+    
+    def read(self) -> CounterSnapshot:
+        """Parse /proc/net/dev into a snapshot keyed by exact interface name"""
+        with open(self.proc_path, 'r') as f:
+            lines = f.read().splitlines()
+        taken_at = time.monotonic()
+        
+        counters = {}
+        for line in lines[2:]:  # two header lines
+            # Names end at the colon; large counters may follow it without a space
+            name, sep, data = line.partition(':')
+            fields = data.split()
+            if not sep or len(fields) < 12:
+                continue
+            counters[name.strip()] = InterfaceCounters(
+                rx_bytes=int(fields[0]), rx_packets=int(fields[1]),
+                rx_errors=int(fields[2]), rx_dropped=int(fields[3]),
+                tx_bytes=int(fields[8]), tx_packets=int(fields[9]),
+                tx_errors=int(fields[10]), tx_dropped=int(fields[11])
+            )
+        return CounterSnapshot(counters, taken_at)
+
+class ConntrackTrafficCollector:
+    """
+    Per-address byte counts from the kernel's connection tracking table
+    
+    Each read() parses /proc/net/nf_conntrack once and returns the bytes
+    every address moved since the previous read, summed over its flows in
+    both directions. Flows are keyed by their original tuple, so a flow's
+    counters are differenced rather than counted again; the first read only
+    sets the baseline. Byte counters need conntrack accounting
+    (net.netfilter.nf_conntrack_acct=1).
+    """
+    
+    def __init__(self, proc_path: str = "/proc/net/nf_conntrack"):
+        self.proc_path = proc_path
+        self._flows: Optional[Dict[Tuple[str, ...], int]] = None
+        self._warned = False
+    
+    def _warn_once(self, message: str):
+        if not self._warned:
+            logger.warning(message)
+            self._warned = True
+    
+    def read(self) -> Dict[str, int]:
+        """Bytes per IPv4 address since the previous read"""
+        previous = self._flows or {}
+        flows: Dict[Tuple[str, ...], int] = {}
+        traffic: Dict[str, int] = defaultdict(int)
+        unaccounted = 0
+        try:
+            with open(self.proc_path) as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 3 or fields[0] != 'ipv4':
+                        continue
+                    # key=value pairs of the original direction come first, then the reply's
+                    original: Dict[str, str] = {}
+                    reply: Dict[str, str] = {}
+                    for field in fields[3:]:
+                        key, sep, value = field.partition('=')
+                        if sep:
+                            (reply if key in original else original)[key] = value
+                    if 'bytes' not in original:
+                        unaccounted += 1
+                        continue
+                    flow = (fields[2], original.get('src'), original.get('dst'),
+                            original.get('sport'), original.get('dport'))
+                    total = int(original['bytes']) + int(reply.get('bytes', 0))
+                    flows[flow] = total
+                    delta = total - previous.get(flow, 0)
+                    if delta < 0:
+                        delta = total  # the tuple was reused by a new flow
+                    if delta:
+                        traffic[original.get('src')] += delta
+                        traffic[original.get('dst')] += delta
+        except OSError as e:
+            self._warn_once(f"Cannot read {self.proc_path}, per-device traffic unavailable: {e}")
+            return {}
+        
+        if unaccounted and not flows:
+            self._warn_once("Conntrack accounting is off (net.netfilter.nf_conntrack_acct=0), "
+                            "per-device traffic unavailable")
+        baseline = self._flows is None
+        self._flows = flows
+        return {} if baseline else dict(traffic)
+
+@dataclass
+class InterfaceRate:
+    """Throughput of one interface between two counter snapshots"""
+    rx_bps: float
+    tx_bps: float
+    rx_pps: float
+    tx_pps: float
+    rx_bps_ewma: float
+    tx_bps_ewma: float
+    interval: float  # seconds between the snapshots
+
+class SlidingWindow:
+    """Timestamped values kept for a fixed span, with percentiles on demand"""
+    
+    def __init__(self, span: float = 300.0):
+        self.span = span
+        self.values: deque = deque()
+    
+    def add(self, timestamp: float, value: float):
+        self.values.append((timestamp, value))
+        while self.values and self.values[0][0] < timestamp - self.span:
+            self.values.popleft()
+    
+    def percentile(self, percentile: float, span: Optional[float] = None) -> Optional[float]:
+        """Nearest-rank percentile of the values in the last span seconds"""
+        if not self.values:
+            return None
+        cutoff = self.values[-1][0] - (span if span is not None else self.span)
+        values = sorted(value for timestamp, value in self.values if timestamp >= cutoff)
+        rank = max(1, math.ceil(percentile / 100 * len(values)))
+        return values[min(rank, len(values)) - 1]
+
+class CounterRateEngine:
+    """
+    Turns successive counter snapshots into per-interface rates
+    
+    Rates come from counter deltas over the monotonic time between
+    snapshots. /proc/net/dev counters are 64-bit on current kernels, so a
+    counter that goes backwards is normally a reset (interface recreated)
+    and that interval is skipped. A decrease is only read as a 32-bit wrap
+    when the counters are known to be 32-bit, or when the wrapped delta is
+    possible at the interface's link speed within the elapsed time. Byte
+    rates are also smoothed with a time-based EWMA and kept in a sliding
+    window for percentiles.
+    """
+    
+    COUNTER_32_MAX = 2 ** 32
+    MIN_FRAME_BYTES = 64  # bounds the packet rate a link speed allows
+    
+    def __init__(self, ewma_tau: float = 30.0, window: float = 300.0,
+                 link_speed: Optional[Callable[[str], Optional[float]]] = None,
+                 counters_32bit: bool = False):
+        self.ewma_tau = ewma_tau
+        self.window = window
+        self.link_speed = link_speed or self.read_link_speed
+        self.counters_32bit = counters_32bit
+        self.rates: Dict[str, InterfaceRate] = {}
+        self.history: Dict[str, SlidingWindow] = {}
+        self._previous: Dict[str, InterfaceCounters] = {}
+        self._previous_at: Optional[float] = None
+    
+    @staticmethod
+    def read_link_speed(interface: str) -> Optional[float]:
+        """Link speed in bits per second from sysfs, or None when unknown"""
+        # VLAN devices report their parent's speed; fall back to it if they do not
+        for name in (interface, interface.split('.')[0]):
+            try:
+                with open(f"/sys/class/net/{name}/speed") as f:
+                    speed = int(f.read().strip())
+            except (OSError, ValueError):
+                continue
+            if speed > 0:
+                return speed * 1_000_000
+        return None
+    
+    def _delta(self, interface: str, field: str, current: int, previous: int,
+               elapsed: float) -> Optional[int]:
+        if current >= previous:
+            return current - previous
+        if previous >= self.COUNTER_32_MAX:
+            return None  # a 64-bit counter went backwards
+        wrapped = current + self.COUNTER_32_MAX - previous
+        if self.counters_32bit:
+            return wrapped
+        speed = self.link_speed(interface)
+        if speed:
+            max_bytes = speed / 8 * elapsed
+            limit = max_bytes if field.endswith('bytes') else max_bytes / self.MIN_FRAME_BYTES
+            if wrapped <= limit:
+                return wrapped
+        return None  # counter reset
+    
+    def update(self, snapshot: CounterSnapshot) -> Dict[str, InterfaceRate]:
+        """Feed a snapshot; returns the rates of interfaces seen in it and the previous one"""
+        previous, previous_at = self._previous, self._previous_at
+        self._previous, self._previous_at = snapshot.counters, snapshot.taken_at
+        
+        # Forget interfaces that disappeared
+        for name in list(self.rates):
+            if name not in snapshot.counters:
+                del self.rates[name]
+                self.history.pop(name, None)
+        
+        if previous_at is None or snapshot.taken_at <= previous_at:
+            return {}
+        elapsed = snapshot.taken_at - previous_at
+        alpha = 1 - math.exp(-elapsed / self.ewma_tau) if self.ewma_tau > 0 else 1.0
+        
+        updated = {}
+        for name, counters in snapshot.counters.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            deltas = [self._delta(name, field, getattr(counters, field), getattr(before, field), elapsed)
+                      for field in ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets')]
+            if None in deltas:
+                logger.info(f"Counters of {name} were reset, skipping this interval")
+                continue
+            
+            rx_bps, tx_bps, rx_pps, tx_pps = (delta / elapsed for delta in deltas)
+            rx_bps *= 8
+            tx_bps *= 8
+            last = self.rates.get(name)
+            rate = InterfaceRate(
+                rx_bps=rx_bps, tx_bps=tx_bps, rx_pps=rx_pps, tx_pps=tx_pps,
+                rx_bps_ewma=rx_bps if last is None else last.rx_bps_ewma + alpha * (rx_bps - last.rx_bps_ewma),
+                tx_bps_ewma=tx_bps if last is None else last.tx_bps_ewma + alpha * (tx_bps - last.tx_bps_ewma),
+                interval=elapsed
+            )
+            self.rates[name] = rate
+            self.history.setdefault(name, SlidingWindow(self.window)).add(
+                snapshot.taken_at, rx_bps + tx_bps)
+            updated[name] = rate
+        return updated
+    
+    def percentile(self, interface: str, percentile: float = 95,
+                   span: Optional[float] = None) -> Optional[float]:
+        """Percentile of an interface's combined rx+tx bits per second"""
+        window = self.history.get(interface)
+        return window.percentile(percentile, span) if window else None
+    
+class SubnetDeviceIndex:
+    """
+    In-memory map of VLAN subnets to the devices holding active leases in them
+    
+    Subnets are kept as sorted integer intervals, so placing a device is a
+    bisect over the interval starts rather than a scan of every VLAN. The
+    index follows the device tracker's lease state: a full sync when it is
+    first attached, then one update per lease changeset. Per-device byte
+    counts fed in with record_traffic() or record_ip_traffic() let callers
+    rank the top talkers of a VLAN without querying anything.
+    
+    Example:
+        index = SubnetDeviceIndex()
+        index.set_subnets({10: "192.168.10.0/24", 20: "192.168.20.0/24"})
+        index.attach(tracker)
+        index.count(10)
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._subnets: Dict[int, str] = {}
+        self._starts: List[int] = []
+        self._intervals: List[Tuple[int, int, int]] = []  # (start, end, vlan_id)
+        self._max_end: List[int] = []  # running max of interval ends, bounds nested lookups
+        self._devices: Dict[str, Tuple[int, Optional[int]]] = {}  # mac -> (ip, vlan_id)
+        self._by_vlan: Dict[int, Set[str]] = defaultdict(set)
+        self._traffic: Dict[str, int] = defaultdict(int)
+        self.synced = False
+    
+    @staticmethod
+    def _ip_to_int(ip: str) -> Optional[int]:
+        try:
+            return int(ipaddress.IPv4Address(ip))
+        except (ipaddress.AddressValueError, ValueError):
+            return None
+    
+    def set_subnets(self, subnets: Dict[int, str]):
+        """Replace the VLAN subnets, re-placing known devices if they changed"""
+        with self._lock:
+            if subnets == self._subnets:
+                return
+            intervals = []
+            for vlan_id, subnet in subnets.items():
+                try:
+                    network = ipaddress.IPv4Network(subnet, strict=False)
+                except ValueError:
+                    logger.warning(f"Ignoring invalid subnet {subnet} of VLAN {vlan_id}")
+                    continue
+                intervals.append((int(network.network_address), int(network.broadcast_address), vlan_id))
+            # Wider subnets first at equal starts, so the narrower one wins a lookup
+            intervals.sort(key=lambda interval: (interval[0], -interval[1]))
+            
+            self._subnets = dict(subnets)
+            self._intervals = intervals
+            self._starts = [start for start, _, _ in intervals]
+            self._max_end = []
+            for _, end, _ in intervals:
+                self._max_end.append(max(end, self._max_end[-1]) if self._max_end else end)
+            
+            self._by_vlan = defaultdict(set)
+            for mac, (ip, _) in list(self._devices.items()):
+                self._place(mac, ip)
+    
+    def vlan_for(self, ip: str) -> Optional[int]:
+        """VLAN whose subnet contains ip, preferring the most specific one"""
+        ip_int = self._ip_to_int(ip)
+        if ip_int is None:
+            return None
+        with self._lock:
+            return self._lookup(ip_int)
+    
+    def _lookup(self, ip_int: int) -> Optional[int]:
+        i = bisect.bisect_right(self._starts, ip_int) - 1
+        while i >= 0 and self._max_end[i] >= ip_int:
+            start, end, vlan_id = self._intervals[i]
+            if ip_int <= end:
+                return vlan_id
+            i -= 1
+        return None
+    
+    def _place(self, mac: str, ip_int: int):
+        vlan_id = self._lookup(ip_int)
+        self._devices[mac] = (ip_int, vlan_id)
+        if vlan_id is not None:
+            self._by_vlan[vlan_id].add(mac)
+    
+    def _remove(self, mac: str):
+        entry = self._devices.pop(mac, None)
+        if entry and entry[1] is not None:
+            self._by_vlan[entry[1]].discard(mac)
+        self._traffic.pop(mac, None)
+    
+    def update_device(self, mac: str, ip: str):
+        """Add a device or move it to its new address"""
+        ip_int = self._ip_to_int(ip)
+        with self._lock:
+            current = self._devices.get(mac)
+            if ip_int is None:
+                self._remove(mac)
+            elif current is None or current[0] != ip_int:
+                if current and current[1] is not None:
+                    self._by_vlan[current[1]].discard(mac)
+                self._place(mac, ip_int)
+    
+    def remove_device(self, mac: str):
+        with self._lock:
+            self._remove(mac)
+    
+    def sync(self, lease_state):
+        """Rebuild from a LeaseStateEngine's active leases"""
+        with self._lock:
+            self._devices.clear()
+            self._by_vlan = defaultdict(set)
+            for mac in lease_state.active:
+                lease = lease_state.leases.get(mac)
+                ip_int = self._ip_to_int(lease[0]) if lease and lease[0] else None
+                if ip_int is not None:
+                    self._place(mac, ip_int)
+            for mac in list(self._traffic):
+                if mac not in self._devices:
+                    del self._traffic[mac]
+            self.synced = True
     
+    def apply_changes(self, changes):
+        """Apply a LeaseChangeset from the device tracker"""
+        with self._lock:
+            # A lease can return with a new hostname only, so every changed lease is placed
+            for mac, ip, _hostname, _expires in changes.new + changes.changed + changes.renewed:
+                self.update_device(mac, ip)
+            for mac in changes.expired:
+                self._remove(mac)
+    
+    def on_lease_changes(self, changes, lease_state):
+        """DeviceTracker lease listener"""
+        if self.synced:
+            self.apply_changes(changes)
+        else:
+            self.sync(lease_state)
+    
+    def attach(self, tracker):
+        """Follow a DeviceTracker's lease state from now on"""
+        if tracker.lease_state.primed:
+            self.sync(tracker.lease_state)
+        tracker.add_lease_listener(self.on_lease_changes)
+    
+    def count(self, vlan_id: int) -> int:
+        with self._lock:
+            return len(self._by_vlan.get(vlan_id, ()))
+    
+    def devices(self, vlan_id: int) -> Dict[str, str]:
+        """Active devices of a VLAN as {mac: ip}"""
+        with self._lock:
+            return {mac: str(ipaddress.IPv4Address(self._devices[mac][0]))
+                    for mac in self._by_vlan.get(vlan_id, ())}
+    
+    def record_traffic(self, mac: str, byte_count: int):
+        """Add bytes transferred by a device since the last reset"""
+        with self._lock:
+            if mac in self._devices:
+                self._traffic[mac] += byte_count
+    
+    def record_ip_traffic(self, byte_counts: Dict[str, int]):
+        """Add bytes per IP address, as read by ConntrackTrafficCollector, to their devices"""
+        with self._lock:
+            macs = {ip_int: mac for mac, (ip_int, _) in self._devices.items()}
+            for ip, byte_count in byte_counts.items():
+                mac = macs.get(self._ip_to_int(ip))
+                if mac:
+                    self._traffic[mac] += byte_count
+    
+    def reset_traffic(self):
+        with self._lock:
+            self._traffic.clear()
+    
+    def top_talkers(self, vlan_id: int, n: int = 1,
+                    exclude: Collection[str] = ()) -> List[Tuple[str, str, int]]:
+        """Up to n devices of a VLAN, not in exclude, with the most recorded traffic, as (mac, ip, bytes)"""
+        with self._lock:
+            ranked = heapq.nlargest(
+                n, ((self._traffic[mac], mac) for mac in self._by_vlan.get(vlan_id, ())
+                    if self._traffic.get(mac) and mac not in exclude))
+            return [(mac, str(ipaddress.IPv4Address(self._devices[mac][0])), byte_count)
+                    for byte_count, mac in ranked]
+
+class VLANTimeSeries:
+    """
+    Fixed-size time series for VLAN and interface counters
+    
+    Every sample is folded into 1m, 5m and 1h buckets as it is written. Each
+    (series, resolution) pair is a ring of retention / resolution slots, so
+    a slot is overwritten once its bucket ages out and storage never grows.
+    Series are named "vlan:<id>" or "iface:<name>".
+    
+    Example:
+        series = VLANTimeSeries("/var/lib/lnmt/vlan.db")
+        data = series.query("vlan:100", start=time.time() - 3600)
+        bandwidth = numpy.asarray(data['bandwidth_avg'])  # zero-copy
+    """
+    
+    # Seconds of history kept at each resolution (seconds per bucket)
+    DEFAULT_RETENTION = {60: 86400, 300: 7 * 86400, 3600: 90 * 86400}
+    
+    # Returned by query(); typecodes are those of array.array
+    COLUMNS = [('timestamp', 'd'), ('samples', 'q'), ('bandwidth_avg', 'd'), ('bandwidth_max', 'd'),
+               ('bytes_in', 'q'), ('bytes_out', 'q'), ('packets_in', 'q'), ('packets_out', 'q'),
+               ('devices', 'q')]
+    
+    def __init__(self, db_path: str, retention: Optional[Dict[int, int]] = None):
+        self.db_path = db_path
+        self.retention = dict(sorted((retention or self.DEFAULT_RETENTION).items()))
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS series_points (
+                series TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                slot INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                bandwidth_sum REAL NOT NULL,
+                bandwidth_max REAL NOT NULL,
+                bytes_in INTEGER,
+                bytes_out INTEGER,
+                packets_in INTEGER,
+                packets_out INTEGER,
+                devices INTEGER,
+                PRIMARY KEY (series, resolution, slot)
+            ) WITHOUT ROWID
+            """)
+    
+    def record_many(self, points: List[Tuple[str, float, float, int, int, int, int, int]]) -> None:
+        """
+        Add samples given as (series, timestamp, bandwidth_mbps, bytes_in,
+        bytes_out, packets_in, packets_out, devices); counters are cumulative
+        and each bucket keeps the latest value.
+        """
+        rows = []
+        for series, timestamp, bandwidth, *counters in points:
+            for resolution, retention in self.retention.items():
+                index = int(timestamp // resolution)
+                rows.append((series, resolution, index % (retention // resolution),
+                             index * resolution, bandwidth, bandwidth, *counters))
+        
+        # A slot still holding an older bucket is reset rather than merged
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("""
+            INSERT INTO series_points
+            (series, resolution, slot, bucket, samples, bandwidth_sum, bandwidth_max,
+             bytes_in, bytes_out, packets_in, packets_out, devices)
+            VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (series, resolution, slot) DO UPDATE SET
+                bucket = excluded.bucket,
+                samples = CASE WHEN bucket = excluded.bucket THEN samples + 1 ELSE 1 END,
+                bandwidth_sum = CASE WHEN bucket = excluded.bucket
+                    THEN bandwidth_sum + excluded.bandwidth_sum ELSE excluded.bandwidth_sum END,
+                bandwidth_max = CASE WHEN bucket = excluded.bucket
+                    THEN MAX(bandwidth_max, excluded.bandwidth_max) ELSE excluded.bandwidth_max END,
+                bytes_in = excluded.bytes_in,
+                bytes_out = excluded.bytes_out,
+                packets_in = excluded.packets_in,
+                packets_out = excluded.packets_out,
+                devices = CASE WHEN bucket = excluded.bucket
+                    THEN MAX(devices, excluded.devices) ELSE excluded.devices END
+            """, rows)
+    
+    def pick_resolution(self, start: float, now: Optional[float] = None) -> int:
+        """Finest resolution whose retention still covers start"""
+        now = now if now is not None else time.time()
+        for resolution, retention in self.retention.items():
+            if start >= now - retention:
+                return resolution
+        return max(self.retention)
+    
+    def query(self, series: str, start: float, end: Optional[float] = None,
+              resolution: Optional[int] = None) -> Dict[str, array]:
+        """
+        Get the buckets of a series between two epoch times as one array per
+        column (see COLUMNS), oldest first
+        """
+        end = end if end is not None else time.time()
+        resolution = resolution or self.pick_resolution(start)
+        if resolution not in self.retention:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("""
+            SELECT bucket, samples, bandwidth_sum / samples, bandwidth_max,
+                   bytes_in, bytes_out, packets_in, packets_out, devices
+            FROM series_points
+            WHERE series = ? AND resolution = ? AND bucket BETWEEN ? AND ?
+            ORDER BY bucket
+            """, (series, resolution, int(start // resolution) * resolution, end)).fetchall()
+        
+        return {
+            name: array(typecode, (row[i] or 0 for row in rows))
+            for i, (name, typecode) in enumerate(self.COLUMNS)
+        }
+    
+    def delete_series(self, series: str) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM series_points WHERE series = ?", (series,))
+
 class VLANDatabase:
     """Database handler for VLAN configurations and statistics"""
     
+    # Raw vlan_stats rows older than this are pruned; history lives in the time series
+    RAW_STATS_RETENTION = timedelta(days=1)
+    PRUNE_EVERY = 1000  # saved stats between prunes
+    
     def __init__(self, db_path: str = "/var/lib/lnmt/vlan.db"):
         self.db_path = db_path
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._init_database()
+        self.series = VLANTimeSeries(db_path)
+        self._saved_since_prune = 0
     
     def _init_database(self):
         """Initialize database tables"""
@@ -181,31 +746,51 @@ class VLANDatabase:
     def delete_vlan(self, vlan_id: int) -> bool:
         """Delete VLAN configuration"""
         try:
+            vlan = self.get_vlan(vlan_id)
+            for interface in (vlan.interfaces if vlan else []):
+                self.series.delete_series(f"iface:{interface}.{vlan_id}")
             with sqlite3.connect(self.db_path) as conn:
                 conn.execute("DELETE FROM vlans WHERE vlan_id = ?", (vlan_id,))
                 conn.execute("DELETE FROM vlan_stats WHERE vlan_id = ?", (vlan_id,))
-                return True
+            self.series.delete_series(f"vlan:{vlan_id}")
+            return True
         except Exception as e:
             logger.error(f"Failed to delete VLAN {vlan_id}: {e}")
             return False
     
     def save_stats(self, stats: VLANStats) -> bool:
         """Save VLAN statistics"""
+        return self.save_stats_batch([stats])
+    
+    def save_stats_batch(self, stats_list: List[VLANStats]) -> bool:
+        """Save statistics of many VLANs in one transaction and add them to the time series"""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
+                conn.executemany("""
                 INSERT INTO vlan_stats 
                 (vlan_id, bytes_in, bytes_out, packets_in, packets_out, 
                  bandwidth_usage, connected_devices, timestamp)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                """, [(
                     stats.vlan_id, stats.bytes_in, stats.bytes_out,
                     stats.packets_in, stats.packets_out, stats.bandwidth_usage,
                     stats.connected_devices, stats.timestamp
-                ))
+                ) for stats in stats_list])
+                
+                self._saved_since_prune += len(stats_list)
+                if self._saved_since_prune >= self.PRUNE_EVERY:
+                    self._saved_since_prune = 0
+                    cutoff = (datetime.now() - self.RAW_STATS_RETENTION).isoformat()
+                    conn.execute("DELETE FROM vlan_stats WHERE timestamp < ?", (cutoff,))
+            
+            self.series.record_many([(
+                f"vlan:{stats.vlan_id}", datetime.fromisoformat(stats.timestamp).timestamp(),
+                stats.bandwidth_usage, stats.bytes_in, stats.bytes_out,
+                stats.packets_in, stats.packets_out, stats.connected_devices
+            ) for stats in stats_list])
             return True
         except Exception as e:
-            logger.error(f"Failed to save stats for VLAN {stats.vlan_id}: {e}")
+            logger.error(f"Failed to save stats for {len(stats_list)} VLANs: {e}")
             return False
     
     def blacklist_device(self, mac_address: str, ip_address: str, vlan_id: int, reason: str) -> bool:
@@ -221,6 +806,15 @@ class VLANDatabase:
         except Exception as e:
             logger.error(f"Failed to blacklist device {mac_address}: {e}")
             return False
+    
+    def get_blacklisted_macs(self) -> Set[str]:
+        """MAC addresses currently on the blacklist"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                return {row[0] for row in conn.execute("SELECT mac_address FROM blacklisted_devices")}
+        except Exception as e:
+            logger.error(f"Failed to read blacklisted devices: {e}")
+            return set()
 
 class NetworkInterface:
     """Network interface management"""
@@ -338,8 +932,18 @@ class ShorewallIntegration:
 class VLANMonitor:
     """VLAN monitoring and statistics collection"""
     
-    def __init__(self, db: VLANDatabase):
+    def __init__(self, db: VLANDatabase, collector: Optional[InterfaceCounterCollector] = None,
+                 interval: float = 30.0, device_index: Optional[SubnetDeviceIndex] = None,
+                 blacklist_top_n: int = 1, traffic_collector: Optional[ConntrackTrafficCollector] = None):
         self.db = db
+        self.collector = collector or InterfaceCounterCollector()
+        self.device_index = device_index or SubnetDeviceIndex()
+        self.traffic_collector = traffic_collector or ConntrackTrafficCollector()
+        self.blacklist_top_n = blacklist_top_n
+        self.rates = CounterRateEngine()
+        self.bandwidth_history: Dict[int, SlidingWindow] = {}
+        self.last_snapshot: Optional[CounterSnapshot] = None
+        self.interval = interval
         self.running = False
         self.monitor_thread = None
     
@@ -361,39 +965,92 @@ class VLANMonitor:
         """Main monitoring loop"""
         while self.running:
             try:
-                vlans = self.db.list_vlans()
-                for vlan in vlans:
-                    stats = self._collect_vlan_stats(vlan)
-                    if stats:
-                        self.db.save_stats(stats)
-                        self._check_thresholds(vlan, stats)
+                results = self.collect_cycle()
+                self.db.save_stats_batch([stats for _, stats in results])
+                self._record_interface_series()
+                for vlan, stats in results:
+                    self._check_thresholds(vlan, stats)
                 
-                time.sleep(30)  # Monitor every 30 seconds
+                time.sleep(self.interval)
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
                 time.sleep(60)
     
-    def _collect_vlan_stats(self, vlan: VLANConfig) -> Optional[VLANStats]:
+    def collect_cycle(self) -> List[Tuple[VLANConfig, VLANStats]]:
+        """Collect statistics for every VLAN from one read of the interface counters"""
+        snapshot = self.collector.read()
+        self.rates.update(snapshot)
+        self.last_snapshot = snapshot
+        vlans = self.db.list_vlans()
+        self.device_index.set_subnets({vlan.vlan_id: vlan.subnet for vlan in vlans})
+        # Top talkers are ranked on the traffic of the latest interval
+        self.device_index.reset_traffic()
+        self.device_index.record_ip_traffic(self.traffic_collector.read())
+        results = []
+        for vlan in vlans:
+            stats = self._collect_vlan_stats(vlan, snapshot)
+            if stats:
+                results.append((vlan, stats))
+        return results
+    
+    def _record_interface_series(self):
+        """Add the latest interface rates and counters to the time series"""
+        snapshot = self.last_snapshot
+        if snapshot is None:
+            return
+        now = time.time()
+        points = []
+        for name, rate in self.rates.rates.items():
+            counters = snapshot.get(name)
+            if counters:
+                points.append((
+                    f"iface:{name}", now, (rate.rx_bps_ewma + rate.tx_bps_ewma) / 1_000_000,
+                    counters.rx_bytes, counters.tx_bytes, counters.rx_packets, counters.tx_packets, 0
+                ))
+        if points:
+            self.db.series.record_many(points)
+    
+    def get_bandwidth_percentile(self, vlan_id: int, percentile: float = 95,
+                                 span: Optional[float] = None) -> Optional[float]:
+        """Percentile of a VLAN's bandwidth in Mbps over the sliding window"""
+        window = self.bandwidth_history.get(vlan_id)
+        return window.percentile(percentile, span) if window else None
+    
+    def _collect_vlan_stats(self, vlan: VLANConfig,
+                            snapshot: Optional[CounterSnapshot] = None) -> Optional[VLANStats]:
         """Collect statistics for a VLAN"""
         try:
+            snapshot = snapshot or self.collector.read()
             total_bytes_in = 0
             total_bytes_out = 0
             total_packets_in = 0
             total_packets_out = 0
+            current_bps = 0.0
+            smoothed_bps = 0.0
+            measured = False
             
             for interface in vlan.interfaces:
                 vlan_interface = f"{interface}.{vlan.vlan_id}"
-                stats = self._get_interface_stats(vlan_interface)
+                stats = snapshot.get(vlan_interface)
                 if stats:
-                    total_bytes_in += stats['rx_bytes']
-                    total_bytes_out += stats['tx_bytes']
-                    total_packets_in += stats['rx_packets']
-                    total_packets_out += stats['tx_packets']
+                    total_bytes_in += stats.rx_bytes
+                    total_bytes_out += stats.tx_bytes
+                    total_packets_in += stats.rx_packets
+                    total_packets_out += stats.tx_packets
+                
+                rate = self.rates.rates.get(vlan_interface)
+                if rate:
+                    current_bps += rate.rx_bps + rate.tx_bps
+                    smoothed_bps += rate.rx_bps_ewma + rate.tx_bps_ewma
+                    measured = True
             
-            # Calculate bandwidth usage (simplified)
-            bandwidth_usage = (total_bytes_in + total_bytes_out) * 8 / (1024 * 1024 * 30)  # Mbps over 30 seconds
+            # Smoothed throughput in Mbps; thresholds act on this
+            bandwidth_usage = smoothed_bps / 1_000_000
+            if measured:
+                self.bandwidth_history.setdefault(
+                    vlan.vlan_id, SlidingWindow(self.rates.window)
+                ).add(snapshot.taken_at, current_bps / 1_000_000)
             
-            # Get connected devices count (placeholder - would integrate with device_tracker)
             connected_devices = self._count_connected_devices(vlan)
             
             return VLANStats(
@@ -410,28 +1067,20 @@ class VLANMonitor:
             logger.error(f"Failed to collect stats for VLAN {vlan.vlan_id}: {e}")
             return None
     
-    def _get_interface_stats(self, interface: str) -> Optional[Dict]:
-        """Get interface statistics from /proc/net/dev"""
+    def _get_interface_stats(self, interface: str,
+                             snapshot: Optional[CounterSnapshot] = None) -> Optional[Dict]:
+        """Get statistics of exactly this interface from /proc/net/dev"""
         try:
-            with open('/proc/net/dev', 'r') as f:
-                for line in f:
-                    if interface in line:
-                        parts = line.split()
-                        return {
-                            'rx_bytes': int(parts[1]),
-                            'rx_packets': int(parts[2]),
-                            'tx_bytes': int(parts[9]),
-                            'tx_packets': int(parts[10])
-                        }
+            counters = (snapshot or self.collector.read()).get(interface)
+            if counters:
+                return asdict(counters)
         except Exception as e:
             logger.error(f"Failed to get stats for interface {interface}: {e}")
         return None
     
     def _count_connected_devices(self, vlan: VLANConfig) -> int:
-        """Count connected devices in VLAN (placeholder for device_tracker integration)"""
-        # This would integrate with your device_tracker module
-        # For now, return a placeholder value
-        return 0
+        """Count devices with an active lease in the VLAN's subnet"""
+        return self.device_index.count(vlan.vlan_id)
     
     def _check_thresholds(self, vlan: VLANConfig, stats: VLANStats):
         """Check usage thresholds and trigger auto-blacklisting if needed"""
@@ -442,23 +1091,58 @@ class VLANMonitor:
             usage_percent = (stats.bandwidth_usage / vlan.bandwidth_limit) * 100
             if usage_percent > vlan.usage_threshold:
                 logger.warning(f"VLAN {vlan.vlan_id} exceeded usage threshold: {usage_percent:.1f}%")
-                # Implement auto-blacklisting logic here
                 self._trigger_auto_blacklist(vlan, f"Bandwidth usage exceeded {vlan.usage_threshold}%")
     
     def _trigger_auto_blacklist(self, vlan: VLANConfig, reason: str):
-        """Trigger auto-blacklisting for high usage devices"""
-        # This would identify and blacklist the highest usage devices
-        # Implementation would depend on device_tracker integration
+        """Blacklist the VLAN's top talkers"""
         logger.info(f"Auto-blacklist triggered for VLAN {vlan.vlan_id}: {reason}")
+        # Devices already listed are skipped, so a VLAN that stays over its
+        # threshold moves on to the next talker instead of re-listing the same one
+        talkers = self.device_index.top_talkers(vlan.vlan_id, self.blacklist_top_n,
+                                                exclude=self.db.get_blacklisted_macs())
+        if not talkers:
+            logger.warning(f"No unlisted device with recorded traffic on VLAN {vlan.vlan_id}, "
+                           f"nothing to blacklist")
+            return
+        for mac, ip, byte_count in talkers:
+            if self.db.blacklist_device(mac, ip, vlan.vlan_id, reason):
+                logger.warning(f"Blacklisted {mac} ({ip}) on VLAN {vlan.vlan_id} after {byte_count} bytes")
 
 class VLANController:
     """Main VLAN controller class"""
     
-    def __init__(self, db_path: str = "/var/lib/lnmt/vlan.db"):
+    def __init__(self, db_path: str = "/var/lib/lnmt/vlan.db",
+                 lease_file: Optional[str] = "/var/lib/misc/dnsmasq.leases"):
         self.db = VLANDatabase(db_path)
         self.shorewall = ShorewallIntegration()
         self.monitor = VLANMonitor(self.db)
         self.network = NetworkInterface()
+        self.lease_file = lease_file
+        self.device_tracker = None
+        self._lease_follower = None
+        self._follower_thread: Optional[threading.Thread] = None
+    
+    def attach_device_tracker(self, tracker):
+        """Count VLAN devices from a running DeviceTracker's leases"""
+        self.device_tracker = tracker
+        self.monitor.device_index.attach(tracker)
+    
+    def _start_lease_follower(self):
+        """
+        Follow the DHCP leases read-only unless a tracker was attached
+        
+        The device tracker daemon owns the device database; the index only
+        needs lease state, so nothing here writes to it.
+        """
+        try:
+            from services.device_tracker_service import LeaseFollower
+        except Exception as e:
+            logger.warning(f"Lease follower unavailable, VLAN device counts stay at zero: {e}")
+            return
+        self._lease_follower = LeaseFollower(self.lease_file)
+        self.monitor.device_index.attach(self._lease_follower)
+        self._follower_thread = threading.Thread(target=self._lease_follower.start, daemon=True)
+        self._follower_thread.start()
     
     def create_vlan(self, vlan_id: int, name: str, description: str, 
                    subnet: str, gateway: str, interfaces: List[str],
@@ -580,11 +1264,19 @@ class VLANController:
     
     def start_monitoring(self):
         """Start VLAN monitoring"""
+        if self.device_tracker is None and self._lease_follower is None and self.lease_file:
+            self._start_lease_follower()
         self.monitor.start_monitoring()
     
     def stop_monitoring(self):
         """Stop VLAN monitoring"""
         self.monitor.stop_monitoring()
+        if self._follower_thread:
+            self._lease_follower.stop()
+            self._follower_thread.join(timeout=5)
+            self._follower_thread = None
+            self._lease_follower = None
+            self.monitor.device_index.synced = False
     
     def export_topology(self, output_file: str = "/tmp/vlan_topology.dot") -> bool:
         """Export VLAN topology as Graphviz diagram"""
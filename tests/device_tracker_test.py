@@ -13,17 +13,21 @@ Run examples:
 import unittest
 import tempfile
 import os
+import sqlite3
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 import json
+import threading
+import time
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from services.device_tracker import (
+from services.device_tracker_service import (
     DeviceDatabase, DeviceTracker, MACAnalyzer, 
-    DHCPLeaseParser, Device, DeviceEvent
+    DHCPLeaseParser, Device, DeviceEvent, LeaseStateEngine,
+    LeaseFileWatcher, LeaseFollower, OUIDatabase, HistoryRetention
 )
 
 class TestMACAnalyzer(unittest.TestCase):
@@ -72,6 +76,57 @@ class TestMACAnalyzer(unittest.TestCase):
                 vendor = self.analyzer.get_vendor(mac)
                 self.assertEqual(vendor, expected_vendor)
 
+class TestOUIDatabase(unittest.TestCase):
+    """Test IEEE registry loading and prefix lookup"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, 'oui.csv')
+        self.cache_path = os.path.join(self.temp_dir, 'oui.cache')
+        with open(self.csv_path, 'w') as f:
+            f.write('Registry,Assignment,Organization Name,Organization Address\n')
+            f.write('MA-L,001122,"Example Corp","1 Main St"\n')
+            f.write('MA-L,70B3D5,IEEE Registration Authority,Piscataway\n')
+            f.write('MA-M,70B3D51,"Medium Block, Inc.",Somewhere\n')
+            f.write('MA-S,70B3D5123,Small Block Ltd,Elsewhere\n')
+    
+    def tearDown(self):
+        for name in os.listdir(self.temp_dir):
+            os.unlink(os.path.join(self.temp_dir, name))
+        os.rmdir(self.temp_dir)
+    
+    def test_longest_prefix_lookup(self):
+        """MA-S beats MA-M beats MA-L"""
+        db = OUIDatabase.load((self.csv_path,), self.cache_path)
+        
+        self.assertEqual(len(db), 4)
+        self.assertEqual(db.lookup("00:11:22:33:44:55"), "Example Corp")
+        self.assertEqual(db.lookup("70:b3:d5:12:34:56"), "Small Block Ltd")
+        self.assertEqual(db.lookup("70-B3-D5-1F-00-00"), "Medium Block, Inc.")
+        self.assertEqual(db.lookup("70:b3:d5:ff:00:00"), "IEEE Registration Authority")
+        self.assertIsNone(db.lookup("ff:ff:ff:00:00:00"))
+    
+    def test_cache_roundtrip(self):
+        """A second load reads the cache and matches the CSV result"""
+        first = OUIDatabase.load((self.csv_path,), self.cache_path)
+        self.assertTrue(os.path.exists(self.cache_path))
+        
+        cached = OUIDatabase.load_cache(self.cache_path)
+        self.assertIsNotNone(cached)
+        self.assertEqual(cached.vendors, first.vendors)
+        self.assertEqual(cached.lookup("70:b3:d5:12:34:56"), "Small Block Ltd")
+    
+    def test_classify_many(self):
+        """Bulk classification returns vendor and randomization per MAC"""
+        analyzer = MACAnalyzer(OUIDatabase.load((self.csv_path,), self.cache_path))
+        results = analyzer.classify_many([
+            "00:11:22:33:44:55", "08:00:27:11:22:33", "02:00:00:00:00:01"
+        ])
+        
+        self.assertEqual(results["00:11:22:33:44:55"], ("Example Corp", False))
+        self.assertEqual(results["08:00:27:11:22:33"], ("VirtualBox", False))
+        self.assertEqual(results["02:00:00:00:00:01"], (None, True))
+
 class TestDeviceDatabase(unittest.TestCase):
     """Test device database functionality"""
     
@@ -82,8 +137,11 @@ class TestDeviceDatabase(unittest.TestCase):
         self.db = DeviceDatabase(self.temp_db.name)
     
     def tearDown(self):
-        # Clean up temporary database
-        os.unlink(self.temp_db.name)
+        # Clean up temporary database and its WAL files
+        self.db.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
     
     def test_device_crud_operations(self):
         """Test device CRUD operations"""
@@ -156,6 +214,169 @@ class TestDeviceDatabase(unittest.TestCase):
         self.assertEqual(events[0].event_type, "new_device")
         self.assertEqual(events[0].mac_address, "aa:bb:cc:dd:ee:ff")
 
+    def test_batch_writes(self):
+        """Bulk writes inside batch() commit together"""
+        now = datetime.now()
+        devices = [
+            Device(
+                mac_address=f"aa:bb:cc:dd:ee:{i:02x}",
+                ip_address=f"192.168.1.{i}",
+                hostname=f"device{i}",
+                first_seen=now,
+                last_seen=now
+            )
+            for i in range(50)
+        ]
+        
+        with self.db.batch():
+            self.db.save_devices(devices)
+            self.db.add_history_entries(
+                [(d.mac_address, d.ip_address, d.hostname, None) for d in devices]
+            )
+        
+        self.assertEqual(len(self.db.get_all_devices()), 50)
+        found = self.db.get_devices(["aa:bb:cc:dd:ee:00", "aa:bb:cc:dd:ee:31", "00:00:00:00:00:00"])
+        self.assertEqual(sorted(found), ["aa:bb:cc:dd:ee:00", "aa:bb:cc:dd:ee:31"])
+    
+    def test_thread_connections_closed(self):
+        """Connections of finished threads are closed, the rest on close()"""
+        threads = [threading.Thread(target=self.db.get_all_devices) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        self.db.get_all_devices()
+        
+        open_connections = list(self.db._connections)
+        self.assertEqual(len(open_connections), 1, "Connections of exited threads were kept")
+        self.db.close()
+        self.assertFalse(open_connections[0].close.alive)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            open_connections[0].conn.execute("SELECT 1")
+        
+        # The database reopens on next use
+        self.assertEqual(self.db.get_all_devices(), [])
+    
+    def test_batch_rollback(self):
+        """An exception inside batch() discards all of its writes"""
+        now = datetime.now()
+        device = Device(
+            mac_address="aa:bb:cc:dd:ee:ff",
+            ip_address="192.168.1.100",
+            hostname="test-device",
+            first_seen=now,
+            last_seen=now
+        )
+        
+        with self.assertRaises(RuntimeError):
+            with self.db.batch():
+                self.db.save_device(device)
+                raise RuntimeError("abort")
+        
+        self.assertIsNone(self.db.get_device("aa:bb:cc:dd:ee:ff"))
+
+    def _insert_history(self, rows):
+        with self.db.batch() as conn:
+            conn.executemany("""
+                INSERT INTO device_history
+                (mac_address, ip_address, hostname, timestamp, lease_expires)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+    
+    def test_history_compaction(self):
+        """Old raw rows fold into day-split intervals; history reads both"""
+        mac = "aa:bb:cc:dd:ee:ff"
+        now = datetime(2024, 3, 20, 12, 0, 0)
+        start = datetime(2024, 3, 1, 22, 0, 0)
+        
+        # Legacy per-poll rows, an IP change, then a recent raw transition
+        rows = [(mac, "192.168.1.100", "device1", start + timedelta(minutes=30 * i), None)
+                for i in range(8)]
+        rows.append((mac, "192.168.1.101", "device1", datetime(2024, 3, 2, 3, 0, 0), None))
+        rows.append((mac, "192.168.1.102", "device1", datetime(2024, 3, 18, 9, 0, 0), None))
+        self._insert_history(rows)
+        
+        stats = self.db.compact_history(now=now)
+        self.assertEqual(stats['compacted_rows'], 9)
+        
+        # 192.168.1.100 crosses midnight and is stored in two partitions
+        intervals = self.db.get_device_intervals(mac, datetime(2024, 3, 1), datetime(2024, 3, 3))
+        self.assertEqual(len(intervals), 2)
+        self.assertEqual(intervals[0]['ip_address'], "192.168.1.100")
+        self.assertEqual(intervals[0]['start_time'], start)
+        self.assertEqual(intervals[0]['end_time'], datetime(2024, 3, 2, 3, 0, 0))
+        self.assertEqual(intervals[1]['ip_address'], "192.168.1.101")
+        
+        # Stitched back together across every partition in the range
+        intervals = self.db.get_device_intervals(mac, datetime(2024, 3, 1), now)
+        self.assertEqual(intervals[-1]['end_time'], datetime(2024, 3, 18, 9, 0, 0))
+        
+        # Range queries skip partitions outside the window
+        self.assertEqual(
+            self.db.get_device_intervals(mac, datetime(2024, 3, 1), datetime(2024, 3, 1, 21)),
+            []
+        )
+        
+        # The current state stays raw
+        self.assertEqual(self.db.compact_history(now=now)['compacted_rows'], 0)
+    
+    def test_history_compaction_in_chunks(self):
+        """Compacting a few devices per transaction gives the same intervals"""
+        now = datetime(2024, 3, 20, 12, 0, 0)
+        start = datetime(2024, 3, 1, 22, 0, 0)
+        macs = [f"aa:bb:cc:dd:ee:{i:02x}" for i in range(7)]
+        rows = []
+        for n, mac in enumerate(macs):
+            rows += [(mac, f"192.168.1.{n}", f"device{n}", start + timedelta(hours=i), None) for i in range(4)]
+            rows.append((mac, f"192.168.2.{n}", f"device{n}", start + timedelta(hours=5), None))
+            rows.append((mac, f"192.168.3.{n}", f"device{n}", datetime(2024, 3, 19), None))
+        self._insert_history(rows)
+        
+        stats = self.db.compact_history(now=now, chunk_size=3)
+        self.assertEqual(stats['compacted_rows'], 5 * len(macs))
+        # Two pieces of the first IP around midnight, then the second IP for 17 days
+        self.assertEqual(stats['intervals'], 19 * len(macs))
+        for n, mac in enumerate(macs):
+            intervals = self.db.get_device_intervals(mac, datetime(2024, 3, 1), now)
+            self.assertEqual([i['ip_address'] for i in intervals], [f"192.168.1.{n}", f"192.168.2.{n}"])
+            self.assertEqual(intervals[-1]['end_time'], datetime(2024, 3, 19))
+        
+        self.assertEqual(self.db.compact_history(now=now, chunk_size=3)['compacted_rows'], 0)
+    
+    def test_history_compaction_keeps_renewed_device(self):
+        """A device that kept renewing its lease keeps its current state raw"""
+        mac = "aa:bb:cc:dd:ee:ff"
+        now = datetime(2024, 3, 31, 12, 0, 0)
+        first_seen = now - timedelta(days=30)
+        self._insert_history([(mac, "10.0.0.5", "device1", first_seen, first_seen + timedelta(hours=12))])
+        self.db.save_device(Device(
+            mac_address=mac, ip_address="10.0.0.5", hostname="device1",
+            first_seen=first_seen, last_seen=now, lease_expires=now + timedelta(hours=12)
+        ))
+        
+        self.assertEqual(self.db.compact_history(now=now)['compacted_rows'], 0)
+        with self.db.batch() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM device_history").fetchone()[0], 1)
+        
+        # Once the renewed lease has lapsed the interval ends at its real expiry
+        lapsed = now + timedelta(hours=12)
+        self.db.touch_device(mac, now, lapsed)
+        self.db.compact_history(now=lapsed + timedelta(days=8))
+        intervals = self.db.get_device_intervals(mac, first_seen, lapsed + timedelta(days=1))
+        self.assertEqual((intervals[0]['start_time'], intervals[-1]['end_time']), (first_seen, lapsed))
+    
+    def test_history_partition_retention(self):
+        """Partitions older than interval_days are dropped"""
+        mac = "aa:bb:cc:dd:ee:ff"
+        self._insert_history([
+            (mac, "192.168.1.100", "device1", datetime(2024, 1, 1, 10), None),
+            (mac, "192.168.1.101", "device1", datetime(2024, 1, 1, 11), None),
+        ])
+        
+        self.db.retention = HistoryRetention(raw_days=7, interval_days=30)
+        self.assertEqual(self.db.compact_history(now=datetime(2024, 1, 20))['intervals'], 1)
+        stats = self.db.compact_history(now=datetime(2024, 3, 1))
+        self.assertEqual(stats['dropped_partitions'], 1)
+
 class TestDHCPLeaseParser(unittest.TestCase):
     """Test DHCP lease parsing"""
     
@@ -194,6 +415,174 @@ class TestDHCPLeaseParser(unittest.TestCase):
         self.assertEqual(ip, "192.168.1.102")
         self.assertEqual(hostname, "")  # Should be empty, not "*"
 
+class TestLeaseStateEngine(unittest.TestCase):
+    """Test incremental lease change detection"""
+    
+    def setUp(self):
+        self.engine = LeaseStateEngine()
+        self.now = datetime.now()
+        self.expires = self.now + timedelta(hours=1)
+    
+    def test_new_leases(self):
+        """First snapshot reports every lease as new"""
+        changes = self.engine.apply([
+            ("aa:bb:cc:dd:ee:ff", "192.168.1.100", "device1", self.expires),
+            ("11:22:33:44:55:66", "192.168.1.101", "device2", self.expires),
+        ], now=self.now)
+        
+        self.assertEqual(len(changes.new), 2)
+        self.assertEqual(changes.changed, [])
+        self.assertEqual(changes.expired, [])
+    
+    def test_unchanged_snapshot_is_empty(self):
+        """Re-applying identical leases produces no changes"""
+        leases = [("aa:bb:cc:dd:ee:ff", "192.168.1.100", "device1", self.expires)]
+        self.engine.apply(leases, now=self.now)
+        
+        changes = self.engine.apply(leases, now=self.now)
+        self.assertTrue(changes.is_empty())
+    
+    def test_ip_hostname_renew_and_expire(self):
+        """Each kind of transition lands in its own bucket"""
+        self.engine.apply([
+            ("aa:bb:cc:dd:ee:ff", "192.168.1.100", "device1", self.expires),
+            ("11:22:33:44:55:66", "192.168.1.101", "device2", self.expires),
+            ("ff:ee:dd:cc:bb:aa", "192.168.1.102", "device3", self.expires),
+        ], now=self.now)
+        
+        later = self.expires + timedelta(hours=1)
+        changes = self.engine.apply([
+            ("aa:bb:cc:dd:ee:ff", "192.168.1.110", "device1-new", self.expires),
+            ("11:22:33:44:55:66", "192.168.1.101", "device2", later),
+        ], now=self.now)
+        
+        self.assertEqual([l[0] for l in changes.ip_changed], ["aa:bb:cc:dd:ee:ff"])
+        self.assertEqual([l[0] for l in changes.hostname_changed], ["aa:bb:cc:dd:ee:ff"])
+        self.assertEqual(len(changes.changed), 1)
+        self.assertEqual([l[0] for l in changes.renewed], ["11:22:33:44:55:66"])
+        self.assertEqual(changes.expired, ["ff:ee:dd:cc:bb:aa"])
+    
+    def test_expire_without_file_change(self):
+        """Leases past their end time expire even if the file is untouched"""
+        self.engine.apply(
+            [("aa:bb:cc:dd:ee:ff", "192.168.1.100", "device1", self.expires)],
+            now=self.now
+        )
+        
+        self.assertTrue(self.engine.expire(self.now).is_empty())
+        changes = self.engine.expire(self.expires + timedelta(seconds=1))
+        self.assertEqual(changes.expired, ["aa:bb:cc:dd:ee:ff"])
+    
+    def test_prime_from_database(self):
+        """Devices already stored are not reported as new after a restart"""
+        self.engine.prime([Device(
+            mac_address="aa:bb:cc:dd:ee:ff",
+            ip_address="192.168.1.100",
+            hostname="device1",
+            first_seen=self.now,
+            last_seen=self.now,
+            lease_expires=self.expires
+        ), Device(
+            mac_address="11:22:33:44:55:66",
+            ip_address="192.168.1.101",
+            hostname="device2",
+            first_seen=self.now,
+            last_seen=self.now,
+            lease_expires=None
+        )], self.now)
+        
+        # A device stored without an expiry holds an infinite lease
+        changes = self.engine.apply(
+            [("aa:bb:cc:dd:ee:ff", "192.168.1.100", "device1", self.expires),
+             ("11:22:33:44:55:66", "192.168.1.101", "device2", None)],
+            now=self.now
+        )
+        self.assertTrue(changes.is_empty())
+
+    def test_return_after_expiry_is_new(self):
+        """A lease that comes back after expiring is a transition, not a renewal"""
+        lease = ("aa:bb:cc:dd:ee:ff", "192.168.1.100", "device1", self.expires)
+        self.engine.apply([lease], now=self.now)
+        self.assertEqual(self.engine.apply([], now=self.now).expired, ["aa:bb:cc:dd:ee:ff"])
+        
+        changes = self.engine.apply([lease], now=self.now)
+        self.assertEqual(changes.new, [lease])
+        self.assertEqual(changes.renewed, [])
+    
+    def test_missing_lease_file_keeps_state(self):
+        """An unreadable lease file does not expire every active lease"""
+        temp_dir = tempfile.mkdtemp()
+        lease_file = os.path.join(temp_dir, 'dnsmasq.leases')
+        with open(lease_file, 'w') as f:
+            f.write(f"{int(self.expires.timestamp())} aa:bb:cc:dd:ee:ff 192.168.1.100 device1 *\n")
+        
+        follower = LeaseFollower(lease_file, watch=False)
+        seen = []
+        follower.add_lease_listener(lambda changes, state: seen.append(changes))
+        try:
+            follower.poll()
+            os.unlink(lease_file)
+            follower.poll()
+        finally:
+            os.rmdir(temp_dir)
+        
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(follower.lease_state.active, {"aa:bb:cc:dd:ee:ff"})
+
+class TestLeaseFileWatcher(unittest.TestCase):
+    """Test event-driven lease file watching"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lease_file = os.path.join(self.temp_dir, 'dnsmasq.leases')
+        with open(self.lease_file, 'w') as f:
+            f.write("1625097600 aa:bb:cc:dd:ee:ff 192.168.1.100 device1 *\n")
+    
+    def tearDown(self):
+        for name in os.listdir(self.temp_dir):
+            os.unlink(os.path.join(self.temp_dir, name))
+        os.rmdir(self.temp_dir)
+    
+    def _rewrite_later(self):
+        """Mimic dnsmasq: write a temp file and rename it over the lease file"""
+        time.sleep(0.1)
+        temp_path = self.lease_file + '.new'
+        with open(temp_path, 'w') as f:
+            f.write("1625097700 11:22:33:44:55:66 192.168.1.101 device2 *\n")
+        os.rename(temp_path, self.lease_file)
+    
+    def _check_watcher(self, use_inotify):
+        watcher = LeaseFileWatcher(self.lease_file, use_inotify=use_inotify,
+                                   fallback_interval=0.1)
+        try:
+            self.assertFalse(watcher.wait(timeout=0.2))
+            
+            writer = threading.Thread(target=self._rewrite_later)
+            writer.start()
+            self.assertTrue(watcher.wait(timeout=5))
+            writer.join()
+        finally:
+            watcher.close()
+    
+    def test_inotify_detects_rename(self):
+        """Rename over the lease file wakes the watcher"""
+        self._check_watcher(use_inotify=True)
+    
+    def test_polling_fallback(self):
+        """Stat polling fallback detects the same change"""
+        self._check_watcher(use_inotify=False)
+    
+    def test_stop_wakes_waiter(self):
+        """stop() interrupts a blocked wait()"""
+        watcher = LeaseFileWatcher(self.lease_file)
+        try:
+            threading.Timer(0.1, watcher.stop).start()
+            start = time.monotonic()
+            self.assertFalse(watcher.wait(timeout=5))
+            self.assertLess(time.monotonic() - start, 2)
+        finally:
+            watcher.close()
+
 def create_sample_dhcp_leases():
     """Create sample DHCP lease file for demonstration"""
     lease_content = f"""
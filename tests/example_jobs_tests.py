@@ -15,7 +15,7 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
-from services.scheduler import (
+from services.lnmt_scheduler import (
     LNMTScheduler, JobConfig, JobPriority, JobStatus, JobRegistry
 )
 
@@ -16,14 +16,15 @@ import sys
 import time
 import json
 import subprocess
+import tempfile
 from datetime import datetime, timedelta
 
-# Add current directory to path for imports
-sys.path.insert(0, os.path.dirname(__file__))
+# Add the repository root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     from services.health_monitor import HealthMonitor, AlertLevel, ServiceStatus
-    from cli.healthctl import HealthCLI
+    from cli.healthctl_cli import HealthCLI
 except ImportError as e:
     print(f"Import error: {e}")
     print("Make sure the health_monitor and healthctl modules are in the correct locations.")
@@ -34,7 +35,8 @@ class HealthMonitorExamples:
     """Example usage patterns for LNMT Health Monitor"""
     
     def __init__(self):
-        self.monitor = HealthMonitor()
+        # Keep example and test alerts out of the real alert database
+        self.monitor = HealthMonitor(alert_db=os.path.join(tempfile.mkdtemp(), 'alerts.db'))
         self.cli = HealthCLI()
     
     def example_basic_health_check(self):
@@ -373,7 +375,8 @@ class HealthMonitorTests:
     """Basic tests for the health monitoring system"""
     
     def __init__(self):
-        self.monitor = HealthMonitor()
+        # Keep example and test alerts out of the real alert database
+        self.monitor = HealthMonitor(alert_db=os.path.join(tempfile.mkdtemp(), 'alerts.db'))
         self.test_results = []
     
     def test_system_status(self):
@@ -11,13 +11,16 @@ import sys
 import os
 import sqlite3
 import json
+import math
+import tempfile
+from collections import defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
 
 # Add parent directory to import path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.report_engine import ReportEngine, DNSClassifier, SessionData
+from services.report_engine import ReportEngine, ReportCache, DNSClassifier, SessionData
 
 
 def create_test_database(db_path: str = "test_network.db"):
@@ -226,6 +229,270 @@ def test_dns_classifier():
         print(f"{hostname:35} -> {app:15} ({status})")
 
 
+def test_classify_batch():
+    """Batch classification agrees with per-hostname classification."""
+    classifier = DNSClassifier()
+    
+    hostnames = [
+        "www.youtube.com",
+        "WWW.YOUTUBE.COM ",
+        "swdownload.apple.com",
+        "vortex-telemetry.data.microsoft.com",
+        "steamcontent.com",
+        "unknown-domain.com",
+        "",
+        None,
+    ]
+    
+    results = classifier.classify_batch(hostnames)
+    assert results == [classifier.classify_hostname(h) for h in hostnames]
+    assert results == ['YouTube', 'YouTube', None, None, 'Gaming', 'Other', 'Unknown', 'Unknown']
+
+
+def test_iter_sessions():
+    """Streamed sessions produce the same statistics as the materialized list."""
+    db_path = "test_network.db"
+    if not os.path.exists(db_path):
+        create_test_database(db_path)
+    
+    with ReportEngine(db_path) as engine:
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=24)
+        
+        sessions = engine.get_session_data(start_time, end_time)
+        streamed = list(engine.iter_sessions(start_time, end_time, batch_size=7))
+        
+        assert [s.session_id for s in streamed] == [s.session_id for s in sessions]
+        assert streamed[0].timestamp == sessions[0].timestamp
+        
+        expected = engine.calculate_usage_stats(sessions)
+        stats = engine.calculate_usage_stats(engine.iter_sessions(start_time, end_time))
+        assert stats.total_bytes == expected.total_bytes
+        assert stats.total_sessions == len(sessions)
+        assert stats.top_applications == expected.top_applications
+        assert engine.calculate_usage_stats(iter(())).total_sessions == 0
+
+
+def per_query_reports(engine, start_time, end_time):
+    """Device and VLAN totals the way the per-query report implementation computed them."""
+    window = (start_time.isoformat(), end_time.isoformat())
+    devices = []
+    for row in engine._execute_query("""
+        SELECT d.mac_address, d.vlan_id, MIN(s.timestamp) as first_seen, MAX(s.timestamp) as last_seen,
+               COUNT(s.session_id) as session_count, SUM(s.bytes_sent + s.bytes_received) as total_bandwidth
+        FROM devices d
+        LEFT JOIN sessions s ON d.ip_address = s.src_ip
+        WHERE s.timestamp BETWEEN ? AND ?
+        GROUP BY d.mac_address, d.device_name, d.vlan_id
+    """, window):
+        app_usage = defaultdict(int)
+        for session in engine.get_session_data(start_time, end_time, device_mac=row['mac_address']):
+            app_name = engine.classifier.classify_hostname(session.hostname)
+            if app_name:
+                app_usage[app_name] += session.bytes_sent + session.bytes_received
+        devices.append((row['mac_address'], row['vlan_id'], row['total_bandwidth'], row['session_count'],
+                        datetime.fromisoformat(row['first_seen']), datetime.fromisoformat(row['last_seen']),
+                        dict(sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:5])))
+    
+    vlans = []
+    for row in engine._execute_query("""
+        SELECT COALESCE(d.vlan_id, 0) as vlan_id, COUNT(DISTINCT d.mac_address) as device_count,
+               COUNT(s.session_id) as session_count, SUM(s.bytes_sent + s.bytes_received) as total_bandwidth
+        FROM sessions s
+        LEFT JOIN devices d ON s.src_ip = d.ip_address
+        WHERE s.timestamp BETWEEN ? AND ?
+        GROUP BY d.vlan_id
+    """, window):
+        top_devices = [(r['mac_address'], r['bandwidth']) for r in engine._execute_query("""
+            SELECT d.mac_address, SUM(s.bytes_sent + s.bytes_received) as bandwidth
+            FROM devices d
+            JOIN sessions s ON d.ip_address = s.src_ip
+            WHERE d.vlan_id = ? AND s.timestamp BETWEEN ? AND ?
+            GROUP BY d.mac_address
+            ORDER BY bandwidth DESC
+            LIMIT 5
+        """, (row['vlan_id'],) + window)]
+        vlans.append((row['vlan_id'], row['total_bandwidth'], row['device_count'], row['session_count'],
+                      top_devices))
+    
+    return sorted(devices), sorted(vlans)
+
+
+def test_single_pass_matches_per_query_reports():
+    """The single-pass aggregation reproduces the per-query report totals, raw and from rollups."""
+    # Rollups are written below, so the test gets a database of its own
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "test_network.db")
+        create_test_database(db_path)
+        
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=24)
+        historical_start = start_time - timedelta(hours=24)
+        
+        with ReportEngine(db_path) as engine:
+            expected_devices, expected_vlans = per_query_reports(engine, start_time, end_time)
+            sessions = engine.get_session_data(start_time, end_time)
+            expected_stats = engine.calculate_usage_stats(sessions)
+            expected_previous = engine.calculate_usage_stats(
+                engine.get_session_data(historical_start, start_time))
+            assert expected_devices and expected_vlans and sessions
+            
+            for rollups in (False, True):
+                if rollups:
+                    assert engine.update_rollups() > 0
+                current, previous = engine.aggregate_sessions(historical_start, end_time, split_time=start_time)
+                
+                devices = sorted((d.device_mac, d.vlan_id, d.total_bandwidth, d.session_count,
+                                  d.first_seen, d.last_seen, d.top_apps) for d in current.device_reports())
+                vlans = sorted((v.vlan_id, v.total_bandwidth, v.device_count, v.session_count, v.top_devices)
+                               for v in current.vlan_reports())
+                assert devices == expected_devices
+                assert vlans == expected_vlans
+                
+                for stats, expected in ((current.usage_stats(), expected_stats),
+                                        (previous.usage_stats(), expected_previous)):
+                    assert math.isclose(stats.avg_session_duration, expected.avg_session_duration)
+                    stats.avg_session_duration = expected.avg_session_duration
+                    assert stats == expected
+                
+                report = engine._build_comprehensive_report(24, True, end_time)
+                assert report['report_metadata']['total_sessions_analyzed'] == len(sessions)
+
+
+def test_duplicate_dns_records_count_once():
+    """Sessions to an IP with several DNS records are counted once."""
+    # DNS records are inserted below, so the test gets a database of its own
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "test_network.db")
+        create_test_database(db_path)
+
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=24)
+
+        with ReportEngine(db_path) as engine:
+            expected_devices, expected_vlans = per_query_reports(engine, start_time, end_time)
+            engine.conn.executemany(
+                "INSERT INTO dns_records (hostname, ip_address, vlan_id, timestamp) VALUES (?, ?, ?, ?)",
+                [("youtube.com", "142.250.191.78", 10, "2025-07-01 10:40:00"),
+                 ("m.youtube.com", "142.250.191.78", 10, "2025-07-01 10:50:00")])
+            engine.conn.commit()
+
+            for rollups in (False, True):
+                if rollups:
+                    assert engine.update_rollups() > 0
+                current, _ = engine.aggregate_sessions(start_time, end_time)
+                devices = sorted((d.device_mac, d.vlan_id, d.total_bandwidth, d.session_count)
+                                 for d in current.device_reports())
+                vlans = sorted((v.vlan_id, v.total_bandwidth, v.session_count)
+                               for v in current.vlan_reports())
+                assert devices == [d[:4] for d in expected_devices]
+                assert vlans == [(v[0], v[1], v[3]) for v in expected_vlans]
+
+
+def test_usage_rollups():
+    """Reports answered from rollups match reports built from raw sessions."""
+    # Sessions are inserted below, so the test gets a database of its own
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "test_network.db")
+        create_test_database(db_path)
+        
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=30)
+        split_time = end_time - timedelta(hours=15)
+        
+        def snapshot(engine):
+            current, previous = engine.aggregate_sessions(start_time, end_time, split_time)
+            devices = sorted((d.device_mac, d.total_bandwidth, d.session_count, d.first_seen, d.last_seen)
+                             for d in current.device_reports())
+            vlans = sorted((v.vlan_id, v.total_bandwidth, v.session_count, v.top_applications)
+                           for v in current.vlan_reports())
+            stats = [current.usage_stats(), previous.usage_stats()]
+            for st in stats:
+                st.avg_session_duration = round(st.avg_session_duration, 6)
+            return stats, devices, vlans
+        
+        with ReportEngine(db_path) as engine:
+            raw = snapshot(engine)
+            
+            assert engine.update_rollups(chunk_size=50) > 0
+            assert engine.update_rollups() == 0
+            assert snapshot(engine) == raw
+            
+            # Sessions added after the last update are read raw until folded
+            engine.conn.execute("""
+                INSERT INTO sessions VALUES ('late-1', ?, '192.168.10.100', '8.8.8.8',
+                                             1234, 443, 'TCP', 1000, 2000, 5.0)
+            """, ((end_time - timedelta(hours=20)).isoformat(),))
+            engine.conn.commit()
+            
+            pending = snapshot(engine)
+            assert pending[0][1].total_bytes == raw[0][1].total_bytes + 3000
+            assert engine.update_rollups() == 1
+            assert snapshot(engine) == pending
+
+
+def test_report_cache():
+    """Cached reports are reused until session data changes."""
+    # Sessions are inserted below, so the test gets a database of its own
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "test_network.db")
+        create_test_database(db_path)
+        
+        cache = ReportCache(max_entries=4, ttl=60)
+        with ReportEngine(db_path, cache=cache) as engine:
+            first = engine.generate_comprehensive_report(period_hours=24)
+            second = engine.generate_comprehensive_report(period_hours=24)
+            assert second == first and second is not first
+            assert (cache.hits, cache.misses) == (1, 1)
+            
+            engine.conn.execute("""
+                INSERT INTO sessions VALUES ('cache-1', ?, '192.168.10.100', '8.8.8.8',
+                                             1234, 443, 'TCP', 1000, 2000, 5.0)
+            """, (datetime.now().isoformat(),))
+            engine.conn.commit()
+            
+            third = engine.generate_comprehensive_report(period_hours=24)
+            assert cache.misses == 2
+            assert third['overall_stats']['total_sessions'] == first['overall_stats']['total_sessions'] + 1
+            
+            # Edits and deletions invalidate as well as new rows
+            engine.conn.execute("UPDATE sessions SET bytes_sent = bytes_sent + 500 WHERE session_id = 'cache-1'")
+            engine.conn.commit()
+            fourth = engine.generate_comprehensive_report(period_hours=24)
+            assert fourth['overall_stats']['total_bytes'] == third['overall_stats']['total_bytes'] + 500
+            engine.conn.execute("DELETE FROM sessions WHERE session_id = 'cache-1'")
+            engine.conn.commit()
+            fifth = engine.generate_comprehensive_report(period_hours=24)
+            assert fifth['overall_stats'] == first['overall_stats']
+            assert cache.misses == 4
+            
+            # Other windows and report types are cached separately
+            engine.generate_comprehensive_report(period_hours=6)
+            assert cache.misses == 5
+        
+        # A cache file holds JSON and restores report objects for another process
+        cache_path = os.path.join(tmp_dir, "report_cache.db")
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=24)
+        with ReportEngine(db_path, cache=ReportCache(path=cache_path)) as engine:
+            devices = engine.generate_device_reports(start_time, end_time)
+        reloaded = ReportCache(path=cache_path)
+        with ReportEngine(db_path, cache=reloaded) as engine:
+            assert engine.generate_device_reports(start_time, end_time) == devices
+        assert reloaded.hits == 1
+        with sqlite3.connect(cache_path) as conn:
+            payload = conn.execute("SELECT payload FROM report_cache").fetchone()[0]
+        conn.close()
+        assert json.loads(payload)[0]['__dataclass__'] == 'DeviceReport'
+        
+        # Without a cache the period ends now, not at the next whole minute
+        with ReportEngine(db_path) as engine:
+            before = datetime.now()
+            metadata = engine.generate_comprehensive_report(period_hours=24)['report_metadata']
+            after = datetime.now()
+        assert before <= datetime.fromisoformat(metadata['period_end']) <= after
+
+
 def test_report_generation():
     """Test the report generation functionality."""
     print("\n" + "="*60)
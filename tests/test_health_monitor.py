@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Tests for the LNMT health monitor: process snapshots, background resource
+sampling, incremental config hashing and the persistent alert store.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import psutil
+
+from services.health_monitor import (
+    HealthMonitor, AlertLevel, ProcessSnapshot, ResourceSampler, ResourceSample, Alert, AlertStore
+)
+
+
+class HealthMonitorTestCase(unittest.TestCase):
+    """Base class giving each test a monitor with a private alert database"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.monitor = HealthMonitor(
+            log_file=os.path.join(self.temp_dir, 'health.log'),
+            alert_db=os.path.join(self.temp_dir, 'alerts.db')
+        )
+
+    def tearDown(self):
+        self.monitor.sampler.stop()
+        self.monitor.alert_store.close()
+        shutil.rmtree(self.temp_dir)
+
+
+class TestProcessSnapshot(HealthMonitorTestCase):
+    """Test the single-pass process table snapshot"""
+
+    def test_matches_psutil(self):
+        snapshot = ProcessSnapshot.capture()
+        me = snapshot.by_pid.get(os.getpid())
+        self.assertIsNotNone(me, "Own process missing from snapshot")
+
+        proc = psutil.Process()
+        self.assertEqual(me.name, proc.name()[:ProcessSnapshot.COMM_LENGTH])
+        self.assertLess(abs(me.create_time - proc.create_time()), 1)
+        self.assertGreater(me.rss_bytes, 0)
+        self.assertLessEqual(snapshot.find(me.name).pid, me.pid, "find() should return the lowest pid")
+
+    def test_cpu_measured_against_previous_snapshot(self):
+        snapshot = ProcessSnapshot.capture()
+        self.assertEqual(snapshot.cpu_percent(snapshot.by_pid[os.getpid()]), 0.0,
+                         "First snapshot has no CPU baseline")
+        deadline = time.time() + 0.2
+        while time.time() < deadline:
+            pass
+        following = ProcessSnapshot.capture(previous=snapshot)
+        self.assertGreater(following.cpu_percent(following.by_pid[os.getpid()]), 0,
+                           "Busy loop not measured")
+
+    def test_status_check_walks_process_table_once(self):
+        captures = []
+        original_capture = ProcessSnapshot.capture
+        ProcessSnapshot.capture = classmethod(
+            lambda cls, *args, **kwargs: captures.append(1) or original_capture(*args, **kwargs)
+        )
+        try:
+            self.monitor.get_system_status()
+        finally:
+            ProcessSnapshot.capture = original_capture
+        self.assertEqual(len(captures), 1, f"Process table walked {len(captures)} times")
+
+
+class TestResourceSampler(HealthMonitorTestCase):
+    """Test background resource sampling and window statistics"""
+
+    def test_background_sampling(self):
+        sampler = ResourceSampler(interval=0.05, window=1)
+        sampler.start()
+        time.sleep(0.5)
+        sampler.stop()
+
+        self.assertGreaterEqual(len(sampler.samples), 4)
+        self.assertLessEqual(len(sampler.samples), sampler.samples.maxlen, "Ring buffer overflowed")
+        self.assertTrue(0 <= sampler.latest().cpu_percent <= 100)
+
+        trends = sampler.aggregates()
+        self.assertEqual(set(trends), {'1m', '5m', '15m'})
+        self.assertEqual(trends['1m']['samples'], len(sampler.samples))
+
+    def test_percentiles_interpolate(self):
+        sampler = ResourceSampler(interval=60)
+        now = time.time()
+        for i in range(11):
+            sampler.samples.append(ResourceSample(now, i * 10.0, 50.0, 50.0, (1.0, 1.0, 1.0), 0.0, 0.0))
+        self.assertEqual(sampler.percentile('cpu_percent', 50), 50.0)
+        self.assertAlmostEqual(sampler.percentile('cpu_percent', 95), 95.0)
+        self.assertIsNone(sampler.percentile('cpu_percent', 50, seconds=-1), "Empty window should be None")
+
+    def test_cold_read_does_not_hold_lock(self):
+        cold = ResourceSampler(interval=60)
+        cold.MIN_CPU_INTERVAL = 0.5
+        cold._last_counters = (time.time() - 3600,) + cold._last_counters[1:]
+        reader = threading.Thread(target=cold.latest)
+        reader.start()
+        time.sleep(0.05)
+        started = time.time()
+        cold.start()
+        try:
+            self.assertLess(time.time() - started, 0.2, "start() waited for a cold latest()")
+            self.assertGreaterEqual(cold._last_counters[0], started, "start() should reset the CPU baseline")
+        finally:
+            reader.join()
+            cold.stop()
+
+    def test_resource_reads_do_not_block(self):
+        self.monitor.get_system_resources()
+        started = time.time()
+        self.monitor.get_system_resources()
+        self.assertLess(time.time() - started, 0.5)
+
+
+class TestConfigHashing(HealthMonitorTestCase):
+    """Test stat-first incremental config hashing"""
+
+    def setUp(self):
+        super().setUp()
+        self.config_dir = os.path.join(self.temp_dir, 'config')
+        os.mkdir(self.config_dir)
+        for name in ['rules', 'policy', 'zones']:
+            with open(os.path.join(self.config_dir, name), 'w') as f:
+                f.write(f"# {name}\n")
+        with open(os.path.join(self.config_dir, 'big.conf'), 'wb') as f:
+            f.write(os.urandom(3 * self.monitor.HASH_CHUNK_SIZE + 7))
+
+        self.hashed = []
+        original_digest = self.monitor._digest_file
+        self.monitor._digest_file = lambda path: self.hashed.append(path) or original_digest(path)
+
+    def _full_hash(self):
+        file_hashes = []
+        for root, dirs, files in os.walk(self.config_dir):
+            for name in sorted(files):
+                with open(os.path.join(root, name), 'rb') as f:
+                    file_hashes.append(hashlib.sha256(f.read()).hexdigest())
+        return hashlib.sha256(''.join(file_hashes).encode()).hexdigest()
+
+    def test_matches_full_hash(self):
+        self.assertEqual(self.monitor._hash_file(self.config_dir), self._full_hash())
+        self.assertEqual(len(self.hashed), 4)
+
+    def test_unchanged_files_not_reread(self):
+        expected = self.monitor._hash_file(self.config_dir)
+        self.hashed.clear()
+        self.assertEqual(self.monitor._hash_file(self.config_dir), expected)
+        self.assertEqual(self.hashed, [], "Unchanged files were rehashed")
+        self.assertEqual(self.monitor.config_changes[self.config_dir], {}, "Spurious changes reported")
+
+    def test_changes_reported_per_file(self):
+        expected = self.monitor._hash_file(self.config_dir)
+        rules = os.path.join(self.config_dir, 'rules')
+        masq = os.path.join(self.config_dir, 'masq')
+        with open(rules, 'a') as f:
+            f.write("ACCEPT all all\n")
+        os.remove(os.path.join(self.config_dir, 'zones'))
+        with open(masq, 'w') as f:
+            f.write("eth0 10.0.0.0/8\n")
+
+        self.hashed.clear()
+        self.assertNotEqual(self.monitor._hash_file(self.config_dir), expected, "Edit not detected")
+        self.assertEqual(sorted(self.hashed), sorted([rules, masq]))
+        self.assertEqual(self.monitor.config_changes[self.config_dir], {
+            rules: 'modified',
+            os.path.join(self.config_dir, 'zones'): 'removed',
+            masq: 'added'
+        })
+
+
+class TestAlertStore(unittest.TestCase):
+    """Test persistent alert storage with coalescing"""
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.store_dir, 'alerts.db')
+        self.start = datetime(2025, 1, 1, 12, 0, 0)
+        self.later = self.start + timedelta(seconds=AlertStore.COALESCE_WINDOW + 300)
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir)
+
+    def _fill(self, store):
+        for i in range(5):
+            stored = store.add(Alert((self.start + timedelta(minutes=i)).isoformat(), AlertLevel.CRITICAL,
+                                     'dnsmasq', 'Service dnsmasq is not running', {'pid': None}))
+        store.add(Alert(self.later.isoformat(), AlertLevel.CRITICAL, 'dnsmasq',
+                        'Service dnsmasq is not running', {}))
+        for i in range(200):
+            level = AlertLevel.WARNING if i % 2 else AlertLevel.INFO
+            store.add(Alert((self.later + timedelta(seconds=i + 1)).isoformat(), level,
+                            'system', f"Alert {i}", {}))
+        return stored
+
+    def test_repeats_coalesce_within_window(self):
+        store = AlertStore(self.db_path, max_alerts=150)
+        for i in range(5):
+            stored = store.add(Alert((self.start + timedelta(minutes=i)).isoformat(), AlertLevel.CRITICAL,
+                                     'dnsmasq', 'Service dnsmasq is not running', {'pid': None}))
+        self.assertEqual(stored.count, 5)
+        self.assertEqual(datetime.fromisoformat(stored.first_seen).timestamp(), self.start.timestamp(),
+                         "first_seen should not move")
+        store.add(Alert(self.later.isoformat(), AlertLevel.CRITICAL, 'dnsmasq',
+                        'Service dnsmasq is not running', {}))
+        self.assertEqual(len(store), 2, "Repeat after the window should start a new alert")
+        store.close()
+
+    def test_trim_and_persistence(self):
+        store = AlertStore(self.db_path, max_alerts=150)
+        self._fill(store)
+        self.assertLessEqual(len(store), 150 + AlertStore.TRIM_EVERY, "Alert store not trimmed")
+        store.close()
+
+        store = AlertStore(self.db_path, max_alerts=150)
+        warnings = store.query(since=(self.later + timedelta(seconds=150)).isoformat(),
+                               level=AlertLevel.WARNING)
+        self.assertEqual(len(warnings), 26)
+        self.assertEqual(warnings[0].message, "Alert 199", "Alerts should be newest first")
+        self.assertTrue(all(a.level == AlertLevel.WARNING for a in warnings))
+
+        self.assertGreater(store.clear(before=(self.later + timedelta(seconds=101)).isoformat()), 0)
+        self.assertFalse(store.query(until=(self.later + timedelta(seconds=100)).isoformat()))
+        store.close()
+
+    def test_level_query_uses_index(self):
+        store = AlertStore(self.db_path, max_alerts=150)
+        self._fill(store)
+        store.close()
+        with sqlite3.connect(self.db_path) as conn:
+            plan = " ".join(row[-1] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM alerts WHERE level = ? AND timestamp >= ? "
+                "ORDER BY timestamp DESC", ('warning', self.later.timestamp())))
+        conn.close()
+        self.assertIn("idx_alerts_level", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_offset_timestamp_coalesces(self):
+        store = AlertStore(self.db_path)
+        self._fill(store)
+        latest = store.query(limit=1)[0]
+        shifted = datetime.fromisoformat(latest.timestamp).astimezone(timezone(timedelta(hours=-7)))
+        again = store.add(Alert(shifted.isoformat(), latest.level, latest.service, latest.message, {}))
+        self.assertEqual(again.count, 2, "Offset timestamp not coalesced")
+        store.close()
+
+    def test_unopenable_database_falls_back_to_memory(self):
+        unopenable = os.path.join(self.store_dir, 'not_a_file.db')
+        os.mkdir(unopenable)
+        store = AlertStore(unopenable)
+        self.assertEqual(store.db_path, ':memory:')
+        store.add(Alert(self.start.isoformat(), AlertLevel.INFO, 'system', 'Still works', {}))
+        self.assertEqual(len(store), 1, "Fallback store did not keep the alert")
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,788 @@
+#!/usr/bin/env python3
+"""
+LNMT Scheduler Test Suite
+Scheduler loop, executor modes, dispatch lanes, DAG runs, misfire handling,
+job history and the timer queue.
+"""
+
+import unittest
+import asyncio
+import tempfile
+import shutil
+import json
+import sys
+import time
+import threading
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.lnmt_scheduler import (
+    LNMTScheduler, JobConfig, JobPriority, JobStatus, JobRegistry, JobTimerQueue,
+    DagRun, JobResult
+)
+
+
+class TestSchedulerLoop(unittest.TestCase):
+    """Test interval schedules and the timer-driven scheduler loop"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_file = Path(self.test_dir) / "test_scheduler.db"
+        self.scheduler = LNMTScheduler(
+            config_file=str(Path(self.test_dir) / "test_config.json"),
+            db_path=str(self.db_file)
+        )
+    
+    def tearDown(self):
+        self.scheduler.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def test_interval_schedules(self):
+        """Test sub-minute and sub-second interval schedules"""
+        base = datetime(2025, 1, 1, 12, 0, 0)
+        job = JobConfig(id="fast_job", name="Fast Job", module="time",
+                        function="time", schedule="@every 250ms")
+        
+        self.assertEqual(self.scheduler.get_next_run_time(job, base),
+                         base + timedelta(milliseconds=250))
+        
+        job.schedule = "*/5 * * * *"
+        self.assertEqual(self.scheduler.get_next_run_time(job, base),
+                         base + timedelta(minutes=5))
+    
+    def test_scheduler_loop_fires_due_jobs(self):
+        """Test that the loop sleeps until jobs are due and reschedules them"""
+        self.scheduler.register_job(JobConfig(
+            id="fast_job", name="Fast Job", module="time", function="time",
+            schedule="@every 100ms", max_retries=0
+        ))
+        
+        async def run_briefly():
+            self.scheduler.running = True
+            loop_task = asyncio.create_task(self.scheduler.scheduler_loop())
+            await asyncio.sleep(0.25)
+            
+            # Jobs registered while running are picked up without a rescan
+            self.scheduler.register_job(JobConfig(
+                id="late_job", name="Late Job", module="time", function="time",
+                schedule="@every 50ms", max_retries=0
+            ))
+            self.assertIsNotNone(self.scheduler.get_job_status("late_job")['next_run'])
+            await asyncio.sleep(0.3)
+            
+            self.scheduler.running = False
+            self.scheduler._wake()
+            await asyncio.wait_for(loop_task, timeout=5)
+        
+        asyncio.run(run_briefly())
+        
+        with sqlite3.connect(str(self.db_file)) as conn:
+            counts = dict(conn.execute(
+                "SELECT job_id, COUNT(*) FROM job_history WHERE status = ? GROUP BY job_id",
+                (JobStatus.COMPLETED.value,)
+            ).fetchall())
+        
+        self.assertGreaterEqual(counts.get("fast_job", 0), 4)
+        self.assertGreaterEqual(counts.get("late_job", 0), 3)
+
+    def test_loop_picks_up_external_registry_changes(self):
+        """Test that jobs added, disabled and re-enabled by another process are rescheduled"""
+        self.scheduler.RESCAN_INTERVAL = 0.05
+        other = JobRegistry(str(self.db_file))
+        job = JobConfig(id="external_job", name="External Job", module="time",
+                        function="time", schedule="@every 50ms", max_retries=0)
+
+        def completed_runs():
+            self.scheduler.registry.flush_history()
+            with sqlite3.connect(str(self.db_file)) as conn:
+                return conn.execute(
+                    "SELECT COUNT(*) FROM job_history WHERE job_id = ? AND status = ?",
+                    ("external_job", JobStatus.COMPLETED.value)
+                ).fetchone()[0]
+
+        async def run_briefly():
+            self.scheduler.running = True
+            loop_task = asyncio.create_task(self.scheduler.scheduler_loop())
+            await asyncio.sleep(0.1)
+
+            # Started with no jobs; an external add is scheduled
+            other.register_job(job)
+            await asyncio.sleep(0.4)
+            self.assertGreaterEqual(completed_runs(), 3)
+
+            # An external disable drops it from the queue
+            job.enabled = False
+            other.register_job(job)
+            await asyncio.sleep(0.2)
+            self.assertIsNone(self.scheduler.timers.next_fire_time("external_job"))
+            disabled_runs = completed_runs()
+            await asyncio.sleep(0.2)
+            self.assertEqual(completed_runs(), disabled_runs)
+
+            # Re-enabling it externally puts it back
+            job.enabled = True
+            other.register_job(job)
+            await asyncio.sleep(0.4)
+            self.assertGreater(completed_runs(), disabled_runs)
+
+            self.scheduler.running = False
+            self.scheduler._wake()
+            await asyncio.wait_for(loop_task, timeout=5)
+
+        try:
+            asyncio.run(run_briefly())
+        finally:
+            other.close()
+
+    def test_only_job_edits_count_as_changes(self):
+        """Test that history writes don't make the registry look changed"""
+        registry = self.scheduler.registry
+        job = JobConfig(id="watched", name="Watched", module="time", function="time",
+                        schedule="*/5 * * * *")
+        registry.register_job(job)
+        self.assertTrue(registry.jobs_changed())
+        self.assertFalse(registry.jobs_changed())
+
+        registry.save_job_result(JobResult(job_id="watched", status=JobStatus.COMPLETED,
+                                           start_time=datetime.now(), end_time=datetime.now()))
+        registry.flush_history()
+        self.assertFalse(registry.jobs_changed())
+
+        other = JobRegistry(str(self.db_file))
+        try:
+            other.unregister_job("watched")
+        finally:
+            other.close()
+        self.assertTrue(registry.jobs_changed())
+
+    def test_stop_stops_dispatcher_before_pools(self):
+        """Test that stop() lets the dispatcher finish before shutting down the pools"""
+        self.scheduler.register_job(JobConfig(
+            id="slow_job", name="Slow Job", module="time", function="sleep",
+            schedule="@every 100ms", max_retries=0, args=[0.3]
+        ))
+        calls = []
+        dispatcher, executor = self.scheduler.dispatcher, self.scheduler.executor
+        dispatcher_stop, dispatcher_shutdown = dispatcher.stop, dispatcher.shutdown
+        executor_shutdown = executor.shutdown
+        
+        async def stop():
+            await dispatcher_stop()
+            calls.append("dispatcher.stop")
+        
+        dispatcher.stop = stop
+        dispatcher.shutdown = lambda: calls.append("dispatcher.shutdown") or dispatcher_shutdown()
+        executor.shutdown = lambda: calls.append("executor.shutdown") or executor_shutdown()
+        
+        runner = threading.Thread(target=self.scheduler.start)
+        runner.start()
+        deadline = time.time() + 5
+        while not dispatcher.is_active("slow_job") and time.time() < deadline:
+            time.sleep(0.01)
+        
+        self.scheduler.stop()
+        self.assertEqual(calls[0], "dispatcher.stop", "Pools shut down before the dispatcher stopped")
+        runner.join(timeout=5)
+        self.assertFalse(runner.is_alive())
+        
+        with sqlite3.connect(str(self.db_file)) as conn:
+            statuses = [row[0] for row in conn.execute(
+                "SELECT status FROM job_history WHERE job_id = ?", ("slow_job",)
+            )]
+        self.assertEqual(statuses, [JobStatus.COMPLETED.value])
+
+
+class TestExecutorModes(unittest.TestCase):
+    """Test thread, process and subprocess executor modes"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.config_file = Path(self.test_dir) / "test_config.json"
+        self.db_file = Path(self.test_dir) / "test_scheduler.db"
+        self.scheduler = LNMTScheduler(config_file=str(self.config_file), db_path=str(self.db_file))
+    
+    def tearDown(self):
+        self.scheduler.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def _register(self, job_id, executor, function="getpid", args=None, timeout=30):
+        self.scheduler.register_job(JobConfig(
+            id=job_id, name=job_id, module="os" if function == "getpid" else "time",
+            function=function, schedule="*/5 * * * *", max_retries=0,
+            timeout=timeout, args=args or [], executor=executor
+        ))
+    
+    def _run(self, job_id, executor, function="getpid", args=None, timeout=30):
+        self._register(job_id, executor, function, args, timeout)
+        return asyncio.run(self.scheduler.run_job_now(job_id))
+    
+    def test_process_and_subprocess_run_out_of_process(self):
+        """Test that process and subprocess jobs run in other interpreters"""
+        import os
+        for executor in ("thread", "process", "subprocess"):
+            result = self._run(f"{executor}_job", executor)
+            self.assertEqual(result.status, JobStatus.COMPLETED, result.error)
+            self.assertEqual(result.output == str(os.getpid()), executor == "thread")
+        
+        # The warm worker is reused between runs
+        pid = self._run("process_job_again", "process").output
+        self.assertEqual(self._run("process_job_third", "process").output, pid)
+    
+    def test_timeout_kills_worker(self):
+        """Test that a timed-out process or subprocess job is killed"""
+        for executor in ("process", "subprocess"):
+            started = time.time()
+            result = self._run(f"stuck_{executor}", executor, function="sleep", args=[30], timeout=1)
+            self.assertEqual(result.status, JobStatus.FAILED)
+            self.assertIn("timed out", result.error.lower())
+            self.assertLess(time.time() - started, 10)
+        
+        self.assertEqual(self._run("after_kill", "process").status, JobStatus.COMPLETED)
+    
+    def test_timeout_kills_only_its_own_worker(self):
+        """Test that a timed-out process job leaves other in-flight process jobs running"""
+        self._register("stuck", "process", function="sleep", args=[30], timeout=1)
+        self._register("slow", "process", function="sleep", args=[2])
+        
+        async def run_both():
+            return await asyncio.gather(self.scheduler.run_job_now("stuck"),
+                                        self.scheduler.run_job_now("slow"))
+        
+        stuck, slow = asyncio.run(run_both())
+        self.assertEqual(stuck.status, JobStatus.FAILED)
+        self.assertIn("timed out", stuck.error.lower())
+        self.assertEqual(slow.status, JobStatus.COMPLETED, slow.error)
+        self.assertEqual(slow.retry_count, 0)
+        
+        # Job errors come back from the worker without killing it
+        self._register("bad_args", "process", function="sleep", args=["soon"])
+        pid = self._run("pid", "process").output
+        result = asyncio.run(self.scheduler.run_job_now("bad_args"))
+        self.assertEqual(result.status, JobStatus.FAILED)
+        self.assertIn("TypeError", result.error)
+        self.assertEqual(self._run("pid_again", "process").output, pid)
+
+    def test_unpicklable_args_kill_worker(self):
+        """Test that a job whose arguments can't be sent to the worker doesn't leak it"""
+        import os
+        pid = int(self._run("pid", "process").output)
+        pool = self.scheduler.executor._get_process_pool()
+        with self.assertRaises(TypeError):
+            pool.run("time", "sleep", [threading.Lock()], {})
+
+        self.assertEqual(pool._idle, [])
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+        self.assertNotEqual(int(self._run("pid_again", "process").output), pid)
+
+    def test_executor_mode_persisted(self):
+        """Test that the executor mode survives the database and config file"""
+        self._run("persisted", "subprocess")
+        self.scheduler.registry.jobs.clear()
+        self.assertEqual(self.scheduler.registry.get_job("persisted").executor, "subprocess")
+        
+        self.scheduler.save_config()
+        with open(self.config_file) as f:
+            self.assertEqual(json.load(f)['jobs'][0]['executor'], "subprocess")
+        
+        with self.assertRaises(ValueError):
+            JobConfig(id="bad", name="bad", module="os", function="getpid",
+                      schedule="* * * * *", executor="fiber")
+
+
+class TestJobDispatcher(unittest.TestCase):
+    """Test concurrent dispatch in priority lanes"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_file = Path(self.test_dir) / "test_scheduler.db"
+        self.scheduler = LNMTScheduler(
+            config_file=str(Path(self.test_dir) / "test_config.json"),
+            db_path=str(self.db_file),
+            lane_limits={JobPriority.LOW: 1},
+            max_queue=1
+        )
+    
+    def tearDown(self):
+        self.scheduler.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def _sleep_job(self, job_id, seconds, priority=JobPriority.LOW, schedule="*/5 * * * *"):
+        return JobConfig(id=job_id, name=job_id, module="time", function="sleep",
+                         schedule=schedule, priority=priority, max_retries=0, args=[seconds])
+    
+    def test_backpressure_and_mutual_exclusion(self):
+        """Test that a full lane rejects work and a running job is not resubmitted"""
+        dispatcher = self.scheduler.dispatcher
+        
+        async def submit_jobs():
+            dispatcher.start()
+            self.assertTrue(dispatcher.submit(self._sleep_job("slow_a", 0.3)))
+            await asyncio.sleep(0.05)  # let the LOW worker pick it up
+            
+            self.assertFalse(dispatcher.submit(self._sleep_job("slow_a", 0.3)))
+            self.assertTrue(dispatcher.submit(self._sleep_job("slow_b", 0.1)))
+            self.assertFalse(dispatcher.submit(self._sleep_job("slow_c", 0.1)))
+            
+            # CRITICAL has its own lane and runs while LOW is saturated
+            self.assertTrue(dispatcher.submit(self._sleep_job("urgent", 0, JobPriority.CRITICAL)))
+            await asyncio.sleep(0.1)
+            
+            metrics = self.scheduler.get_queue_metrics()
+            self.assertEqual(metrics['LOW']['running'], 1)
+            self.assertEqual(metrics['LOW']['queued'], 1)
+            self.assertEqual(metrics['LOW']['rejected'], 1)
+            self.assertEqual(metrics['LOW']['overlapped'], 1)
+            self.assertEqual(metrics['CRITICAL']['completed'], 1)
+            
+            await asyncio.sleep(0.5)
+            await dispatcher.stop()
+        
+        asyncio.run(submit_jobs())
+        
+        metrics = self.scheduler.get_queue_metrics()
+        self.assertEqual(metrics['LOW']['completed'], 2)
+        self.assertEqual(metrics['LOW']['running'], 0)
+    
+    def test_resubmit_from_on_complete_keeps_one_instance(self):
+        """Test that a run queued by on_complete is not released by the run before it"""
+        dispatcher = self.scheduler.dispatcher
+        job = self._sleep_job("replayed", 0.2)
+        observed = {}
+        
+        def resubmit(job_config, result):
+            if 'replayed' not in observed:
+                observed['replayed'] = dispatcher.submit(job_config)
+        
+        dispatcher.on_complete = resubmit
+        
+        async def run_jobs():
+            dispatcher.start()
+            self.assertTrue(dispatcher.submit(job))
+            await asyncio.sleep(0.3)  # first run done, replay running
+            observed['active'] = dispatcher.is_active(job.id)
+            observed['duplicate'] = dispatcher.submit(job)
+            await asyncio.sleep(0.3)
+            await dispatcher.stop()
+        
+        asyncio.run(run_jobs())
+        
+        self.assertTrue(observed['replayed'])
+        self.assertTrue(observed['active'])
+        self.assertFalse(observed['duplicate'])
+        self.assertEqual(self.scheduler.get_queue_metrics()['LOW']['completed'], 2)
+    
+    def test_slow_job_does_not_delay_others(self):
+        """Test that scheduled jobs run concurrently without overlapping themselves"""
+        self.scheduler.register_job(self._sleep_job("slow_job", 0.4, schedule="@every 50ms"))
+        self.scheduler.register_job(JobConfig(
+            id="fast_job", name="Fast Job", module="time", function="time",
+            schedule="@every 100ms", priority=JobPriority.CRITICAL, max_retries=0
+        ))
+        
+        async def run_briefly():
+            self.scheduler.running = True
+            loop_task = asyncio.create_task(self.scheduler.scheduler_loop())
+            await asyncio.sleep(0.65)
+            self.scheduler.running = False
+            self.scheduler._wake()
+            await asyncio.wait_for(loop_task, timeout=5)
+        
+        asyncio.run(run_briefly())
+        
+        with sqlite3.connect(str(self.db_file)) as conn:
+            counts = dict(conn.execute(
+                "SELECT job_id, COUNT(*) FROM job_history GROUP BY job_id"
+            ).fetchall())
+        
+        self.assertGreaterEqual(counts.get("fast_job", 0), 5)
+        self.assertLessEqual(counts.get("slow_job", 0), 2)
+        self.assertGreater(self.scheduler.get_queue_metrics()['LOW']['overlapped'], 0)
+
+
+class TestDagExecution(unittest.TestCase):
+    """Test DAG-aware dependency execution"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_file = Path(self.test_dir) / "test_scheduler.db"
+        self.scheduler = LNMTScheduler(
+            config_file=str(Path(self.test_dir) / "test_config.json"),
+            db_path=str(self.db_file)
+        )
+    
+    def tearDown(self):
+        self.scheduler.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def _job(self, job_id, dependencies=(), schedule="0 0 1 1 *", seconds=0.0, triggered=True):
+        return JobConfig(id=job_id, name=job_id, module="time", function="sleep",
+                         schedule=schedule, max_retries=0, args=[seconds],
+                         dependencies=list(dependencies), triggered_by_dependencies=triggered)
+    
+    def test_cycle_rejected_at_registration(self):
+        """Test that a job closing a dependency cycle is rejected"""
+        self.assertTrue(self.scheduler.register_job(self._job("a", ["c"])))
+        self.assertTrue(self.scheduler.register_job(self._job("b", ["a"])))
+        self.assertFalse(self.scheduler.register_job(self._job("c", ["b"])))
+        self.assertFalse(self.scheduler.register_job(self._job("self_ref", ["self_ref"])))
+        self.assertIsNone(self.scheduler.registry.get_job("c"))
+        self.assertTrue(self.scheduler.register_job(self._job("c")))
+    
+    def test_load_config_reads_registry_once(self):
+        """Test that loading a config checks every job against one registry snapshot"""
+        self.scheduler.register_job(self._job("existing"))
+        jobs = [{'id': f"job{i}", 'name': f"job{i}", 'module': "time", 'function': "sleep",
+                 'schedule': "0 0 1 1 *", 'dependencies': [f"job{i - 1}"] if i else ["existing"]}
+                for i in range(50)]
+        jobs.append({'id': "existing", 'name': "existing", 'module': "time", 'function': "sleep",
+                     'schedule': "0 0 1 1 *", 'dependencies': ["job49"]})
+        with open(self.scheduler.config_file, 'w') as f:
+            json.dump({'jobs': jobs}, f)
+        
+        with patch.object(self.scheduler.registry, 'get_all_jobs',
+                          wraps=self.scheduler.registry.get_all_jobs) as get_all_jobs:
+            self.scheduler.load_config()
+        self.assertEqual(get_all_jobs.call_count, 1)
+        self.assertIsNotNone(self.scheduler.registry.get_job("job49"))
+        # Re-registering "existing" on top of the chain would close a cycle
+        self.assertEqual(self.scheduler.registry.get_job("existing").dependencies, [])
+    
+    def test_run_plan_and_failure_propagation(self):
+        """Test topological ordering and skipping downstream of a failure"""
+        for job in [self._job("backup"), self._job("report", ["backup"]),
+                    self._job("archive", ["backup"]), self._job("notify", ["report", "archive"]),
+                    self._job("unrelated")]:
+            self.scheduler.register_job(job)
+        
+        run = self.scheduler.dependency_manager.plan_run(
+            self.scheduler.registry.get_job("backup"), self.scheduler.registry.jobs)
+        self.assertIsInstance(run, DagRun)
+        self.assertEqual(set(run.order), {"backup", "report", "archive", "notify"})
+        self.assertEqual(run.order[0], "backup")
+        self.assertEqual(run.order[-1], "notify")
+        
+        self.assertEqual([j.id for j in run.ready()], ["backup"])
+        run.finish("backup", True)
+        self.assertEqual({j.id for j in run.ready()}, {"report", "archive"})
+        run.finish("report", True)
+        run.finish("archive", False)
+        self.assertEqual(run.ready(), [])
+        self.assertEqual(run.skipped, {"notify"})
+        self.assertTrue(run.done)
+    
+    def test_pipeline_runs_dependents_immediately(self):
+        """Test that dependents start as soon as parents finish, branches in parallel"""
+        for job in [self._job("backup", schedule="@every 10s", seconds=0.05),
+                    self._job("report", ["backup"], seconds=0.2),
+                    self._job("archive", ["backup"], seconds=0.2),
+                    self._job("notify", ["report", "archive"])]:
+            self.scheduler.register_job(job)
+        
+        async def run_briefly():
+            self.scheduler.running = True
+            loop_task = asyncio.create_task(self.scheduler.scheduler_loop())
+            # backup fires once after 10s; start it now instead of waiting
+            await asyncio.sleep(0)
+            started = time.time()
+            self.scheduler._start_run(self.scheduler.registry.get_job("backup"))
+            while not self.scheduler.get_job_status("notify")['last_end'] and time.time() - started < 5:
+                await asyncio.sleep(0.02)
+            elapsed = time.time() - started
+            self.scheduler.running = False
+            self.scheduler._wake()
+            await asyncio.wait_for(loop_task, timeout=5)
+            return elapsed
+        
+        elapsed = asyncio.run(run_briefly())
+        
+        # 0.05s + two parallel 0.2s branches + notify, far below sequential or tick-based timing
+        self.assertLess(elapsed, 0.45)
+        for job_id in ("backup", "report", "archive", "notify"):
+            self.assertEqual(self.scheduler.get_job_status(job_id)['last_status'],
+                             JobStatus.COMPLETED.value)
+    
+    def test_dependents_keep_their_own_schedule(self):
+        """Test that only triggered dependents join their parent's runs"""
+        for job in [self._job("poll", schedule="@every 100ms"),
+                    self._job("backup", ["poll"], schedule="0 2 * * *", triggered=False),
+                    self._job("report", ["backup"], schedule="0 6 * * 1", triggered=False),
+                    self._job("notify", ["poll"])]:
+            self.scheduler.register_job(job)
+        
+        run = self.scheduler.dependency_manager.plan_run(
+            self.scheduler.registry.get_job("poll"), self.scheduler.registry.jobs)
+        self.assertEqual(run.order, ["poll", "notify"])
+        
+        async def run_briefly():
+            self.scheduler.running = True
+            loop_task = asyncio.create_task(self.scheduler.scheduler_loop())
+            await asyncio.sleep(0.45)
+            self.scheduler.running = False
+            self.scheduler._wake()
+            await asyncio.wait_for(loop_task, timeout=5)
+        
+        asyncio.run(run_briefly())
+        
+        with sqlite3.connect(str(self.db_file)) as conn:
+            counts = dict(conn.execute(
+                "SELECT job_id, COUNT(*) FROM job_history GROUP BY job_id").fetchall())
+        
+        self.assertGreaterEqual(counts.get("poll", 0), 3)
+        self.assertGreaterEqual(counts.get("notify", 0), 2)
+        self.assertNotIn("backup", counts)
+        self.assertNotIn("report", counts)
+        
+        # The triggered flag survives the database and config file
+        self.scheduler.registry.jobs.clear()
+        self.assertTrue(self.scheduler.registry.get_job("notify").triggered_by_dependencies)
+        self.assertFalse(self.scheduler.registry.get_job("backup").triggered_by_dependencies)
+        self.scheduler.save_config()
+        with open(self.scheduler.config_file) as f:
+            saved = {job['id']: job for job in json.load(f)['jobs']}
+        self.assertTrue(saved["notify"]['triggered_by_dependencies'])
+
+
+class TestMisfirePolicies(unittest.TestCase):
+    """Test misfire catch-up policies and jittered fire times"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_file = Path(self.test_dir) / "test_scheduler.db"
+        self.scheduler = LNMTScheduler(
+            config_file=str(Path(self.test_dir) / "test_config.json"),
+            db_path=str(self.db_file)
+        )
+    
+    def tearDown(self):
+        self.scheduler.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def _register(self, policy, max_catchup=10):
+        job = JobConfig(id=f"{policy}_job", name=policy, module="time", function="sleep",
+                        schedule="@every 10s", max_retries=0, args=[0.05],
+                        misfire_policy=policy, max_catchup=max_catchup)
+        self.scheduler.register_job(job)
+        return job
+    
+    def _run_loop(self, seconds, during=None):
+        async def run_briefly():
+            self.scheduler.running = True
+            loop_task = asyncio.create_task(self.scheduler.scheduler_loop())
+            await asyncio.sleep(0.1)
+            if during:
+                during()
+            await asyncio.sleep(seconds)
+            self.scheduler.running = False
+            self.scheduler._wake()
+            await asyncio.wait_for(loop_task, timeout=5)
+        
+        asyncio.run(run_briefly())
+    
+    def _runs_since(self, started):
+        with sqlite3.connect(str(self.db_file)) as conn:
+            return dict(conn.execute(
+                "SELECT job_id, COUNT(*) FROM job_history WHERE start_time >= ? GROUP BY job_id",
+                (started.isoformat(" "),)
+            ).fetchall())
+    
+    def test_jitter_is_deterministic_and_even(self):
+        """Test that jobs on the same cron minute are spread evenly across it"""
+        self.scheduler.jitter_window = 60
+        jobs = [JobConfig(id=f"poll_{i}", name="Poll", module="time", function="time",
+                          schedule="* * * * *") for i in range(600)]
+        offsets = [self.scheduler.get_jitter_offset(job) for job in jobs]
+        
+        self.assertEqual(offsets, [self.scheduler.get_jitter_offset(job) for job in jobs])
+        self.assertTrue(all(0 <= offset < 60 for offset in offsets))
+        buckets = [0] * 6
+        for offset in offsets:
+            buckets[int(offset // 10)] += 1
+        self.assertTrue(all(70 <= count <= 130 for count in buckets), buckets)
+        
+        # A job's own window overrides the scheduler default
+        job = jobs[0]
+        job.jitter = 0
+        self.assertEqual(self.scheduler.get_jitter_offset(job), 0.0)
+        
+        job.jitter = 30
+        offset = self.scheduler.get_jitter_offset(job)
+        base = datetime(2025, 1, 1, 12, 0, 30)
+        self.scheduler._schedule_job(job, base)
+        fire = datetime.fromtimestamp(self.scheduler.timers.next_fire_time(job.id))
+        self.assertGreater(fire, base)
+        self.assertLessEqual(fire, base + timedelta(minutes=1))
+        self.assertAlmostEqual(fire.second + fire.microsecond / 1e6, offset, places=3)
+    
+    def test_missed_runs_caught_up_on_startup(self):
+        """Test that runs missed while stopped are skipped, run once, or replayed"""
+        last_run = datetime.now() - timedelta(seconds=35)
+        for policy in ("skip", "run_once", "run_all"):
+            job = self._register(policy)
+            self.scheduler.registry.save_job_result(JobResult(
+                job_id=job.id, status=JobStatus.COMPLETED, start_time=last_run,
+                end_time=last_run
+            ))
+        
+        started = datetime.now()
+        self._run_loop(0.6)
+        
+        runs = self._runs_since(started)
+        self.assertNotIn("skip_job", runs)
+        self.assertEqual(runs.get("run_once_job"), 1)
+        self.assertEqual(runs.get("run_all_job"), 3)
+    
+    def test_late_fire_respects_policy_and_cap(self):
+        """Test that a fire handled late applies the job's misfire policy"""
+        jobs = [self._register("skip"), self._register("run_once"),
+                self._register("run_all", max_catchup=2)]
+        
+        def fire_late():
+            for job in jobs:
+                self.scheduler.timers.schedule(job.id, time.time() - 35)
+            self.scheduler._wake()
+        
+        started = datetime.now()
+        self._run_loop(0.6, during=fire_late)
+        
+        runs = self._runs_since(started)
+        self.assertEqual(runs.get("skip_job"), 1)
+        self.assertEqual(runs.get("run_once_job"), 1)
+        self.assertEqual(runs.get("run_all_job"), 3)
+    
+    def test_slightly_late_fire_is_not_a_misfire(self):
+        """Test that a fire held up for part of its interval runs without catch-up"""
+        job = self._register("run_all")
+        self.assertFalse(self.scheduler._is_misfire(job, time.time() - 3, time.time()))
+        self.assertTrue(self.scheduler._is_misfire(job, time.time() - 6, time.time()))
+        
+        self.scheduler.misfire_grace = 30.0
+        self.assertFalse(self.scheduler._is_misfire(job, time.time() - 25, time.time()))
+        self.scheduler.misfire_grace = None
+        
+        def fire_late():
+            self.scheduler.timers.schedule(job.id, time.time() - 3)
+            self.scheduler._wake()
+        
+        started = datetime.now()
+        self._run_loop(0.4, during=fire_late)
+        self.assertEqual(self._runs_since(started).get("run_all_job"), 1)
+    
+    def test_misfire_settings_persisted(self):
+        """Test misfire settings round-trip through the registry and validation"""
+        self.scheduler.register_job(JobConfig(
+            id="catchup_job", name="Catch-up", module="time", function="time",
+            schedule="*/5 * * * *", misfire_policy="run_all", max_catchup=4, jitter=15.0
+        ))
+        self.scheduler.registry.jobs.clear()
+        job = self.scheduler.registry.get_job("catchup_job")
+        self.assertEqual((job.misfire_policy, job.max_catchup, job.jitter), ("run_all", 4, 15.0))
+        
+        with self.assertRaises(ValueError):
+            JobConfig(id="bad", name="Bad", module="time", function="time",
+                      schedule="* * * * *", misfire_policy="sometimes")
+
+
+class TestJobHistory(unittest.TestCase):
+    """Test batched job history persistence and retention"""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_file = Path(self.test_dir) / "test_scheduler.db"
+        self.registry = JobRegistry(str(self.db_file), history_limit=50)
+    
+    def tearDown(self):
+        self.registry.close()
+        shutil.rmtree(self.test_dir)
+    
+    def _results(self, job_id, count, start):
+        for i in range(count):
+            started = start + timedelta(seconds=i)
+            yield JobResult(job_id=job_id,
+                            status=JobStatus.COMPLETED if i % 4 else JobStatus.FAILED,
+                            start_time=started, end_time=started + timedelta(milliseconds=5))
+    
+    def test_batched_writes_with_retention(self):
+        """Test that history is trimmed per job while daily counts keep every run"""
+        self.registry.register_job(JobConfig(
+            id="chatty_job", name="Chatty", module="time", function="time",
+            schedule="* * * * *", history_limit=10
+        ))
+        start = datetime(2025, 1, 1, 23, 59, 0)
+        
+        for result in self._results("chatty_job", 120, start):
+            self.registry.save_job_result(result)
+        for result in self._results("default_job", 120, start):
+            self.registry.save_job_result(result)
+        
+        history = self.registry.get_job_history("chatty_job", limit=100)
+        self.assertEqual(len(history), 10)
+        self.assertEqual(history[0][2], (start + timedelta(seconds=119)).isoformat(" "))
+        self.assertEqual(len(self.registry.get_job_history("default_job", limit=100)), 50)
+        
+        with sqlite3.connect(str(self.db_file)) as conn:
+            daily = conn.execute("""
+                SELECT day, successes, failures FROM job_history_daily
+                WHERE job_id = 'chatty_job' ORDER BY day
+            """).fetchall()
+        self.assertEqual(daily, [("2025-01-01", 45, 15), ("2025-01-02", 45, 15)])
+    
+    def test_history_query_uses_index(self):
+        """Test that per-job history lookups are served by an index"""
+        with sqlite3.connect(str(self.db_file)) as conn:
+            plan = " ".join(row[-1] for row in conn.execute("""
+                EXPLAIN QUERY PLAN
+                SELECT job_id, status FROM job_history WHERE job_id = ?
+                ORDER BY start_time DESC LIMIT 10
+            """, ("x",)))
+        self.assertIn("idx_job_history_job_start", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class TestJobTimerQueue(unittest.TestCase):
+    """Test the job timer queue"""
+    
+    def test_pop_due_in_fire_order(self):
+        """Test that due jobs come out in fire-time order"""
+        timers = JobTimerQueue()
+        timers.schedule("b", 20.0)
+        timers.schedule("a", 10.0)
+        timers.schedule("c", 30.0)
+        
+        self.assertEqual(timers.peek(), 10.0)
+        self.assertEqual(timers.pop_due(25.0), [("a", 10.0), ("b", 20.0)])
+        self.assertEqual(len(timers), 1)
+        self.assertEqual(timers.peek(), 30.0)
+    
+    def test_reschedule_and_remove(self):
+        """Test that superseded and removed entries are never returned"""
+        timers = JobTimerQueue()
+        timers.schedule("a", 10.0)
+        timers.schedule("a", 50.0)
+        timers.schedule("b", 20.0)
+        timers.remove("b")
+        
+        self.assertEqual(timers.pop_due(40.0), [])
+        self.assertEqual(timers.peek(), 50.0)
+        self.assertEqual(timers.pop_due(50.0), [("a", 50.0)])
+        self.assertIsNone(timers.peek())
+    
+    def test_many_reschedules_stay_compact(self):
+        """Test that repeated rescheduling does not grow the heap unbounded"""
+        timers = JobTimerQueue()
+        for i in range(10000):
+            timers.schedule(f"job{i % 10}", float(i))
+        
+        self.assertEqual(len(timers), 10)
+        self.assertLess(len(timers._heap), 200)
+        self.assertEqual([job_id for job_id, _ in timers.pop_due(float("inf"))],
+                         [f"job{i}" for i in range(10)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Tests for the LNMT VLAN controller: interface counter collection, counter
+rates, downsampled time series and the subnet device index.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.vlan_controller import (
+    VLANConfig, VLANDatabase, VLANMonitor, VLANController, InterfaceCounterCollector, InterfaceCounters,
+    CounterSnapshot, CounterRateEngine, VLANTimeSeries, SubnetDeviceIndex, ConntrackTrafficCollector
+)
+from services.device_tracker_service import LeaseStateEngine
+
+
+def counters(rx_bytes, tx_bytes=0, rx_packets=0, tx_packets=0):
+    return InterfaceCounters(rx_bytes, rx_packets, 0, 0, tx_bytes, tx_packets, 0, 0)
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+
+class TestInterfaceCounterCollector(TempDirTestCase):
+    """One /proc/net/dev read serves every VLAN with exact name matching"""
+
+    def setUp(self):
+        super().setUp()
+        lines = [
+            "Inter-|   Receive                                                |  Transmit",
+            " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed",
+            "    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0       0          0",
+            # Counters glued to the name, as the kernel prints them once they get wide
+            "eth0.10:4294967296000 20    1    2    0     0          0         0     5000      30    3    4    0     0       0          0",
+        ]
+        for vlan_id in range(100, 600):
+            lines.append(f"eth0.{vlan_id}: {vlan_id * 1000} {vlan_id} 0 0 0 0 0 0 "
+                         f"{vlan_id * 10} {vlan_id // 2} 0 0 0 0 0 0")
+        self.proc_path = os.path.join(self.temp_dir, "dev")
+        with open(self.proc_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def test_parse(self):
+        snapshot = InterfaceCounterCollector(self.proc_path).read()
+        eth10 = snapshot.get("eth0.10")
+        self.assertEqual((eth10.rx_bytes, eth10.tx_packets), (4294967296000, 30))
+        self.assertEqual((eth10.rx_dropped, eth10.tx_errors), (2, 3))
+        self.assertEqual(snapshot.get("eth0.100").rx_bytes, 100000, "eth0.10 must not match eth0.100")
+        self.assertIsNone(snapshot.get("eth0"), "Partial names must not match")
+
+    def test_one_read_per_cycle(self):
+        class CountingCollector(InterfaceCounterCollector):
+            reads = 0
+
+            def read(self):
+                CountingCollector.reads += 1
+                return super().read()
+
+        db = VLANDatabase(os.path.join(self.temp_dir, "vlan.db"))
+        for vlan_id in range(100, 600):
+            db.save_vlan(VLANConfig(vlan_id=vlan_id, name=f"vlan{vlan_id}", description="",
+                                    subnet="10.0.0.0/24", gateway="10.0.0.1", interfaces=["eth0"]))
+        monitor = VLANMonitor(db, CountingCollector(self.proc_path))
+
+        results = monitor.collect_cycle()
+        self.assertEqual(CountingCollector.reads, 1)
+        self.assertEqual(len(results), 500)
+        by_id = {vlan.vlan_id: stats for vlan, stats in results}
+        self.assertEqual(by_id[100].bytes_in, 100000)
+        self.assertEqual(by_id[599].packets_out, 299)
+
+
+class TestCounterRateEngine(TempDirTestCase):
+    """Counter-delta rates, wraps, resets, smoothing and percentiles"""
+
+    def test_rates_from_deltas(self):
+        engine = CounterRateEngine(ewma_tau=10.0)
+        self.assertEqual(engine.update(CounterSnapshot({"eth0.10": counters(0, 0, 0, 0)}, 100.0)), {})
+        rates = engine.update(CounterSnapshot({"eth0.10": counters(2_000_000, 500_000, 2000, 1000)}, 102.0))
+        rate = rates["eth0.10"]
+        self.assertEqual((rate.rx_bps, rate.tx_bps), (8_000_000, 2_000_000))
+        self.assertEqual((rate.rx_pps, rate.tx_pps), (1000, 500))
+
+    def test_32_bit_wrap(self):
+        # Known 32-bit counters always wrap
+        engine = CounterRateEngine(link_speed=lambda name: None, counters_32bit=True)
+        engine.update(CounterSnapshot({"wlan0.20": counters(2 ** 32 - 1000)}, 0.0))
+        rate = engine.update(CounterSnapshot({"wlan0.20": counters(500)}, 1.0))["wlan0.20"]
+        self.assertEqual(rate.rx_bps, 1500 * 8)
+
+        # Otherwise a wrap is accepted when the link could have carried it
+        engine = CounterRateEngine(link_speed=lambda name: 1_000_000_000)
+        engine.update(CounterSnapshot({"wlan0.20": counters(2 ** 32 - 1000, 0, 2 ** 32 - 10)}, 0.0))
+        rate = engine.update(CounterSnapshot({"wlan0.20": counters(500, 0, 5)}, 1.0))["wlan0.20"]
+        self.assertEqual((rate.rx_bps, rate.rx_pps), (1500 * 8, 15))
+
+    def test_reset_skips_interval(self):
+        engine = CounterRateEngine(link_speed=lambda name: None)
+        engine.update(CounterSnapshot({"wlan0.20": counters(1000)}, 2.0))
+        self.assertNotIn("wlan0.20", engine.update(CounterSnapshot({"wlan0.20": counters(10)}, 3.0)))
+
+    def test_reset_below_32_bit_limit_is_not_a_wrap(self):
+        # A 64-bit counter reset from 3e9 would read as a 345 Mbps wrap over 30s
+        for link_speed in (None, 100_000_000):
+            engine = CounterRateEngine(link_speed=lambda name: link_speed)
+            engine.update(CounterSnapshot({"eth0.10": counters(3_000_000_000)}, 0.0))
+            self.assertEqual(engine.update(CounterSnapshot({"eth0.10": counters(1000)}, 30.0)), {})
+            rate = engine.update(CounterSnapshot({"eth0.10": counters(376_000)}, 31.0))["eth0.10"]
+            self.assertEqual(rate.rx_bps, 375_000 * 8)
+
+        # Counters past the 32-bit range never wrap there
+        engine = CounterRateEngine(link_speed=lambda name: 100_000_000_000)
+        engine.update(CounterSnapshot({"eth0.10": counters(2 ** 32 + 5)}, 0.0))
+        self.assertEqual(engine.update(CounterSnapshot({"eth0.10": counters(10)}, 30.0)), {})
+
+    def test_ewma_and_percentiles(self):
+        # Steady traffic with one spike: the EWMA damps it and p95 ignores it
+        engine = CounterRateEngine(ewma_tau=30.0, window=300.0)
+        total = 0
+        for second in range(101):
+            total += 125_000 * (20 if second == 50 else 1)  # 1 Mbps, one 20 Mbps second
+            rates = engine.update(CounterSnapshot({"eth0.30": counters(total)}, float(second)))
+            if second == 50:
+                self.assertLess(rates["eth0.30"].rx_bps_ewma, 2_000_000)
+        self.assertEqual(engine.percentile("eth0.30", 95), 1_000_000)
+        self.assertEqual(engine.percentile("eth0.30", 100), 20_000_000)
+
+    def test_vlan_bandwidth_does_not_grow(self):
+        # Cumulative counters no longer inflate VLAN bandwidth over time
+        class ScriptedCollector:
+            def __init__(self):
+                self.second = 0
+
+            def read(self):
+                self.second += 1
+                return CounterSnapshot({"eth0.40": counters(self.second * 1_250_000)}, float(self.second))
+
+        db = VLANDatabase(os.path.join(self.temp_dir, "vlan.db"))
+        db.save_vlan(VLANConfig(vlan_id=40, name="rates", description="", subnet="10.40.0.0/24",
+                                gateway="10.40.0.1", interfaces=["eth0"], bandwidth_limit=20))
+        monitor = VLANMonitor(db, ScriptedCollector(), interval=1.0)
+        for _ in range(60):
+            results = monitor.collect_cycle()
+        self.assertAlmostEqual(results[0][1].bandwidth_usage, 10.0)
+        self.assertEqual(monitor.get_bandwidth_percentile(40, 95), 10.0)
+
+
+class TestVLANTimeSeries(TempDirTestCase):
+    """Downsampled ring storage of VLAN statistics"""
+
+    def setUp(self):
+        super().setUp()
+        self.db_path = os.path.join(self.temp_dir, "series.db")
+        # Small rings so the test wraps them: 1h of 1m, 1d of 5m, 1 week of 1h
+        self.series = VLANTimeSeries(self.db_path, retention={60: 3600, 300: 86400, 3600: 7 * 86400})
+
+        # One sample every 30 seconds for two hours; bandwidth alternates 10/20 Mbps
+        self.start = 1_700_002_800.0  # on an hour boundary
+        self.series.record_many([
+            ("vlan:100", self.start + i * 30, 10.0 if i % 2 == 0 else 20.0,
+             i * 1000, i * 500, i * 10, i * 5, 3 + i % 4)
+            for i in range(240)
+        ])
+        self.now = self.start + 240 * 30
+
+    def test_ring_sizes(self):
+        with sqlite3.connect(self.db_path) as conn:
+            rows = dict(conn.execute(
+                "SELECT resolution, COUNT(*) FROM series_points GROUP BY resolution").fetchall())
+        conn.close()
+        self.assertEqual(rows, {60: 60, 300: 24, 3600: 2})
+
+    def test_downsampling(self):
+        # The 1m ring only covers the last hour; older ranges fall back to 5m
+        self.assertEqual(self.series.pick_resolution(self.now - 1800, self.now), 60)
+        self.assertEqual(self.series.pick_resolution(self.now - 7200, self.now), 300)
+
+        minute = self.series.query("vlan:100", self.now - 3600, self.now, resolution=60)
+        self.assertIsInstance(minute['bandwidth_avg'], array, "Columns should be arrays")
+        self.assertEqual(len(minute['timestamp']), 60)
+        self.assertEqual(list(minute['timestamp']), sorted(minute['timestamp']), "Buckets out of order")
+        self.assertEqual(set(minute['bandwidth_avg']), {15.0})
+        self.assertEqual(set(minute['bandwidth_max']), {20.0})
+        self.assertEqual(minute['bytes_in'][-1], 239 * 1000, "Counters keep the latest value")
+
+        hourly = self.series.query("vlan:100", self.start, self.now, resolution=3600)
+        self.assertEqual(list(hourly['samples']), [120, 120])
+        self.assertEqual(list(hourly['devices']), [6, 6])
+
+    def test_expired_slot_starts_over(self):
+        self.series.record_many([("vlan:100", self.now + 3600, 50.0, 0, 0, 0, 0, 1)])
+        latest = self.series.query("vlan:100", self.now + 3600, self.now + 3660, resolution=60)
+        self.assertEqual(list(latest['samples']), [1])
+        self.assertEqual(list(latest['bandwidth_avg']), [50.0])
+
+
+class FakeTracker:
+    """Stands in for DeviceTracker's lease listener interface"""
+
+    def __init__(self):
+        self.lease_state = LeaseStateEngine()
+        self.listeners = []
+
+    def add_lease_listener(self, listener):
+        self.listeners.append(listener)
+
+    def poll(self, leases):
+        changes = self.lease_state.apply(leases)
+        for listener in self.listeners:
+            listener(changes, self.lease_state)
+
+
+class EmptyCollector:
+    def read(self):
+        return CounterSnapshot({}, time.monotonic())
+
+
+class TestSubnetDeviceIndex(TempDirTestCase):
+    """Device counts and top talkers from the device tracker's leases"""
+
+    def setUp(self):
+        super().setUp()
+        self.index = SubnetDeviceIndex()
+        self.index.set_subnets({10: "192.168.10.0/24", 20: "192.168.20.0/24",
+                                30: "10.0.0.0/8", 31: "10.1.0.0/16"})
+        self.expires = datetime.now() + timedelta(hours=1)
+        self.tracker = FakeTracker()
+        self.index.attach(self.tracker)
+
+    def test_interval_lookup(self):
+        self.assertEqual(self.index.vlan_for("192.168.10.77"), 10)
+        self.assertEqual(self.index.vlan_for("10.1.2.3"), 31, "Most specific subnet should win")
+        self.assertEqual(self.index.vlan_for("10.2.0.1"), 30)
+        self.assertIsNone(self.index.vlan_for("172.16.0.1"))
+        self.assertIsNone(self.index.vlan_for("bogus"))
+
+    def test_incremental_lease_updates(self):
+        self.tracker.poll([("aa:00:00:00:00:01", "192.168.10.5", "laptop", self.expires),
+                           ("aa:00:00:00:00:02", "192.168.10.6", "phone", self.expires),
+                           ("aa:00:00:00:00:03", "192.168.20.9", "tv", self.expires)])
+        self.assertEqual((self.index.count(10), self.index.count(20)), (2, 1))
+
+        # The phone roams to VLAN 20 and the TV's lease lapses
+        self.tracker.poll([("aa:00:00:00:00:01", "192.168.10.5", "laptop", self.expires),
+                           ("aa:00:00:00:00:02", "192.168.20.7", "phone", self.expires)])
+        self.assertEqual((self.index.count(10), self.index.count(20)), (1, 1))
+        self.assertEqual(self.index.devices(20), {"aa:00:00:00:00:02": "192.168.20.7"})
+
+        # The TV comes back on its old address under a new hostname
+        self.tracker.poll([("aa:00:00:00:00:01", "192.168.10.5", "laptop", self.expires),
+                           ("aa:00:00:00:00:02", "192.168.20.7", "phone", self.expires),
+                           ("aa:00:00:00:00:03", "192.168.20.9", "living-room-tv", self.expires)])
+        self.assertEqual(self.index.count(20), 2)
+        self.assertIn("aa:00:00:00:00:03", self.index.devices(20))
+
+    def test_device_counts_and_top_talker_blacklisting(self):
+        db = VLANDatabase(os.path.join(self.temp_dir, "vlan.db"))
+        vlan = VLANConfig(vlan_id=10, name="users", description="", subnet="192.168.10.0/24",
+                          gateway="192.168.10.1", interfaces=["eth0"], bandwidth_limit=10,
+                          usage_threshold=80, auto_blacklist=True)
+        db.save_vlan(vlan)
+        monitor = VLANMonitor(db, EmptyCollector(), device_index=self.index)
+        self.tracker.poll([("aa:00:00:00:00:01", "192.168.10.5", "laptop", self.expires),
+                           ("aa:00:00:00:00:04", "192.168.10.8", "console", self.expires)])
+        stats = dict((v.vlan_id, s) for v, s in monitor.collect_cycle())
+        self.assertEqual(stats[10].connected_devices, 2)
+
+        self.index.record_traffic("aa:00:00:00:00:01", 5_000)
+        self.index.record_traffic("aa:00:00:00:00:04", 90_000)
+        self.assertEqual(self.index.top_talkers(10, 5),
+                         [("aa:00:00:00:00:04", "192.168.10.8", 90_000),
+                          ("aa:00:00:00:00:01", "192.168.10.5", 5_000)])
+        stats[10].bandwidth_usage = 9.5
+        monitor._check_thresholds(vlan, stats[10])
+        with sqlite3.connect(db.db_path) as conn:
+            blacklisted = conn.execute("SELECT mac_address, vlan_id FROM blacklisted_devices").fetchall()
+        conn.close()
+        self.assertEqual(blacklisted, [("aa:00:00:00:00:04", 10)])
+
+        # Still over the threshold: the next talker is listed, not the same one again
+        monitor._check_thresholds(vlan, stats[10])
+        with sqlite3.connect(db.db_path) as conn:
+            blacklisted = conn.execute(
+                "SELECT mac_address FROM blacklisted_devices ORDER BY id").fetchall()
+        conn.close()
+        self.assertEqual(blacklisted, [("aa:00:00:00:00:04",), ("aa:00:00:00:00:01",)])
+
+
+
+def conntrack_line(src, dst, sport, dport, sent, received, proto="tcp"):
+    return (f"ipv4     2 {proto}      6 431999 ESTABLISHED src={src} dst={dst} sport={sport} dport={dport} "
+            f"packets=10 bytes={sent} src={dst} dst={src} sport={dport} dport={sport} packets=8 "
+            f"bytes={received} [ASSURED] mark=0 zone=0 use=2")
+
+
+class TestConntrackTraffic(TempDirTestCase):
+    """Per-device bytes from conntrack flow counters"""
+
+    def setUp(self):
+        super().setUp()
+        self.proc_path = os.path.join(self.temp_dir, "nf_conntrack")
+
+    def write_flows(self, *lines):
+        with open(self.proc_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def test_flow_deltas_per_address(self):
+        collector = ConntrackTrafficCollector(self.proc_path)
+        self.write_flows(conntrack_line("192.168.10.5", "1.1.1.1", 5000, 443, 1000, 9000))
+        self.assertEqual(collector.read(), {}, "First read only sets the baseline")
+
+        self.write_flows(conntrack_line("192.168.10.5", "1.1.1.1", 5000, 443, 1500, 19000),
+                         conntrack_line("192.168.10.8", "8.8.8.8", 6000, 53, 100, 200, proto="udp"))
+        traffic = collector.read()
+        self.assertEqual(traffic["192.168.10.5"], 10500)
+        self.assertEqual(traffic["192.168.10.8"], 300, "New flows count in full")
+
+        # A flow that closed and reopened on the same tuple starts over
+        self.write_flows(conntrack_line("192.168.10.5", "1.1.1.1", 5000, 443, 40, 60))
+        self.assertEqual(collector.read()["192.168.10.5"], 100)
+
+    def test_without_accounting_or_table(self):
+        collector = ConntrackTrafficCollector(self.proc_path)
+        self.assertEqual(collector.read(), {})
+        self.write_flows("ipv4     2 tcp      6 431999 ESTABLISHED src=192.168.10.5 dst=1.1.1.1 "
+                         "sport=5000 dport=443 src=1.1.1.1 dst=192.168.10.5 sport=443 dport=5000 use=1")
+        collector.read()
+        self.assertEqual(collector.read(), {})
+
+    def test_monitor_blacklists_conntrack_top_talker(self):
+        index = SubnetDeviceIndex()
+        tracker = FakeTracker()
+        index.attach(tracker)
+        expires = datetime.now() + timedelta(hours=1)
+        tracker.poll([("aa:00:00:00:00:01", "192.168.10.5", "laptop", expires),
+                      ("aa:00:00:00:00:04", "192.168.10.8", "console", expires)])
+
+        db = VLANDatabase(os.path.join(self.temp_dir, "vlan.db"))
+        vlan = VLANConfig(vlan_id=10, name="users", description="", subnet="192.168.10.0/24",
+                          gateway="192.168.10.1", interfaces=["eth0"], bandwidth_limit=10,
+                          usage_threshold=80, auto_blacklist=True)
+        db.save_vlan(vlan)
+        monitor = VLANMonitor(db, EmptyCollector(), device_index=index,
+                              traffic_collector=ConntrackTrafficCollector(self.proc_path))
+        self.write_flows(conntrack_line("192.168.10.5", "1.1.1.1", 5000, 443, 0, 0),
+                         conntrack_line("192.168.10.8", "1.1.1.1", 5001, 443, 0, 0))
+        monitor.collect_cycle()
+        self.write_flows(conntrack_line("192.168.10.5", "1.1.1.1", 5000, 443, 1000, 4000),
+                         conntrack_line("192.168.10.8", "1.1.1.1", 5001, 443, 5000, 85000))
+        stats = dict((v.vlan_id, s) for v, s in monitor.collect_cycle())
+        self.assertEqual(index.top_talkers(10, 5), [("aa:00:00:00:00:04", "192.168.10.8", 90_000),
+                                                    ("aa:00:00:00:00:01", "192.168.10.5", 5_000)])
+
+        stats[10].bandwidth_usage = 9.5
+        monitor._check_thresholds(vlan, stats[10])
+        with sqlite3.connect(db.db_path) as conn:
+            blacklisted = conn.execute("SELECT mac_address, vlan_id FROM blacklisted_devices").fetchall()
+        conn.close()
+        self.assertEqual(blacklisted, [("aa:00:00:00:00:04", 10)])
+
+        # Each cycle ranks only its own interval
+        monitor.collect_cycle()
+        self.assertEqual(index.top_talkers(10, 5), [])
+
+    def test_controller_follows_attached_tracker(self):
+        controller = VLANController(db_path=os.path.join(self.temp_dir, "vlan.db"))
+        controller.monitor.collector = EmptyCollector()
+        controller.monitor.interval = 0.01
+        controller.monitor.traffic_collector = ConntrackTrafficCollector(self.proc_path)
+        tracker = FakeTracker()
+        controller.attach_device_tracker(tracker)
+        controller.start_monitoring()
+        controller.stop_monitoring()
+        self.assertIsNone(controller._lease_follower, "An attached tracker must not be replaced")
+        self.assertEqual(tracker.listeners, [controller.monitor.device_index.on_lease_changes])
+    
+    def test_controller_follows_leases_read_only(self):
+        lease_file = os.path.join(self.temp_dir, "dnsmasq.leases")
+        expires = int(time.time()) + 3600
+        with open(lease_file, "w") as f:
+            f.write(f"{expires} aa:00:00:00:00:01 192.168.10.5 laptop *\n"
+                    f"{expires} aa:00:00:00:00:02 192.168.20.7 phone *\n")
+        
+        controller = VLANController(db_path=os.path.join(self.temp_dir, "vlan.db"), lease_file=lease_file)
+        controller.monitor.collector = EmptyCollector()
+        controller.monitor.interval = 0.01
+        controller.monitor.traffic_collector = ConntrackTrafficCollector(self.proc_path)
+        for vlan_id in (10, 20):
+            controller.db.save_vlan(VLANConfig(vlan_id=vlan_id, name=f"vlan{vlan_id}", description="",
+                                               subnet=f"192.168.{vlan_id}.0/24",
+                                               gateway=f"192.168.{vlan_id}.1", interfaces=["eth0"]))
+        with patch("services.device_tracker_service.DeviceDatabase") as device_db:
+            controller.start_monitoring()
+            try:
+                deadline = time.time() + 5
+                while not controller.monitor.device_index.synced and time.time() < deadline:
+                    time.sleep(0.01)
+                counts = (controller.monitor.device_index.count(10), controller.monitor.device_index.count(20))
+            finally:
+                controller.stop_monitoring()
+        
+        self.assertEqual(counts, (1, 1))
+        device_db.assert_not_called()
+        self.assertIsNone(controller._follower_thread)
+
+
+if __name__ == '__main__':
+    unittest.main()